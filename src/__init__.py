@@ -1,5 +1,27 @@
-from .contact_test import ContactTest
-from .power_consumption_test import PowerConsumptionTest
-from .output_short_current_test import OutputShortCurrentTest
-from .output_drive_current_test import OutputDriveCurrentTest
-from .voltage_threshold_test import VoltageThresholdHigh, VoltageThresholdLow
+# The test modules are only imported once one of their classes is used
+# (PEP 562), importing the package loads none of them
+import importlib
+
+_EXPORTS = {
+    'ContactTest':'contact_test',
+    'PowerConsumptionTest':'power_consumption_test',
+    'OutputShortCurrentTest':'output_short_current_test',
+    'OutputDriveCurrentTest':'output_drive_current_test',
+    'OutputDriveCurrentTestLow':'output_drive_current_test',
+    'OutputDriveCurrentTestHigh':'output_drive_current_test',
+    'VoltageThresholdTest':'voltage_threshold_test',
+    'VoltageThresholdTestLow':'voltage_threshold_test',
+    'VoltageThresholdTestHigh':'voltage_threshold_test',
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    val = getattr(importlib.import_module(f'.{_EXPORTS[name]}',__name__),name)
+    globals()[name] = val
+    return val
+
+def __dir__():
+    return sorted(list(globals())+__all__)
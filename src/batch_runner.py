@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+'''
+Description:
+    Runs a lot without the GUI, from a test plan in JSON or YAML, so lots
+    can run unattended and be timed. The operator prompts of the GUI are
+    logged instead of shown; the probes have to be moved by relay boards,
+    or the fixture has to be wired for the tests in the plan.
+
+Procedure:
+    1. Load and check the test plan.
+    2. Test the number of chips in the plan, one after the other, or on
+       every site at once if the plan has sites.
+    3. Write the report, the result stream and store, and the histograms
+       next to the output file, and print a summary of the lot.
+
+Test plan:
+    pins        what every pin is, e.g. ["IN","IN","OUT",...,"VCC"]
+    voltages    {"vcc":5,"vih":2,"vil":0.8,"voh":4.5,"vol":0}
+    tests       e.g. ["contact test","output drive current test"]
+    output      report file, the other files are named after it
+    chips       number of chips (or rounds of sites) to test, default 1
+    relay       serial port of the relay board of a single-site station
+    sites       site map, as TotalDataset takes it
+    backend     pyvisa backend, e.g. "resources/or_gate_sim.yaml@sim", or
+                "sim" for the simulated bench (resources/simulation.py)
+    sim         SimBench options for the "sim" backend, e.g. {"spread":0.02}
+    aliases     instrument name -> VISA resource, e.g. {"SMU2400":"GPIB0::24::INSTR"}
+    batch       batch the SCPI commands, default true (false for pyvisa-sim)
+    stream_fmt  csv or jsonl, default csv
+    hist_dir    folder for the histogram images, default none
+    profile     record every instrument command, default false. The
+                per-pin and per-command summaries and the raw trace are
+                written next to the output file.
+    flow        test flow, as test_flow.TestFlow takes it, e.g.
+                {"depends":{"voltage threshold test low":["contact test",
+                 "output short current test"]},
+                 "stop_on_fail":{"contact test":true},
+                 "bins":[{"hbin":5,"sbin":50,"name":"open/short",
+                          "fails":["contact test"]}]}
+                By default everything depends on the contact test and
+                the bins are test_flow.BINS.
+    drive_sweep measure IOL and IOH of an output in one SMU list sweep,
+                the relay board switching the inputs between the two,
+                default false. Needs a relay board.
+    logic       logic function of the gates for the functional test, one of
+                functional_test.FunctionalTest.LOGIC, default "or". The
+                functional test needs a relay board.
+    options     keyword arguments of each test's constructor, e.g.
+                {"contact test":{"profile":"fast","samples":4},
+                 "voltage threshold test":{"resolution":0.05}}
+                profile is one of SMUSetup.PROFILES (default: picked per
+                pin), samples the readings averaged per pin (default 1),
+                and strategy the threshold search, one of
+                VoltageThresholdTest.STRATEGIES (default "bisect"). A test
+                only takes the options its class does, the threshold and
+                functional tests have no profile or samples.
+'''
+__author__ = "Victoria (Rice) Rodriguez"
+__email__ = "rice.rodriguez@ttu.edu"
+__status__ = "Prototype"
+
+import os
+import json
+import inspect
+import time
+import logging
+import argparse as arg
+from resources import SessionPool, SMUSetup, RelayBoard, PinRouter, SimBench, Profiler, LazyModule
+from result_stream import ResultStream
+from result_store import ResultStore, write_summary
+from histograms import HistogramSet, HistogramRenderer
+from user_interface import TotalDataset, ICDataset, LIST_TESTS, expand_tests
+from functional_test import FunctionalTest
+from test_flow import TestFlow
+import test_sequencer
+
+pyvisa = LazyModule('pyvisa')
+
+VOLTAGES = ('vcc','vih','vil','voh','vol')
+PIN_TYPES = ('VCC','GND','IN','OUT')
+# Constructor arguments ICDataset fills in from the chip, not the plan
+CHIP_ARGS = ('expected','set_inputs')
+
+def load_plan(fname):
+    with open(fname) as f:
+        if fname.endswith(('.yaml','.yml')):
+            import yaml
+            plan = yaml.safe_load(f)
+        else:
+            plan = json.load(f)
+    check_plan(plan)
+    return plan
+
+# Raises ValueError for anything missing or misspelled in the plan
+def check_plan(plan):
+    for key in ('pins','voltages','tests','output'):
+        if key not in plan:
+            raise ValueError(f'The test plan has no {key}.')
+    bad = [p for p in plan['pins'] if p not in PIN_TYPES]
+    if bad:
+        raise ValueError(f'Unknown pin types {bad}, use {", ".join(PIN_TYPES)}.')
+    v = plan['voltages']
+    if isinstance(v,dict):
+        missing = [k for k in VOLTAGES if k not in v]
+    else:
+        missing = VOLTAGES[len(v):]
+    if missing:
+        raise ValueError(f'The test plan has no {", ".join(missing)} voltage.')
+    known = [t.lower() for t in LIST_TESTS]
+    bad = [t for t in plan['tests'] if t.lower() not in known]
+    if bad:
+        raise ValueError(f'Unknown tests {bad}, use {", ".join(known)}.')
+    if plan.get('logic','or') not in FunctionalTest.LOGIC:
+        raise ValueError(f'Unknown logic function {plan["logic"]}, use {", ".join(FunctionalTest.LOGIC)}.')
+    for t,opts in plan.get('options',{}).items():
+        if t.lower() not in known:
+            raise ValueError(f'Options for unknown test {t}, use {", ".join(known)}.')
+        takes = test_options(t.lower())
+        bad = [k for k in opts if k not in takes]
+        if bad:
+            raise ValueError(f'The {t} has no options {bad}, use {", ".join(takes) or "none"}.')
+        if opts.get('profile') not in (None,*SMUSetup.PROFILES):
+            raise ValueError(f'Unknown profile {opts["profile"]} for the {t}, use {", ".join(SMUSetup.PROFILES)}.')
+        if not 1 <= opts.get('samples',1) <= SMUSetup.MAX_SAMPLES:
+            raise ValueError(f'The {t} takes 1 to {SMUSetup.MAX_SAMPLES} samples, not {opts["samples"]}.')
+        # The drive sweep holds the samples of IOL and IOH in the source list
+        most = SMUSetup.MAX_LIST//2
+        if plan.get('drive_sweep') and t.lower() == 'output drive current test' and opts.get('samples',1) > most:
+            raise ValueError(f'The output drive current test takes 1 to {most} samples with drive_sweep, not {opts["samples"]}.')
+
+# Options a test takes from the plan: the keyword arguments of its class
+# that aren't filled in from the chip
+def test_options(test):
+    params = inspect.signature(test_sequencer.test_class(test)).parameters
+    return [k for k,p in params.items() if p.default is not p.empty and k not in CHIP_ARGS]
+
+# The five levels in the order ICDataset takes them
+def plan_voltages(plan):
+    v = plan['voltages']
+    return [v[k] for k in VOLTAGES] if isinstance(v,dict) else list(v)
+
+# Keyword arguments of each test object, from the plan's options and logic
+def plan_options(plan):
+    options = {t.lower():dict(opts) for t,opts in plan.get('options',{}).items()}
+    options.setdefault('functional test',{}).setdefault('logic',plan.get('logic','or'))
+    return options
+
+# Nothing to click, prompts go to the log
+def log_prompt(msg,title):
+    logging.info(f'{title}: {msg}')
+
+def run_plan(plan):
+    tests = expand_tests([t.lower() for t in plan['tests']])
+    pins = plan['pins']
+    voltages = plan_voltages(plan)
+    fname = plan['output']
+    base = os.path.splitext(fname)[0]
+    backend = plan.get('backend')
+    relay = plan.get('relay')
+    sites = plan.get('sites')
+    bench = None
+    if backend == 'sim':
+        # Simulated instruments and relay boards, one DUT per site
+        bench = SimBench(**plan.get('sim',{}))
+        manager = bench.resource_manager()
+        if relay is None:
+            relay = bench.relay_port()
+        for name,site in (sites or {}).items():
+            site.setdefault('smu',f'SMU2400_{name}')
+            site.setdefault('dmm',f'Fluke_8840A_MM_{name}')
+            site['relay'] = bench.relay_port(name)
+    else:
+        manager = pyvisa.ResourceManager(backend) if backend else None
+    profiler = Profiler() if plan.get('profile') else None
+    rm = SessionPool(manager,batch=plan.get('batch',True),aliases=plan.get('aliases'),profiler=profiler)
+    router = PinRouter(RelayBoard(port=relay,profiler=profiler)) if relay else None
+    stream_fmt = plan.get('stream_fmt','csv')
+    store = ResultStore(f'{base}_store',tests,len(pins))
+    hists = HistogramSet(tests)
+    flow = plan.get('flow',{})
+    depends = {t:tuple(d) for t,d in flow.get('depends',{}).items()}
+    chip_set = TotalDataset(tests,router,sites,
+                            ResultStream(f'{base}_results.{stream_fmt}',stream_fmt),
+                            store,hists,rm,TestFlow(depends,flow.get('stop_on_fail'),flow.get('bins')),
+                            plan_options(plan),bool(plan.get('drive_sweep',False)))
+
+    start = time.monotonic()
+    chip_count = 1
+    for _ in range(int(plan.get('chips',1))):
+        if bench is not None:
+            bench.next_chip()
+        if chip_set.sites:
+            chip_count = chip_set.run_sites(pins,voltages,chip_count)[-1].num+1
+            continue
+        chip = ICDataset(chip_set.rm,chip_count,pins,voltages,chip_set.router,chip_set.expected)
+        chip.prompt = log_prompt
+        chip_set.add_chip(chip)
+        chip_set.run_tests(chip)
+        chip_set.finish_chip(chip)
+        chip_count += 1
+    elapsed = time.monotonic()-start
+
+    chip_set.close()
+    write_summary(store,fname,tests)
+    if plan.get('hist_dir'):
+        renderer = HistogramRenderer(hists)
+        renderer.close()
+        renderer.save(plan['hist_dir'])
+    if profiler is not None:
+        profiler.write_summary(f'{base}_profile_pins.csv',by=('test','pin'))
+        profiler.write_summary(f'{base}_profile_commands.csv',by=('test','instrument','op','cmd'))
+        profiler.write_trace(f'{base}_trace.csv')
+    return summary(store,tests,elapsed)
+
+# Lot summary as text
+def summary(store,tests,elapsed):
+    agg = store.aggregate()
+    passed = int(store.chip_passed().sum())
+    lines = [f'Chips tested: {store.count}',
+             f'Chips passed: {passed} ({100*passed/max(store.count,1):.1f}%)',
+             f'Time: {elapsed:.1f} s ({3600*store.count/elapsed if elapsed else 0:.0f} chips/h)']
+    for t in tests:
+        i,_,k = store.index(t,'pin 1')
+        n = int(agg['count'][i,:,k].sum())
+        skipped = int(agg['skipped'][i,:,k].sum())
+        if n or skipped:
+            ok = int((agg['yield'][i,:,k]*agg['count'][i,:,k]).sum().round())
+            lines.append(f'    {t.title()}: {ok}/{n} measurements passed'+(f', {skipped} skipped' if skipped else ''))
+    for (h,s),count in store.bin_counts().items():
+        lines.append(f'    Bin {h}/{s} ({store.bin_names.get(s,"")}): {count} chips')
+    return '\n'.join(lines)
+
+if __name__ == '__main__':
+    parser = arg.ArgumentParser(description = 'Runs a lot from a test plan without the GUI')
+    parser.add_argument('plan', help = 'test plan, JSON or YAML')
+    parser.add_argument('--chips', type = int, help = 'number of chips to test, overrides the plan')
+    parser.add_argument('--output', help = 'report file, overrides the plan')
+    parser.add_argument('--profile', action = 'store_true', help = 'record every instrument command')
+    parser.add_argument('--verbose','-v', action = 'store_true', help = 'output verbosely')
+    args = parser.parse_args()
+
+    #if verbose is set, set logging level to debug, instead of info
+    if (args.verbose):
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        logging.basicConfig(level=logging.INFO)
+
+    try:
+        plan = load_plan(args.plan)
+    except (OSError,ValueError) as e:
+        logging.error(f'Could not load the test plan: {e}')
+        exit(-1)
+    if args.chips is not None:
+        plan['chips'] = args.chips
+    if args.output is not None:
+        plan['output'] = args.output
+    if args.profile:
+        plan['profile'] = True
+    print(run_plan(plan))
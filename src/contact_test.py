@@ -15,16 +15,19 @@ __author__ = "Victoria (Rice) Rodriguez"
 __email__ = "rice.rodriguez@ttu.edu"
 __status__ = "Prototype"
 
-import pyvisa
 import logging
 import argparse
-from resources import SMUSetup
+from resources import SMUSetup, MeasuredTest
+
+class ContactTest(MeasuredTest):
+    # Pass limits on the pin voltage (lower, upper)
+    limits = (0.75,1.5)
 
-class ContactTest:
     def get_valid_pins(pin_vals):
         return [f'pin {i+1}' for i,pin in enumerate(pin_vals) if pin != 'VCC' and pin != 'GND']
     
-    def __init__(self,rm,pin_vals):
+    # expected, profile and samples as in MeasuredTest
+    def __init__(self,rm,pin_vals,expected=None,profile=None,samples=1):
         self.rm = rm
         self.list_resources = self.rm.list_resources()
         # logging.info('All resources:\n',pprint.pformat(self.list_resources))
@@ -32,22 +35,24 @@ class ContactTest:
         self.instr = SMUSetup(src='curr',lev='250e-6',sens='volt',rm=rm)
         self.smu = self.instr.smu
         # List of measurements for each pin
-        self.meas = dict.fromkeys(ContactTest.get_valid_pins(pin_vals))
-        self.outcomes = dict.fromkeys(ContactTest.get_valid_pins(pin_vals))
+        self.init_results(ContactTest.get_valid_pins(pin_vals),expected,profile,samples)
 
     # Test on single pin
     def execute_test(self,pin,last=False):
+        # Other tests may have used the SMU since, only changes are sent
+        self.instr.setup(src='curr',lev='250e-6',sens='volt')
         # Turn the output on
-        self.smu.write('outp on')
+        self.instr.output(True)
         # Only get the value we want
-        self.smu.write(f'form:elem volt')
+        self.instr.set_elements('volt')
         # Read the voltage
-        res = self.smu.query('read?')
+        res = self.measure_for(ContactTest.limits,pin)
         if last:
-            self.smu.write('*rst;outp off;*cls')
+            self.instr.reset()
+        return self.record(pin,res)
 
-        fres = float(f'{float(res):.3f}')
-        self.meas[pin] = fres
+    def record(self,pin,res):
+        fres = self.keep(pin,res)
         self.outcomes[pin] = fres < 1.5 and fres > 0.75
         return fres
             
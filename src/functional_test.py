@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+'''
+Description:
+    The functional test checks that every gate of the DUT gives the right
+    output for every combination of its inputs. The relay board drives the
+    inputs and reads the outputs back. Nothing else may be connected to the
+    pins: on the station the router releases the SMU and DMM relays before
+    the test's steps (ICDataset.run_plan).
+
+Procedure:
+    1. Make the truth table of every gate from the pin map (gate_map): row
+       r drives input j of every gate with bit j of r, so the gates are
+       tested at the same time and the table has as many vectors as the
+       widest gate needs. The expected outputs come from the logic function
+       of the gates, for every vector and output at once.
+    2. Send the vectors to the relay board in batches (RelayBoard.run_vectors),
+       each batch one frame and one answer with the output states after
+       every vector in it.
+    3. Compare the output states with the expected outputs in one pass. An
+       output passes when it was right for every vector.
+
+    The table only depends on the pins and the logic function, so it is
+    made once and used for every chip of the lot. The first step of the
+    test on a chip runs every vector, the steps of the other outputs only
+    record what was read.
+
+Outcomes:
+    The measurement of an output is the number of vectors it was wrong for.
+    Passing Condition: 0
+    Failing Condition: anything else
+'''
+__author__ = "Victoria (Rice) Rodriguez"
+__email__ = "rice.rodriguez@ttu.edu"
+__status__ = "Prototype"
+
+import logging
+import argparse
+from resources import RelayBoard, SessionPool, LazyModule, gate_map, pin_number
+
+np = LazyModule('numpy')
+
+class FunctionalTest:
+    # Pass limits on the number of wrong vectors (lower, upper)
+    limits = (None,0)
+
+    # Output of a gate for each row of x, vectors x inputs of the gate
+    LOGIC = {'or':lambda x: x.any(1),
+             'and':lambda x: x.all(1),
+             'nor':lambda x: ~x.any(1),
+             'nand':lambda x: ~x.all(1),
+             'xor':lambda x: x.sum(1) % 2 == 1,
+             'xnor':lambda x: x.sum(1) % 2 == 0}
+
+    # Truth tables made so far, by (pins, logic)
+    TABLES = {}
+
+    def get_valid_pins(pin_vals):
+        return [f'pin {i+1}' for i,pin in enumerate(pin_vals) if pin == 'OUT']
+
+    # board is the RelayBoard that drives the inputs, logic the function of
+    # the gates of the DUT, one of LOGIC
+    def __init__(self,rm,board,pin_vals,logic='or'):
+        if logic not in FunctionalTest.LOGIC:
+            raise ValueError(f'Unknown logic function {logic}, use one of {", ".join(FunctionalTest.LOGIC)}.')
+        self.rm = rm
+        self.logic = logic
+        self.board = board
+        pins = FunctionalTest.get_valid_pins(pin_vals)
+        self.meas = dict.fromkeys(pins)
+        self.outcomes = dict.fromkeys(pins)
+        # Input masks of the vectors each output was wrong for
+        self.failures = dict.fromkeys(pins)
+        self.vectors,self.expected,self.outputs = FunctionalTest.truth_table(pin_vals,logic)
+        self.done = False
+
+    # Relay board mask of each pin, as an array
+    def masks(pins):
+        return np.array([1 << (RelayBoard.NUM_RELAYS-pin_number(p)) for p in pins],dtype=np.int64)
+
+    # Input mask of every vector, the expected output of every gate for
+    # each (vectors x gates) and the gates' output pins. Outputs without
+    # inputs aren't tested.
+    def truth_table(pin_vals,logic):
+        key = (tuple(pin_vals),logic)
+        if key not in FunctionalTest.TABLES:
+            gates = {out:ins for out,ins in gate_map(pin_vals).items() if ins}
+            width = max((len(ins) for ins in gates.values()),default=0)
+            # Bit j of every row, vectors x widest gate
+            bits = (np.arange(1 << width)[:,None] >> np.arange(width)) & 1 > 0
+            vectors = np.zeros(len(bits),dtype=np.int64)
+            expected = np.zeros((len(bits),len(gates)),dtype=bool)
+            for k,ins in enumerate(gates.values()):
+                x = bits[:,:len(ins)]
+                vectors += x @ FunctionalTest.masks(ins)
+                expected[:,k] = FunctionalTest.LOGIC[logic](x)
+            FunctionalTest.TABLES[key] = (vectors,expected,list(gates))
+            logging.debug(f'Functional test of {len(gates)} {logic} gates in {len(vectors)} vectors')
+        return FunctionalTest.TABLES[key]
+
+    # Test on single pin, every vector is run the first time. last is
+    # taken like the other tests do, there is no instrument to reset.
+    def execute_test(self,pin,last=False):
+        if not self.done:
+            self.run_vectors()
+            self.done = True
+        return self.meas[pin]
+
+    # Run every vector and check every output
+    def run_vectors(self):
+        states = np.array(self.board.run_vectors(self.vectors.tolist()),dtype=np.int64)
+        # Output states read back, vectors x gates
+        actual = (states[:,None] & FunctionalTest.masks(self.outputs)) != 0
+        wrong = actual != self.expected
+        for k,pin in enumerate(self.outputs):
+            self.meas[pin] = int(wrong[:,k].sum())
+            self.outcomes[pin] = self.meas[pin] == 0
+            self.failures[pin] = self.vectors[wrong[:,k]].tolist()
+            logging.info(f'Functional Test for {pin.capitalize()}: {self.meas[pin]} of {len(self.vectors)} vectors wrong')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'The Functional Test checks every gate of the DUT against its truth table')
+    parser.add_argument('--verbose','-v', action = 'store_true', help = 'output verbosely')
+    parser.add_argument('--logic', choices = list(FunctionalTest.LOGIC), default = 'or', help = 'logic function of the gates')
+    parser.add_argument('--port', help = 'serial port of the relay board, the simulated bench without it')
+    args = parser.parse_args()
+
+    #if verbose is set, set logging level to debug, instead of warning
+    if (args.verbose):
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        logging.basicConfig(level=logging.WARNING)
+
+    pins = ['IN','IN','OUT','IN','IN','OUT','GND','OUT','IN','IN','OUT','IN','IN','VCC']
+    if args.port is None:
+        from resources import SimBench
+        bench = SimBench(time_scale=0)
+        rm = SessionPool(bench.resource_manager())
+        board = RelayBoard(port=bench.relay_port())
+    else:
+        rm = SessionPool()
+        board = RelayBoard(port=args.port)
+    ft = FunctionalTest(rm,board,pins,args.logic)
+    for pin in FunctionalTest.get_valid_pins(pins):
+        ft.execute_test(pin)
+    print(ft.meas)
+    print(ft.failures)
+    rm.close()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+'''
+Description:
+    Histograms of every test and pin measurement of a lot, kept as bin
+    counts that are updated once per chip. Adding a chip costs the same
+    however far into the lot it is, nothing goes back over the chips
+    already tested.
+
+    Bins have a fixed width, bin i holding [i*width, (i+1)*width). The width
+    comes from the test limits, or from the first value of a one-sided
+    test. If a histogram spreads over more than max_bins bins the width is
+    doubled, which merges bins i into i//2 exactly, so the counts never
+    need the measurements again.
+
+    HistogramRenderer draws the tabs in a thread of its own with the Agg
+    backend of matplotlib, at most once every interval seconds, and only
+    the tabs whose counts changed since they were last drawn.
+'''
+__author__ = "Victoria (Rice) Rodriguez"
+__email__ = "rice.rodriguez@ttu.edu"
+__status__ = "Prototype"
+
+import os
+import math
+import shutil
+import logging
+import tempfile
+import threading
+import time
+
+class Histogram:
+    def __init__(self,lower=None,upper=None,bins=40,max_bins=200):
+        self.lower = lower
+        self.upper = upper
+        self.bins = bins
+        self.max_bins = max_bins
+        self.width = None
+        if lower is not None and upper is not None and upper > lower:
+            self.width = (upper-lower)/bins
+        # Bin index -> count
+        self.counts = {}
+        self.n = 0
+
+    def add(self,x):
+        if self.width is None:
+            # One-sided or no limits, scale the bins to the first value
+            ref = abs(x) or abs(self.lower or self.upper or 0) or 1.0
+            self.width = ref/self.bins
+        i = math.floor(x/self.width)
+        self.counts[i] = self.counts.get(i,0)+1
+        self.n += 1
+        while max(self.counts)-min(self.counts) >= self.max_bins:
+            self.merge()
+
+    # Double the bin width
+    def merge(self):
+        merged = {}
+        for i,c in self.counts.items():
+            merged[i//2] = merged.get(i//2,0)+c
+        self.counts = merged
+        self.width *= 2
+
+    # Left edges and counts of the bins, empty ones included
+    def series(self):
+        if not self.counts:
+            return [],[]
+        idx = range(min(self.counts),max(self.counts)+1)
+        return [i*self.width for i in idx],[self.counts.get(i,0) for i in idx]
+
+class HistogramSet:
+    def __init__(self,tests,bins=40):
+        self.tests = tests
+        self.bins = bins
+        # test -> {pin: Histogram}
+        self.hists = {t:{} for t in tests}
+        # Bumped every time a test's counts change, the renderer compares
+        # it with the version it last drew
+        self.versions = {t:0 for t in tests}
+        self.lock = threading.Lock()
+
+    def update(self,chip,tests=None):
+        with self.lock:
+            for t in tests or self.tests:
+                ref = chip.refs.get(t)
+                if ref is None:
+                    continue
+                lower,upper = getattr(ref,'limits',(None,None))
+                changed = False
+                for p,m in ref.meas.items():
+                    if m is None:
+                        continue
+                    if p not in self.hists[t]:
+                        self.hists[t][p] = Histogram(lower,upper,self.bins)
+                    self.hists[t][p].add(float(m))
+                    changed = True
+                if changed:
+                    self.versions[t] += 1
+
+    # Copy of one test's bins to draw from outside the lock
+    def snapshot(self,test):
+        with self.lock:
+            h = self.hists[test]
+            return self.versions[test],{p:(h[p].series(),h[p].width,h[p].lower,h[p].upper) for p in h}
+
+class HistogramRenderer:
+    def __init__(self,hists,interval=2.0,size=(5,3.5),dpi=80):
+        self.hists = hists
+        self.interval = interval
+        self.size = size
+        self.dpi = dpi
+        self.dir = tempfile.mkdtemp(prefix='histograms_')
+        # test -> (version drawn, image file)
+        self.cache = {}
+        # Tabs drawn since the GUI last asked
+        self.new = {}
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self.loop,daemon=True)
+        self.thread.start()
+
+    # Ask for a redraw, called from the chip loop. It only sets a flag.
+    def request(self):
+        self.wake.set()
+
+    def loop(self):
+        last = 0
+        while not self.stop.is_set():
+            self.wake.wait()
+            if self.stop.is_set():
+                break
+            # Throttle, whatever comes in meanwhile is drawn in one go
+            wait = last+self.interval-time.monotonic()
+            if wait > 0 and self.stop.wait(wait):
+                break
+            self.wake.clear()
+            self.render_all()
+            last = time.monotonic()
+
+    def render_all(self):
+        for t in self.hists.tests:
+            try:
+                self.render(t)
+            except ImportError:
+                logging.warning('matplotlib is not installed, histograms are not drawn.')
+                self.stop.set()
+                return
+            except Exception as e:
+                logging.error(f'Could not draw the histogram of {t}: {e}')
+
+    # Draw one tab unless it is unchanged since it was last drawn
+    def render(self,test):
+        version,pins = self.hists.snapshot(test)
+        if not pins or self.cache.get(test,(None,))[0] == version:
+            return self.cache.get(test,(None,None))[1]
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        cols = min(4,len(pins))
+        rows = -(-len(pins)//cols)
+        fig = Figure(figsize=(self.size[0]*cols/2,self.size[1]*rows/2),dpi=self.dpi)
+        FigureCanvasAgg(fig)
+        for n,(p,((edges,counts),width,lower,upper)) in enumerate(pins.items()):
+            ax = fig.add_subplot(rows,cols,n+1)
+            ax.bar(edges,counts,width=width,align='edge')
+            for lim in (lower,upper):
+                if lim is not None:
+                    ax.axvline(lim,color='red',linestyle='--')
+            ax.set_title(p.title(),fontsize=8)
+            ax.tick_params(labelsize=6)
+        fig.suptitle(test.title(),fontsize=10)
+        fig.tight_layout()
+        fname = os.path.join(self.dir,f'{test.replace(" ","_")}.png')
+        # Swapped in whole so the GUI never loads a half written image
+        fig.savefig(f'{fname}.tmp',format='png')
+        os.replace(f'{fname}.tmp',fname)
+        with self.lock:
+            self.cache[test] = (version,fname)
+            self.new[test] = fname
+        return fname
+
+    # Tabs drawn since the last call, as test -> image file, for the GUI
+    # thread to show
+    def ready(self):
+        with self.lock:
+            new,self.new = self.new,{}
+        return new
+
+    def close(self):
+        self.stop.set()
+        self.wake.set()
+        self.thread.join()
+
+    # Bring every tab up to date and copy the images to folder
+    def save(self,folder):
+        os.makedirs(folder,exist_ok=True)
+        for t in self.hists.tests:
+            try:
+                fname = self.render(t)
+            except ImportError:
+                logging.warning('matplotlib is not installed, histograms are not saved.')
+                return
+            if fname is not None:
+                shutil.copy(fname,os.path.join(folder,os.path.basename(fname)))
+        logging.debug(f'Saved histograms to {folder}')
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+'''
+Description:
+    Times how long it takes to import each module of the station in a fresh
+    interpreter, and lists which of the heavy dependencies (pyvisa, NumPy,
+    PySimpleGUI, pyserial, matplotlib) the import pulled in. Importing a
+    module should only load what that module needs straight away, the rest
+    is loaded when it is first used.
+
+Procedure:
+    1. Start a new Python process per module and repeat, so every import is
+       a cold one.
+    2. Keep the best time of the repeats.
+    3. Print the times and the heavy modules that got loaded.
+'''
+__author__ = "Victoria (Rice) Rodriguez"
+__email__ = "rice.rodriguez@ttu.edu"
+__status__ = "Prototype"
+
+import os
+import sys
+import json
+import argparse as arg
+import subprocess
+
+MODULES = ['resources','result_stream','result_store','histograms',
+           'contact_test','voltage_threshold_test','user_interface','batch_runner']
+HEAVY = ['pyvisa','numpy','PySimpleGUI','serial','matplotlib']
+
+SNIPPET = '''
+import sys, time, json
+t = time.perf_counter()
+import {module}
+t = time.perf_counter()-t
+print(json.dumps([t,[m for m in {heavy} if m in sys.modules]]))
+'''
+
+# (seconds, heavy modules loaded) of one cold import
+def time_import(module):
+    out = subprocess.run([sys.executable,'-c',SNIPPET.format(module=module,heavy=HEAVY)],
+                         capture_output=True,text=True,cwd=os.path.dirname(os.path.abspath(__file__)))
+    if out.returncode != 0:
+        return None,out.stderr.strip().splitlines()[-1]
+    t,loaded = json.loads(out.stdout)
+    return t,loaded
+
+if __name__ == '__main__':
+    parser = arg.ArgumentParser(description = 'Times a cold import of every module')
+    parser.add_argument('modules', nargs = '*', default = MODULES, help = 'modules to time')
+    parser.add_argument('--repeat', '-n', type = int, default = 5, help = 'fresh interpreters per module')
+    args = parser.parse_args()
+
+    for module in args.modules:
+        best,loaded = None,[]
+        for _ in range(args.repeat):
+            t,loaded = time_import(module)
+            if t is None:
+                break
+            best = t if best is None else min(best,t)
+        if best is None:
+            print(f'{module:<24} failed: {loaded}')
+        else:
+            print(f'{module:<24} {1000*best:8.1f} ms   loads: {", ".join(loaded) or "-"}')
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+'''
+Description:
+    Running statistics for a lot, updated one measurement at a time so they
+    are up to date at any point of the lot without going back over the
+    chips already tested.
+
+    For every test and pin this keeps the count, mean and variance
+    (Welford's method), the min and max, the pass yield and the Cpk against
+    the test limits. A limit of None means the test is one-sided.
+'''
+__author__ = "Victoria (Rice) Rodriguez"
+__email__ = "rice.rodriguez@ttu.edu"
+__status__ = "Prototype"
+
+from math import sqrt, inf
+
+class RunningStats:
+    def __init__(self,lower=None,upper=None):
+        self.lower = lower
+        self.upper = upper
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = inf
+        self.max = -inf
+        self.passed = 0
+
+    def add(self,x,outcome=None):
+        x = float(x)
+        self.n += 1
+        delta = x-self.mean
+        self.mean += delta/self.n
+        self.m2 += delta*(x-self.mean)
+        self.min = min(self.min,x)
+        self.max = max(self.max,x)
+        if outcome:
+            self.passed += 1
+
+    # Sample variance, None until there are two values
+    def variance(self):
+        return self.m2/(self.n-1) if self.n > 1 else None
+
+    def stdev(self):
+        var = self.variance()
+        return None if var is None else sqrt(var)
+
+    def pass_yield(self):
+        return self.passed/self.n if self.n else None
+
+    # Process capability against whichever limits the test has
+    def cpk(self):
+        s = self.stdev()
+        if not s:
+            return None
+        sides = []
+        if self.upper is not None:
+            sides.append((self.upper-self.mean)/(3*s))
+        if self.lower is not None:
+            sides.append((self.mean-self.lower)/(3*s))
+        return min(sides) if sides else None
+
+class LotStatistics:
+    def __init__(self):
+        # (test, pin) -> RunningStats
+        self.stats = {}
+
+    # Add every measurement of a finished chip. The limits come from the
+    # test objects the first time a test is seen.
+    def update(self,chip,tests):
+        for t in tests:
+            ref = chip.refs.get(t)
+            if ref is None:
+                continue
+            lower,upper = getattr(ref,'limits',(None,None))
+            for p,m in ref.meas.items():
+                if m is None:
+                    continue
+                if (t,p) not in self.stats:
+                    self.stats[(t,p)] = RunningStats(lower,upper)
+                self.stats[(t,p)].add(m,ref.outcomes.get(p))
+
+    def get(self,test,pin):
+        return self.stats.get((test,pin))
+
+    def cpk(self):
+        return {key:s.cpk() for key,s in self.stats.items()}
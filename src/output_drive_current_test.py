@@ -19,60 +19,127 @@ Procedure
 
 Pass:
   IOH >= 2.10 mA and IOL >= -1.00 mA
+
+List sweep:
+  With sweep on and a way to set the DUT inputs (the relay board test
+  cases), execute_sweep() measures both at once: 0.40 and 2.40 VDC go in
+  the SMU source list, the inputs are set LOW before the first bus
+  trigger and HIGH before the second, and IOL and IOH come back in one
+  read of the trace buffer. Each reading is taken SETTLE after its trigger,
+  and the inputs aren't switched before it is stored. With samples above 1
+  each trigger takes samples readings of its level, and the statistics of
+  each level come from its part of the buffer. A result too close to its
+  limit for the profile it was taken with is measured again on its own
+  with the precise profile.
 '''
 __author__ = "Victoria (Rice) Rodriguez"
 __email__ = "rice.rodriguez@ttu.edu"
 __status__ = "Prototype"
-import pyvisa
 import logging
-from resources import SMUSetup
+from resources import SMUSetup, MeasuredTest
     
-class OutputDriveCurrentTest:
+class OutputDriveCurrentTest(MeasuredTest):
+    # Source level for each mode
+    LEVELS = {'LOW':0.4,'HIGH':2.4}
+    # Source delay of the list sweep, from the trigger to the reading: the
+    # relays that set the inputs and the DUT output settling (s)
+    SETTLE = 0.02
+
     def get_valid_pins(pin_vals):
         return [f'pin {i+1}' for i,pin in enumerate(pin_vals) if pin == 'OUT']
 
-    def __init__(self,rm,vcc,pin_vals):
+    # set_inputs(high) sets every input of the DUT HIGH or LOW, for the
+    # sweep. expected, profile and samples as in MeasuredTest, the last
+    # readings are kept per (pin, mode).
+    def __init__(self,rm,vcc,pin_vals,set_inputs=None,expected=None,profile=None,samples=1):
         self.rm = rm
+        self.set_inputs = set_inputs
         self.instr = SMUSetup(src='volt',lev='0.40',sens='curr',rm=self.rm)
         self.smu = self.instr.smu
-        self.meas = dict.fromkeys(OutputDriveCurrentTest.get_valid_pins(pin_vals))
-        self.outcomes = dict.fromkeys(OutputDriveCurrentTest.get_valid_pins(pin_vals))
-        self.hi = OutputDriveCurrentTestHigh(self.meas,self.outcomes)
-        self.lo = OutputDriveCurrentTestLow(self.meas,self.outcomes)
+        pins = OutputDriveCurrentTest.get_valid_pins(pin_vals)
+        self.init_results(pins,expected,profile,samples)
+        # Each half keeps its own results, self.meas has the latest of either
+        self.hi = OutputDriveCurrentTestHigh(dict.fromkeys(pins),dict.fromkeys(pins))
+        self.lo = OutputDriveCurrentTestLow(dict.fromkeys(pins),dict.fromkeys(pins))
+        self.hi.stats = dict.fromkeys(pins)
+        self.lo.stats = dict.fromkeys(pins)
 
     def execute_test(self,pin,mode,last=False):
         if mode.upper() == 'HIGH':
             self.instr.setup(src='volt',lev='2.4',sens='curr')
         else:
             self.instr.setup(src='volt',lev='0.4',sens='curr')
-        self.smu.write('outp on')
-        self.smu.write('form:elem curr')
-        res = self.smu.query('read?')
-        fres = float(f'{float(res):.3f}')
-        self.meas[pin] = fres
-        self.outcomes[pin] = (fres >= 0.0021) if mode.upper() == 'HIGH' else (fres >= -0.001)
+        self.instr.output(True)
+        self.instr.set_elements('curr')
+        res = self.measure(pin,mode)
         if last:
-            self.smu.write('*rst;outp off;*cls')
+            self.instr.reset()
             # self.rm.close()
-        if mode.upper() == 'HIGH':
-            self.hi.meas = self.meas
-            self.hi.outcomes = self.outcomes
-            return self.hi
-        elif mode.upper() == 'LOW':
-            self.lo.meas = self.meas
-            self.lo.outcomes = self.outcomes
-            return self.lo
+        return self.record(pin,mode,res)
 
-        else: return self
+    # IOL and IOH of pin in one list sweep, the inputs switched between the
+    # two triggers. Returns the LOW and HIGH results.
+    def execute_sweep(self,pin,last=False):
+        modes = ('LOW','HIGH')
+        limits = {'LOW':self.lo.limits,'HIGH':self.hi.limits}
+        expected = self.expected
+        self.instr.setup(src='volt',lev='0.4',sens='curr')
+        self.instr.set_elements('curr')
+        name = self.instr.profile_for([(limits[m],expected.get((pin,m))) for m in modes],self.profile)
+        n = self.samples
+        self.instr.load_list([OutputDriveCurrentTest.LEVELS[m] for m in modes],delay=OutputDriveCurrentTest.SETTLE,count=n)
+        self.instr.output(True)
+        self.instr.start_list(len(modes)*n)
+        for i,mode in enumerate(modes):
+            self.set_inputs(mode == 'HIGH')
+            self.instr.trigger()
+            # The inputs stay put until the readings are in the buffer
+            self.instr.wait_points((i+1)*n)
+        buf = self.instr.fetch('trac:data?')
+        results = []
+        for i,mode in enumerate(modes):
+            # The result of measure_for(): the reading, or the STATS of the
+            # samples
+            vals = buf[i*n:(i+1)*n]
+            res = [float(vals[0])] if n == 1 else SMUSetup.summarize(vals)
+            if SMUSetup.needs_precise(name,res[0],limits[mode]):
+                logging.debug(f'{res[0]} is close to {limits[mode]} with the {name} profile, measuring {mode} again')
+                self.set_inputs(mode == 'HIGH')
+                self.instr.setup(src='volt',lev=str(OutputDriveCurrentTest.LEVELS[mode]),sens='curr')
+                self.instr.set_profile('precise')
+                res = self.instr.measure('curr') if n == 1 else self.instr.acquire(n,'curr')
+            results.append(self.record(pin,mode,res))
+        if last:
+            self.instr.reset()
+        return results
+
+    def measure(self,pin,mode):
+        limits = self.hi.limits if mode.upper() == 'HIGH' else self.lo.limits
+        return self.measure_for(limits,(pin,mode.upper()))
+
+    def record(self,pin,mode,res):
+        fres = self.keep(pin,res,(pin,mode.upper()))
+        self.outcomes[pin] = (fres >= 0.0021) if mode.upper() == 'HIGH' else (fres >= -0.001)
+        half = self.hi if mode.upper() == 'HIGH' else self.lo if mode.upper() == 'LOW' else None
+        if half is not None:
+            half.meas[pin] = self.meas[pin]
+            half.outcomes[pin] = self.outcomes[pin]
+            half.stats[pin] = self.stats[pin]
+            return half
+        return self
 
 class OutputDriveCurrentTestHigh:
     get_valid_pins = OutputDriveCurrentTest.get_valid_pins
+    # Pass limits on IOH (lower, upper)
+    limits = (0.0021,None)
     def __init__(self,meas,outcomes):
         self.meas = meas
         self.outcomes = outcomes
 
 class OutputDriveCurrentTestLow:
     get_valid_pins = OutputDriveCurrentTest.get_valid_pins
+    # Pass limits on IOL (lower, upper)
+    limits = (-0.001,None)
     def __init__(self,meas,outcomes):
         self.meas = meas
         self.outcomes = outcomes
@@ -31,41 +31,46 @@ __credits__ = "Victoria Rodriguez"
 __email__ = "isaac.morales@ttu.edu"
 __status__ = "Prototype"
 
-import pyvisa
 import logging
 import argparse
-from resources import SMUSetup
+from resources import SMUSetup, MeasuredTest
+
+class OutputShortCurrentTest(MeasuredTest):
+    # Pass limits on the short current (lower, upper)
+    limits = (0.04,None)
 
-class OutputShortCurrentTest:
     def get_valid_pins(pin_vals):
         return [f'pin {i+1}' for i,pin in enumerate(pin_vals) if pin == 'OUT']
 
-    def __init__(self,rm,pin_vals):
+    # expected, profile and samples as in MeasuredTest
+    def __init__(self,rm,pin_vals,expected=None,profile=None,samples=1):
         self.rm = rm
         self.msg = 'Please disconnect all output pins from the DUT and connect the SMU to the input pin.'
         self.instr = SMUSetup(src='volt',lev=0,sens='curr',rm=rm)
         self.smu = self.instr.smu
-        self.meas = dict.fromkeys(OutputShortCurrentTest.get_valid_pins(pin_vals))
-        self.outcomes = dict.fromkeys(OutputShortCurrentTest.get_valid_pins(pin_vals))
+        self.init_results(OutputShortCurrentTest.get_valid_pins(pin_vals),expected,profile,samples)
 
         #basically the same as the power consumption test
     def execute_test(self,pin,last=False):
-        # if not vcc is None:
-        #     self.instr.setup('volt',vcc,'curr')
+        # Other tests may have used the SMU since, only changes are sent
+        self.instr.setup(src='volt',lev=0,sens='curr')
         #turn the output on
         logging.debug(f'Outputting 0V from SMU')
-        self.smu.write('outp on')
-        self.smu.write('form:elem curr')
-        res = self.smu.query('read?')
+        self.instr.output(True)
+        self.instr.set_elements('curr')
+        res = self.measure_for(OutputShortCurrentTest.limits,pin)
         if last:
-            self.smu.write('*rst;outp off;*cls')
+            self.instr.reset()
             # self.rm.close()
 
         # logging.warning('read: {}'.format(self.res))
-        logging.info(f'Output Short Current Test for {pin.capitalize()}: {res}')
-        fres = float(f'{float(res):.3f}')
-        self.meas[pin] = fres
+        return self.record(pin,res)
+
+    def record(self,pin,res):
+        fres = self.keep(pin,res)
+        logging.info(f'Output Short Current Test for {pin.capitalize()}: {fres}')
         self.outcomes[pin] = fres >= 0.04
+        return fres
 
 
 if __name__ == '__main__':
@@ -13,23 +13,25 @@ __author__ = "Victoria (Rice) Rodriguez"
 __email__ = "rice.rodriguez@ttu.edu"
 __status__ = "Prototype"
 
-import pyvisa
 import logging
 import argparse
-from resources import SMUSetup
+from resources import SMUSetup, MeasuredTest
+
+class PowerConsumptionTest(MeasuredTest):
+    # Pass limits on ICC (lower, upper)
+    limits = (None,0.07)
 
-class PowerConsumptionTest:
     def get_valid_pins(pin_vals):
         return [f'pin {i+1}' for i,pin in enumerate(pin_vals) if pin == 'VCC']
     
-    def __init__(self,rm,vcc,pin_vals):
+    # expected, profile and samples as in MeasuredTest
+    def __init__(self,rm,vcc,pin_vals,expected=None,profile=None,samples=1):
         self.rm = rm
         self.msg = 'Please disconnect all output pins from the DUT and connect the SMU to the VCC pin.'
         self.instr = SMUSetup(src='volt',lev=vcc,sens='curr',rm=rm)
         self.smu = self.instr.smu
         # List of measurements for each pin
-        self.meas = dict.fromkeys(PowerConsumptionTest.get_valid_pins(pin_vals))
-        self.outcomes = dict.fromkeys(PowerConsumptionTest.get_valid_pins(pin_vals))
+        self.init_results(PowerConsumptionTest.get_valid_pins(pin_vals),expected,profile,samples)
 
         
     # Actually perform the test
@@ -37,19 +39,20 @@ class PowerConsumptionTest:
         if not vcc is None:
             self.instr.setup('volt',vcc,'curr')
         # Turn the output on
-        self.smu.write('outp on')
+        self.instr.output(True)
         # Only get the value we want
-        self.smu.write('form:elem curr')
+        self.instr.set_elements('curr')
         # Read the current
-        res = self.smu.query('read?')
+        res = self.measure_for(PowerConsumptionTest.limits,pin)
         if last:
-            self.smu.write('*rst;outp off;*cls')
+            self.instr.reset()
         #     self.rm.close()
+        return self.record(pin,res)
 
-        fres = float(f'{float(res):.3f}')
-        self.meas[pin] = fres
+    def record(self,pin,res):
+        fres = self.keep(pin,res)
         self.outcomes[pin] = fres <= 0.07
-        return res
+        return fres
         
 
 if __name__ == '__main__':
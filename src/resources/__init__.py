@@ -1,4 +1,37 @@
-from .smu_setup import SMUSetup
-from .dmm_setup import DMMSetup
-from .relay_board import RelayBoard
-from .gui_helper import make_window
+# Everything is imported on first use (PEP 562), so 'import resources'
+# doesn't pull in pyvisa, pyserial or asyncio until something needs them
+import importlib
+
+_EXPORTS = {
+    'SessionPool':'session_pool',
+    'BatchedInstrument':'scpi_batch',
+    'SMUSetup':'smu_setup',
+    'DMMSetup':'dmm_setup',
+    'MeasuredTest':'measured_test',
+    'RelayBoard':'relay_board',
+    'PinRouter':'pin_router',
+    'gate_map':'pin_router',
+    'pin_number':'pin_router',
+    'AsyncSMU':'async_instruments',
+    'AsyncDMM':'async_instruments',
+    'AsyncRelayBoard':'async_instruments',
+    'execute_async':'async_instruments',
+    'SimBench':'simulation',
+    'SimResourceManager':'simulation',
+    'OrGateDUT':'simulation',
+    'Profiler':'profiler',
+    'LazyModule':'lazy',
+    'available':'lazy',
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    val = getattr(importlib.import_module(f'.{_EXPORTS[name]}',__name__),name)
+    globals()[name] = val
+    return val
+
+def __dir__():
+    return sorted(list(globals())+__all__)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+'''
+Description:
+    Asyncio front end for SMUSetup, DMMSetup and RelayBoard, so that
+    different instruments can be worked at the same time from one event
+    loop (the sites of a station, or a test and the relay board of the
+    next socket) instead of one blocking call after the other.
+
+        smu = AsyncSMU(SMUSetup('volt',0,'volt',rm=rm))
+        dmm = AsyncDMM(DMMSetup('volt',rm=rm))
+        await smu.set_level(1.2)
+        out = await dmm.read()
+
+    pyvisa and pyserial block, so every call runs in a thread. Each
+    instrument gets a single worker thread of its own, which keeps the
+    commands to one instrument in order while different instruments
+    overlap. If a handle ever has coroutine methods of its own they are
+    awaited directly instead.
+
+    execute_async() runs the execute_test of any test on the worker of its
+    SMU.
+'''
+__author__ = "Victoria (Rice) Rodriguez"
+__email__ = "rice.rodriguez@ttu.edu"
+__status__ = "Prototype"
+
+import functools
+from .lazy import LazyModule
+
+asyncio = LazyModule('asyncio')
+futures = LazyModule('concurrent.futures')
+
+class AsyncInstrument:
+    def __init__(self,setup):
+        self.setup = setup
+        # Instruments in a SessionPool share one worker per session
+        if hasattr(setup,'rm') and hasattr(setup.rm,'shared_state'):
+            shared = setup.rm.shared_state(setup.alias)
+            if 'executor' not in shared:
+                shared['executor'] = futures.ThreadPoolExecutor(max_workers=1)
+            self.executor = shared['executor']
+        else:
+            self.executor = futures.ThreadPoolExecutor(max_workers=1)
+
+    async def run(self,fn,*args,**kwargs):
+        if asyncio.iscoroutinefunction(fn):
+            return await fn(*args,**kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor,functools.partial(fn,*args,**kwargs))
+
+class AsyncSMU(AsyncInstrument):
+    async def configure(self,src,lev,sens,reset=False):
+        await self.run(self.setup.setup,src,lev,sens,reset)
+        await self.run(self.setup.flush)
+
+    async def set_level(self,lev):
+        self.setup.set_level(lev)
+        await self.run(self.setup.flush)
+
+    async def output(self,on=True):
+        self.setup.output(on)
+        await self.run(self.setup.flush)
+
+    async def measure(self,elem=None):
+        return await self.run(self.setup.measure,elem)
+
+    async def measure_for(self,limits,expected=None,elem=None,profile=None,samples=1):
+        return await self.run(self.setup.measure_for,limits,expected,elem,profile,samples)
+
+    async def acquire(self,n,elem=None,raw=False):
+        return await self.run(self.setup.acquire,n,elem,raw)
+
+    async def reset(self):
+        await self.run(self.setup.reset)
+
+class AsyncDMM(AsyncInstrument):
+    async def configure(self):
+        await self.run(self.setup.setup)
+
+    async def read(self):
+        return await self.run(self.setup.read)
+
+class AsyncRelayBoard(AsyncInstrument):
+    async def multirelay(self,list_pins=None):
+        await self.run(self.setup.multirelay,list_pins)
+
+    async def update(self,on=(),off=()):
+        await self.run(self.setup.update,on,off)
+
+    async def read_inputs(self):
+        return await self.run(self.setup.read_inputs)
+
+# execute_test of test without blocking the event loop
+async def execute_async(test,*args,**kwargs):
+    smu = getattr(test,'instr',None) or getattr(test,'smu_setup',None)
+    return await AsyncSMU(smu).run(test.execute_test,*args,**kwargs)
@@ -10,18 +10,35 @@ Procedure:
     3. Set the source mode.
     4. Set the level of the source.
     5. Set the sense mode.
+
+    The handle comes from the same SessionPool as the SMU's. setup() and
+    read() go through the same reconnecting wrapper (see reconnect.py), so
+    a failed read opens the session again, sets the DMM up and reads once
+    more instead of stopping the lot.
 '''
 __author__ = "Victoria (Rice) Rodriguez"
 __email__ = "rice.rodriguez@ttu.edu"
 __status__ = "Prototype"
 
-import pyvisa
 import logging
+from .lazy import LazyModule
+from .session_pool import SessionPool
+from .reconnect import reconnecting
+
+pyvisa = LazyModule('pyvisa')
 
 class DMMSetup:
-    def __init__(self,sens):
-        self.rm = pyvisa.ResourceManager()
-        self.dmm = None
+    KIND = 'DMM'
+
+    def __init__(self,sens,rm=None,alias='Fluke_8840A_MM'):
+        if rm is None:
+            rm = SessionPool.default()
+        elif not isinstance(rm,SessionPool):
+            rm = SessionPool(rm)
+        self.rm = rm
+        self.alias = alias
+        # Set while a reconnecting method runs
+        self.retrying = False
         self.__verify()
         self.setup()
 
@@ -30,11 +47,9 @@ class DMMSetup:
         # First get the SMU from the list of resources
         try:
             # 
-            self.dmm = self.rm.open_resource('Fluke_8840A_MM')
-            self.dmm.read_termination = '\n'
-            self.dmm.write_termination = '\n'
+            self.rm.open_resource(self.alias)
             logging.debug('Set DMM as %(self.dmm)s')
-            bytes_back=self.dmm.query('*IDN?')
+            bytes_back=self.rm.identity(self.alias)
             logging.debug('Received identity of DMM as: %(bytes_back)s')
 
         except AttributeError as err:
@@ -47,16 +62,42 @@ class DMMSetup:
             logging.error('Please connect to the DMM.')
             exit(-1)
 
+    # Live handle from the pool, the new one after anyone reconnected
+    @property
+    def dmm(self):
+        return self.rm.open_resource(self.alias)
+
     # mode = source mode, lev = how much to source, sens = sens mode
+    @reconnecting
     def setup(self):
-        try:
-            # First reset and clear status
-            # self.dmm.write('*rst;outp off;*cls')
-            # Set function for what to measure
-            # self.dmm.write(f'func "{sens}:dc"')
-            # Set to measure voltage 
-            self.dmm.write('* f1 r0')
+        # First reset and clear status
+        # self.dmm.write('*rst;outp off;*cls')
+        # Set function for what to measure
+        # self.dmm.write(f'func "{sens}:dc"')
+        # Set to measure voltage 
+        self.dmm.write('* f1 r0')
+
+    # Trigger a reading and return it
+    @reconnecting
+    def read(self):
+        return float(self.dmm.query('?'))
 
+    # Nothing is kept about the DMM, a new session only needs setup()
+    def snapshot(self):
+        return None
+
+    def invalidate(self):
+        pass
+
+    def restore(self,saved):
+        self.setup()
+
+    # Open the session again through the pool, True if it came back
+    def reconnect(self):
+        try:
+            self.rm.reconnect(self.alias)
         except pyvisa.errors.VisaIOError as err:
-            logging.error('Please connect to the SMU.')
+            logging.error('Please connect to the DMM.')
             logging.error(err)
+            return False
+        return True
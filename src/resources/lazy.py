@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+'''
+Description:
+    Stand-in for a module that is only imported the first time one of its
+    attributes is used. pyvisa, NumPy and PySimpleGUI each take a good part
+    of a second to import, and most runs of a CLI tool or an analysis
+    script never touch them, so they are bound with
+
+        pyvisa = LazyModule('pyvisa')
+
+    and the rest of the module uses them exactly as before. An except
+    clause like 'except pyvisa.errors.VisaIOError' is only looked up when
+    an exception is raised, so it doesn't import pyvisa either.
+
+    available(name) says whether a module is installed without importing
+    it, for the optional ones.
+'''
+__author__ = "Victoria (Rice) Rodriguez"
+__email__ = "rice.rodriguez@ttu.edu"
+__status__ = "Prototype"
+
+import importlib
+import importlib.util
+
+class LazyModule:
+    def __init__(self,name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        if self._module is None:
+            self.__dict__['_module'] = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self,attr):
+        return getattr(self._load(),attr)
+
+    def __setattr__(self,attr,val):
+        setattr(self._load(),attr,val)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f'<lazy module {self._name!r} ({state})>'
+
+def available(name):
+    return importlib.util.find_spec(name) is not None
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+'''
+Description:
+    What the SMU tests (contact, power consumption, output short current
+    and output drive current) have in common: a reading per pin taken with
+    SMUSetup.measure_for(), the last reading of each pin carried over to
+    the next chip, and the per-pin results.
+'''
+__author__ = "Victoria (Rice) Rodriguez"
+__email__ = "rice.rodriguez@ttu.edu"
+__status__ = "Prototype"
+
+from .smu_setup import SMUSetup
+
+# expected holds the last reading per pin, carried over from chip to chip by
+# whoever passes the same dict to each. profile is the measurement profile
+# (see SMUSetup), None picks one per pin from how close the last chip's
+# reading was to the limits. samples is the number of readings per pin,
+# averaged on the SMU; above 1 the mean is what is checked against the
+# limits, and the spread is kept in self.stats.
+class MeasuredTest:
+    def init_results(self,pins,expected=None,profile=None,samples=1):
+        self.expected = {} if expected is None else expected
+        self.profile = profile
+        self.samples = samples
+        self.meas = dict.fromkeys(pins)
+        self.outcomes = dict.fromkeys(pins)
+        # Mean, stdev, max and min per pin when more than one sample is taken
+        self.stats = dict.fromkeys(pins)
+
+    # Reading of the SMU for key (pin, or whatever the test files the last
+    # readings under) against limits
+    def measure_for(self,limits,key):
+        return self.instr.measure_for(limits,self.expected.get(key),profile=self.profile,samples=self.samples)
+
+    # Keep the reading res from measure_for() of pin, returns it as a float
+    def keep(self,pin,res,key=None):
+        fres = float(res[0])
+        self.stats[pin] = SMUSetup.statistics(res) if self.samples > 1 else None
+        self.expected[pin if key is None else key] = fres
+        self.meas[pin] = fres
+        return fres
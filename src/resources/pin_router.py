@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+'''
+Description:
+    Routes the SMU (and optionally the DMM) to the pin under test through the
+    relay board, so the tests don't have to ask the operator to move probes.
+
+    connect() sends the relay command and returns straight away, settle()
+    waits for what is left of the settling time. Handed to the SessionPool
+    as its hold, settle() is only waited for when the SMU next turns its
+    output on or reads, so the setup of the test goes out to the SMU while
+    the relays settle. The relays are never
+    switched with the SMU output on: whoever routes turns it off first
+    (switches() tells when connect() will change anything).
+
+Procedure:
+    1. Turn the SMU output off, then connect() the pin under test, and the
+       output pin for the DMM.
+    2. settle() before measuring, or rm.hold(router.settle).
+    3. release() all relays when the test is done.
+'''
+__author__ = "Victoria (Rice) Rodriguez"
+__email__ = "rice.rodriguez@ttu.edu"
+__status__ = "Prototype"
+
+import logging
+from time import monotonic, sleep
+
+# 'pin 3' or 3 -> 3
+def pin_number(pin):
+    return pin if isinstance(pin,int) else int(str(pin).split()[-1])
+
+# Map each output pin to the input pins of its gate. The pins are split in
+# the two sides of the DIP and each side is read from the top (pin 1 down
+# the left, the last pin down the right), where every OUT belongs to the
+# run of INs just above it.
+def gate_map(pin_vals):
+    n = len(pin_vals)
+    sides = [range(1,n//2+1),range(n,n//2,-1)]
+    gates = {}
+    for side in sides:
+        inputs = []
+        for num in side:
+            role = pin_vals[num-1]
+            if role == 'IN':
+                inputs.append(f'pin {num}')
+            elif role == 'OUT':
+                gates[f'pin {num}'] = inputs
+                inputs = []
+            else:
+                inputs = []
+    return gates
+
+class PinRouter:
+    # smu_map and dmm_map map pin numbers to relay numbers. By default relay
+    # n puts the SMU on pin n and the DMM is not switched.
+    def __init__(self,board,smu_map=None,dmm_map=None,settle=0.02):
+        self.board = board
+        self.smu_map = smu_map
+        self.dmm_map = dmm_map
+        self.settle_time = settle
+        self.switched_at = None
+        self.connected = (None,None)
+
+    def smu_relay(self,pin):
+        num = pin_number(pin)
+        return num if self.smu_map is None else self.smu_map[num]
+
+    def dmm_relay(self,pin):
+        if self.dmm_map is None:
+            return None
+        return self.dmm_map[pin_number(pin)]
+
+    # True when the DMM can be moved by the router
+    def routes_dmm(self):
+        return self.dmm_map is not None
+
+    # True if connect(pin,dmm_pin) would switch any relay
+    def switches(self,pin,dmm_pin=None):
+        return (pin,dmm_pin) != self.connected
+
+    # Switch the relays for pin (and dmm_pin) without waiting for them
+    def connect(self,pin,dmm_pin=None):
+        if not self.switches(pin,dmm_pin):
+            return
+        relays = [self.smu_relay(pin)]
+        if dmm_pin is not None and self.routes_dmm():
+            relays.append(self.dmm_relay(dmm_pin))
+        logging.debug(f'Routing SMU to {pin}, DMM to {dmm_pin}: relays {relays}')
+        self.board.multirelay(relays)
+        self.switched_at = monotonic()
+        self.connected = (pin,dmm_pin)
+
+    # Wait out what is left of the settling time since the last switch
+    def settle(self):
+        if self.switched_at is None:
+            return
+        left = self.settle_time-(monotonic()-self.switched_at)
+        if left > 0:
+            sleep(left)
+        self.switched_at = None
+
+    def release(self):
+        logging.debug('Releasing every relay')
+        self.board.multirelay([])
+        self.switched_at = monotonic()
+        self.connected = (None,None)
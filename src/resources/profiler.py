@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+'''
+Description:
+    Records every command sent to the instruments: when it went out, how
+    long it took, the bytes moved and which chip, test and pin it was for.
+    Records go in a ring buffer of fixed size, so a long lot keeps the
+    latest ones and the cost per command stays two clock reads and an
+    append.
+
+    Profiling is off unless a Profiler is given to the SessionPool and the
+    RelayBoard. Only then are their handles wrapped, so with it off the
+    tests talk to the instruments exactly as before.
+
+        prof = Profiler()
+        rm = SessionPool(profiler=prof)
+        board = RelayBoard(port='COM3',profiler=prof)
+        with prof.scope(chip=1,test='contact test',pin='pin 3'):
+            ...
+        prof.write_summary('profile.csv',by=('test','pin'))
+        prof.write_trace('trace.csv')
+
+    Bytes in are counted from the answer where there is one. Readings
+    parsed by pyvisa (query_ascii_values) are counted at 14 bytes a value,
+    which is what '+1.000000E+00,' takes.
+'''
+__author__ = "Victoria (Rice) Rodriguez"
+__email__ = "rice.rodriguez@ttu.edu"
+__status__ = "Prototype"
+
+import csv
+import threading
+from time import perf_counter
+from collections import deque
+
+class Profiler:
+    FIELDS = ('start','duration','instrument','op','cmd','bytes_out','bytes_in','chip','test','pin')
+    CONTEXT = ('chip','test','pin')
+
+    def __init__(self,size=100000):
+        self.records = deque(maxlen=size)
+        self.origin = perf_counter()
+        # Context of the chip, test and pin, per thread for multi-site
+        self.local = threading.local()
+
+    def context(self):
+        ctx = getattr(self.local,'ctx',None)
+        if ctx is None:
+            ctx = self.local.ctx = dict.fromkeys(Profiler.CONTEXT)
+        return ctx
+
+    # Set chip, test and/or pin for everything recorded from this thread
+    def set_context(self,**kwargs):
+        self.context().update(kwargs)
+
+    # Same as set_context, put back as it was at the end of the with block
+    def scope(self,**kwargs):
+        return _Scope(self,kwargs)
+
+    def record(self,start,instrument,op,cmd,bytes_out,bytes_in):
+        ctx = self.context()
+        self.records.append((start-self.origin,perf_counter()-start,instrument,op,cmd,
+                             bytes_out,bytes_in,ctx['chip'],ctx['test'],ctx['pin']))
+
+    # Wrap an open pyvisa resource or serial port
+    def wrap(self,inst,name):
+        if hasattr(inst,'readline'):
+            return ProfiledSerial(inst,name,self)
+        return ProfiledResource(inst,name,self)
+
+    def percentile(vals,q):
+        return vals[min(len(vals)-1,int(round(q*(len(vals)-1))))]
+
+    # Count, p50, p95 and total time and bytes for every group of records.
+    # by is any of the fields, e.g. ('test','pin') or ('test','cmd').
+    def summary(self,by=('test','pin')):
+        idx = [Profiler.FIELDS.index(f) for f in by]
+        groups = {}
+        for rec in list(self.records):
+            groups.setdefault(tuple(rec[i] for i in idx),[]).append(rec)
+        out = {}
+        for key,recs in groups.items():
+            durs = sorted(r[1] for r in recs)
+            out[key] = {'count':len(durs),
+                        'p50':Profiler.percentile(durs,0.5),
+                        'p95':Profiler.percentile(durs,0.95),
+                        'total':sum(durs),
+                        'bytes':sum(r[5]+r[6] for r in recs)}
+        return dict(sorted(out.items(),key=lambda kv:-kv[1]['total']))
+
+    def write_summary(self,fname,by=('test','pin')):
+        with open(fname,'w',newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(list(by)+['count','p50','p95','total','bytes'])
+            for key,s in self.summary(by).items():
+                writer.writerow(list(key)+[s['count'],f'{s["p50"]:.6f}',f'{s["p95"]:.6f}',
+                                           f'{s["total"]:.6f}',s['bytes']])
+
+    def write_trace(self,fname):
+        with open(fname,'w',newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(Profiler.FIELDS)
+            for rec in list(self.records):
+                writer.writerow([f'{rec[0]:.6f}',f'{rec[1]:.6f}']+['' if v is None else v for v in rec[2:]])
+
+class _Scope:
+    def __init__(self,profiler,kwargs):
+        self.profiler = profiler
+        self.kwargs = kwargs
+
+    def __enter__(self):
+        ctx = self.profiler.context()
+        self.saved = {k:ctx.get(k) for k in self.kwargs}
+        ctx.update(self.kwargs)
+        return self.profiler
+
+    def __exit__(self,*exc):
+        self.profiler.context().update(self.saved)
+
+class ProfiledResource:
+    def __init__(self,inst,name,profiler):
+        self.__dict__['inst'] = inst
+        self.__dict__['name'] = name
+        self.__dict__['profiler'] = profiler
+
+    def __getattr__(self,attr):
+        return getattr(self.inst,attr)
+
+    # read_termination and the like go to the real handle
+    def __setattr__(self,attr,val):
+        setattr(self.inst,attr,val)
+
+    def write(self,cmd,*args,**kwargs):
+        start = perf_counter()
+        try:
+            return self.inst.write(cmd,*args,**kwargs)
+        finally:
+            self.profiler.record(start,self.name,'write',cmd,len(cmd)+1,0)
+
+    def read(self,*args,**kwargs):
+        start,ans = perf_counter(),''
+        try:
+            ans = self.inst.read(*args,**kwargs)
+            return ans
+        finally:
+            self.profiler.record(start,self.name,'read','',0,len(ans)+1)
+
+    def query(self,cmd,*args,**kwargs):
+        start,ans = perf_counter(),''
+        try:
+            ans = self.inst.query(cmd,*args,**kwargs)
+            return ans
+        finally:
+            self.profiler.record(start,self.name,'query',cmd,len(cmd)+1,len(ans)+1)
+
+    def query_ascii_values(self,cmd,*args,**kwargs):
+        start,vals = perf_counter(),()
+        try:
+            vals = self.inst.query_ascii_values(cmd,*args,**kwargs)
+            return vals
+        finally:
+            self.profiler.record(start,self.name,'query_ascii_values',cmd,len(cmd)+1,14*len(vals))
+
+    def query_binary_values(self,cmd,*args,**kwargs):
+        start,vals = perf_counter(),()
+        try:
+            vals = self.inst.query_binary_values(cmd,*args,**kwargs)
+            return vals
+        finally:
+            self.profiler.record(start,self.name,'query_binary_values',cmd,len(cmd)+1,4*len(vals))
+
+class ProfiledSerial(ProfiledResource):
+    # A frame is only done once its answer is back, so the write and the
+    # readline after it are recorded as one exchange
+    def write(self,data):
+        self.__dict__['pending'] = (perf_counter(),data)
+        return self.inst.write(data)
+
+    def readline(self,*args,**kwargs):
+        start,data = self.__dict__.pop('pending',(perf_counter(),b''))
+        ans = b''
+        try:
+            ans = self.inst.readline(*args,**kwargs)
+            return ans
+        finally:
+            self.profiler.record(start,self.name,'frame',data.decode('utf-8',errors='replace').strip(),
+                                 len(data),len(ans))
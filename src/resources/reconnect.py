@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+'''
+Description:
+    Reconnect-on-error for the instrument setups (SMUSetup, DMMSetup). The
+    methods that talk to an instrument are wrapped with reconnecting. When
+    the session fails with a VisaIOError it is opened again through the
+    SessionPool, the instrument is brought back to the settings it had and
+    the method runs once more. A second failure is raised.
+
+    The setup class provides:
+        KIND          what to ask the operator to connect, e.g. 'SMU'
+        retrying      False, set while a wrapped method runs
+        snapshot()    what restore() needs, taken before anything is lost
+        invalidate()  forget whatever is known about the instrument
+        reconnect()   open the session again, True if it came back
+        restore(s)    set the new session up from a snapshot
+'''
+__author__ = "Victoria (Rice) Rodriguez"
+__email__ = "rice.rodriguez@ttu.edu"
+__status__ = "Prototype"
+
+import logging
+import functools
+from .lazy import LazyModule
+
+pyvisa = LazyModule('pyvisa')
+
+# Calls made from inside a wrapped method are left to the outermost
+def reconnecting(method):
+    @functools.wraps(method)
+    def wrapper(self,*args,**kwargs):
+        if self.retrying:
+            return method(self,*args,**kwargs)
+        self.retrying = True
+        try:
+            return method(self,*args,**kwargs)
+        except pyvisa.errors.VisaIOError as err:
+            saved = self.snapshot()
+            self.invalidate()
+            logging.warning(err)
+            if not self.reconnect():
+                raise
+            try:
+                self.restore(saved)
+                return method(self,*args,**kwargs)
+            except pyvisa.errors.VisaIOError:
+                self.invalidate()
+                logging.error(f'Please connect to the {self.KIND}.')
+                raise
+        finally:
+            self.retrying = False
+    return wrapper
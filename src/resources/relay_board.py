@@ -1,66 +1,166 @@
 #!/usr/bin/env python
 '''
 Description: Interfaces with the relay board. Adapted from Ian Kriner.
+
+Protocol:
+    Every command is one newline terminated frame, a command character
+    followed by its payload, and the board answers every frame with one line:
+      s<i>      switch on relay i alone (0 for none)  ack: s<i>
+      *<mask>   switch on every relay in mask         ack: *<mask>
+      t<r>      run test case r                       ack: t<r>
+      o         read the input states                 ack: o<hex mask>
+      V<m>,<m>  drive each mask in turn and read      ack: V<hex mask>,<hex mask>
+                the input states after each
+      b<baud>   move the link to baud                 ack: b<baud>, sent at the old rate
+    An answer starting with '!' is an error from the board. There are no
+    fixed sleeps, a command is done as soon as its answer comes back, and
+    one that doesn't answer within the timeout raises an IOError. A
+    pyserial 'loop://' port echoes every frame, so it acknowledges like a
+    board that never reports any inputs.
+
+    Pin state is kept as an integer bitmask, relay 1 in the top bit of the
+    16, the same order the Arduino sketch uses.
+
+    A V frame is a batch of functional test vectors: for each mask the board
+    drives the pins in it HIGH and the other inputs LOW, waits for the
+    outputs to settle and reads them, and answers with every reading at
+    once. The inputs go back to what the last test case set them to
+    afterwards. run_vectors() splits a table into as few frames as fit
+    the board's receive buffer, so a truth table costs a round trip per
+    batch instead of one per vector.
 '''
 __author__ = "Victoria (Rice) Rodriguez"
 __credits__ = "Ian Kriner"
 __email__ = "rice.rodriguez@ttu.edu"
 __status__ = "Prototype"
 
-import serial
-from time import sleep
-import serial.tools.list_ports as list_ports
+import logging
+from .lazy import LazyModule
+
+serial = LazyModule('serial')
+list_ports = LazyModule('serial.tools.list_ports')
 
 class RelayBoard:
-    def __init__(self,mode=None):
-        self.device = serial.Serial('COM1',9600)
-        if self.device is None:
-            raise IOError("Could not find an Arduino. Check the connection.")
+    NUM_RELAYS = 16
+    # Longest frame the Arduino's serial receive buffer holds
+    FRAME_SIZE = 64
+    # USB vendor IDs of the Arduino and the usual clone serial chips
+    ARDUINO_VIDS = (0x2341,0x2A03,0x1A86,0x0403)
+
+    # port can be anything pyserial takes as a URL, e.g. 'COM1' or 'loop://'
+    # for a stand-in without the Arduino, or an open port object such as
+    # the simulated board's. With no port the Arduino is looked up among the
+    # serial ports. fast_baud moves the link to a higher rate once it is up.
+    def __init__(self,mode=None,port=None,baud=9600,fast_baud=None,timeout=0.5,profiler=None):
+        if port is None:
+            port = RelayBoard.find_port()
+            if port is None:
+                raise IOError('Could not find the relay board: no serial port looks like an Arduino. Check the USB cable or pass the port.')
+        if hasattr(port,'write'):
+            self.device = port
+        else:
+            self.device = serial.serial_for_url(port,baud,timeout=timeout)
+        if profiler is not None:
+            self.device = profiler.wrap(self.device,'relay board')
+        self.pins = None
+        # Mask of the relays that are on right now
+        self.state = 0
+        if fast_baud is not None and fast_baud != baud:
+            self.negotiate(fast_baud)
         self.set_relay(0)
 
+    # First serial port that looks like an Arduino, None if there is none
+    def find_port():
+        for port in list_ports.comports():
+            if port.vid in RelayBoard.ARDUINO_VIDS or 'arduino' in (port.description or '').lower():
+                logging.debug(f'Found the relay board on {port.device}')
+                return port.device
+        return None
 
-    def set_pins(self,list_pins,temp=None):
-        pins = '0000000000000000'
+    # Send one frame and wait for its answer, returns the answer's payload
+    def command(self,cmd,payload=''):
+        frame = f'{cmd}{payload}'
+        self.device.reset_input_buffer()
+        self.device.write(f'{frame}\n'.encode('utf-8'))
+        ans = self.device.readline().decode('utf-8',errors='replace').strip()
+        if not ans:
+            raise IOError(f'No answer from the relay board to {frame!r}.')
+        if ans.startswith('!'):
+            raise IOError(f'Relay board error for {frame!r}: {ans[1:]}')
+        if not ans.startswith(cmd):
+            raise IOError(f'Relay board answered {ans!r} to {frame!r}.')
+        return ans[len(cmd):]
+
+    # Mask of the pins in list_pins, pin 1 is the top bit
+    def mask(self,list_pins):
+        num = 0
         for pin in list_pins:
-            try:
-                pins = pins[:pin-1]+'1'+pins[pin:]
-            except IndexError:
+            if not 1 <= pin <= RelayBoard.NUM_RELAYS:
                 raise ValueError('Use indexing that starts at 1.')
+            num |= 1 << (RelayBoard.NUM_RELAYS-pin)
+        return num
 
+    def set_pins(self,list_pins,temp=None):
         if temp is None:
-            self.pins = int(pins,2)
+            self.pins = self.mask(list_pins)
         else:
-            return int(pins,2)
+            return self.mask(list_pins)
+
+    # Move the link to a faster baud rate. The board answers at the old
+    # rate and switches after that.
+    def negotiate(self,baud):
+        self.command('b',baud)
+        self.device.baudrate = baud
+        logging.debug(f'Relay board link at {baud} baud')
 
     def test_cases(self,r):
-        self.device.reset_input_buffer()
-        self.device.write('t{}'.format(r).encode('utf-8'))
-        self.device.readline()
+        self.command('t',r)
 
     # i is a number between 1 and 16
     def set_relay(self,i):
-        self.device.reset_input_buffer()
-        self.device.write('s{}'.format(i).encode('utf-8'))
-        # self.device.readline()
+        self.command('s',i)
+        self.state = 0 if i == 0 else self.mask([i])
 
+    # Input states as a mask
     def read_inputs(self):
-        self.device.reset_input_buffer()
-        sleep(.05)
-        self.device.write('o'.encode('utf-8'))
-        sleep(.05)
-        c = self.device.read(4)
-        # self.device.readline()
-        return c
-
-    # Turns on multiple relays, very finicky about sending data.
+        ans = self.command('o')
+        return int(ans,16) if ans else 0
+
+    # Apply each input mask of masks in turn, a frame per batch, and return
+    # the input states read back after each
+    def run_vectors(self,masks):
+        states = []
+        batch = []
+        for num in masks:
+            num = str(int(num))
+            # 'V', the masks and their commas, and the newline
+            if batch and len(batch)+sum(map(len,batch))+len(num)+2 > RelayBoard.FRAME_SIZE:
+                states += self.send_vectors(batch)
+                batch = []
+            batch.append(num)
+        if batch:
+            states += self.send_vectors(batch)
+        return states
+
+    def send_vectors(self,batch):
+        ans = self.command('V',','.join(batch)).split(',')
+        if len(ans) != len(batch):
+            raise IOError(f'Relay board answered {len(ans)} of {len(batch)} vectors.')
+        return [int(a,16) for a in ans]
+
+    # Turns on multiple relays in one frame
     def multirelay(self,list_pins=None):
-        self.device.reset_input_buffer()
         if list_pins is None and self.pins is None:
             raise ValueError('No pin set up has been defined. Either use the set_pins function or provide a list of pins you\'d like to activate into the parameters of this function.')
-        elif list_pins is None:
-            self.device.write('*{}'.format(self.pins).encode('utf-8'))
-            # self.device.readline()
-        else:
-            num=self.set_pins(list_pins,True)
-            self.device.write('*{}'.format(num).encode('utf-8'))
-            # self.device.readline()
+        num = self.pins if list_pins is None else self.mask(list_pins)
+        self.write_mask(num)
+
+    # Switch relays on and off in one frame, leaving the rest as they are
+    def update(self,on=(),off=()):
+        self.write_mask((self.state | self.mask(on)) & ~self.mask(off))
+
+    def write_mask(self,num):
+        if num == self.state:
+            return
+        self.command('*',num)
+        self.state = num
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+'''
+Description:
+    Command batching for a SCPI instrument handle. Writes are queued instead
+    of being sent one at a time, and go out joined with ';' in front of the
+    next query (or the next write), so a measurement costs one write/read
+    pair on the bus.
+
+    Anything not defined here is passed through to the pyvisa handle.
+
+    When the pool has a wait on hold (SessionPool.hold, e.g. the relays
+    settling) the commands ahead of the first one that needs the DUT (the
+    output going on, or a reading) are sent first, then the wait is done
+    and the rest is sent. The setup goes out while the relays settle.
+
+Procedure:
+    1. queue() the commands that set the instrument up.
+    2. query() sends the queued commands and the query as one message.
+    3. flush() sends whatever is still queued, and only asks syst:err? when
+       check_errors is set.
+'''
+__author__ = "Victoria (Rice) Rodriguez"
+__email__ = "rice.rodriguez@ttu.edu"
+__status__ = "Prototype"
+
+import logging
+
+class BatchedInstrument:
+    def __init__(self,inst,batch=True,pool=None):
+        self.inst = inst
+        # With batch off every queued command is written straight away
+        self.batch = batch
+        self.pending = []
+        # SessionPool whose hold is waited for
+        self.pool = pool
+
+    def __getattr__(self,name):
+        return getattr(self.inst,name)
+
+    # Commands after a ';' are relative to the previous header unless they
+    # start with ':', so every command is sent from the root
+    def join(cmds):
+        return ';'.join(c if c.startswith((':','*')) else f':{c}' for c in cmds)
+
+    # True for a command that sources into or reads the DUT
+    def needs_dut(cmd):
+        return cmd.lstrip(':').lower().startswith(('outp on','init','*trg','read?','meas'))
+
+    def take(self,cmd=None):
+        cmds = self.pending+([cmd] if cmd else [])
+        self.pending = []
+        if self.pool is not None and self.pool.held is not None:
+            first = next((i for i,c in enumerate(cmds) if BatchedInstrument.needs_dut(c)),None)
+            if first is not None:
+                if first:
+                    self.inst.write(BatchedInstrument.join(cmds[:first]))
+                self.pool.wait()
+                cmds = cmds[first:]
+        return BatchedInstrument.join(cmds)
+
+    def queue(self,cmd):
+        if self.batch:
+            self.pending.append(cmd)
+        else:
+            if self.pool is not None and BatchedInstrument.needs_dut(cmd):
+                self.pool.wait()
+            self.inst.write(cmd)
+
+    def write(self,cmd):
+        return self.inst.write(self.take(cmd))
+
+    def query(self,cmd):
+        return self.inst.query(self.take(cmd))
+
+    def query_ascii_values(self,cmd,**kwargs):
+        return self.inst.query_ascii_values(self.take(cmd),**kwargs)
+
+    def query_binary_values(self,cmd,**kwargs):
+        return self.inst.query_binary_values(self.take(cmd),**kwargs)
+
+    # Send anything still queued. With check_errors the error queue is read
+    # until it is empty and the errors are returned.
+    def flush(self,check_errors=False):
+        if self.pending:
+            self.inst.write(self.take())
+        errors = []
+        if check_errors:
+            # The 2400 error queue holds at most 10 entries
+            for _ in range(10):
+                err = self.inst.query('syst:err?')
+                if err.strip().startswith(('0,','+0,')):
+                    break
+                logging.warning(f'SCPI error: {err.strip()}')
+                errors.append(err.strip())
+        return errors
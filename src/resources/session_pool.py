@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+'''
+Description:
+    Station-wide pool of instrument sessions. The pool opens each instrument
+    once per station run, checks its identity once, and hands the same live
+    handle to every test that asks for it. It can be passed anywhere a
+    pyvisa ResourceManager is expected (open_resource, list_resources, close).
+
+    The pool also holds a shared state dict per instrument, which SMUSetup
+    uses for its shadow copy of the SMU settings so that every test sharing
+    the handle also shares what is known about it.
+
+Procedure:
+    1. Open the resource the first time it is asked for.
+    2. Set the read and write terminations.
+    3. Query the identity and keep it.
+    4. Close and reopen a resource when it errors out (reconnect).
+    5. Close everything at the end of the run.
+
+    hold() puts a wait (PinRouter.settle) off until an instrument of the
+    pool next needs the DUT, see scpi_batch.py.
+
+    aliases maps the names the tests ask for ('SMU2400', 'Fluke_8840A_MM')
+    to the instruments of one test site, so every site of a multi-site
+    station can run the same test code on its own pool.
+'''
+__author__ = "Victoria (Rice) Rodriguez"
+__email__ = "rice.rodriguez@ttu.edu"
+__status__ = "Prototype"
+
+import logging
+from .lazy import LazyModule
+
+pyvisa = LazyModule('pyvisa')
+
+class SessionPool:
+    # Pool used by SMUSetup and DMMSetup when they are not given one
+    _default = None
+
+    def __init__(self,rm=None,batch=True,binary=False,aliases=None,owns_rm=True,profiler=None):
+        self.rm = rm
+        self.aliases = aliases or {}
+        # Pools sharing one resource manager leave closing it to its owner
+        self.owns_rm = owns_rm
+        # Whether SMU commands are batched into one message per measurement
+        self.batch = batch
+        # Whether SMU readings come back as binary floats instead of ASCII
+        self.binary = binary
+        # Profiler every session is recorded by, None for no profiling
+        self.profiler = profiler
+        self.sessions = {}
+        self.identities = {}
+        self.states = {}
+        self.resources = None
+        # Wait put off by hold(), None when there is none
+        self.held = None
+
+    def default():
+        if SessionPool._default is None:
+            SessionPool._default = SessionPool()
+        return SessionPool._default
+
+    # Only build the resource manager once something is actually opened
+    def manager(self):
+        if self.rm is None:
+            self.rm = pyvisa.ResourceManager()
+        return self.rm
+
+    def list_resources(self):
+        if self.resources is None:
+            self.resources = self.manager().list_resources()
+        return self.resources
+
+    # Same as ResourceManager.open_resource, but only opens it once
+    def open_resource(self,alias):
+        if alias not in self.sessions:
+            inst = self.manager().open_resource(self.aliases.get(alias,alias))
+            if self.profiler is not None:
+                inst = self.profiler.wrap(inst,alias)
+            inst.read_termination = '\n'
+            inst.write_termination = '\n'
+            self.sessions[alias] = inst
+            self.identities[alias] = inst.query('*IDN?')
+            logging.debug(f'Opened {alias}: {self.identities[alias]}')
+        return self.sessions[alias]
+
+    # Wait for wait() before the next command that needs the DUT
+    def hold(self,wait):
+        self.held = wait
+
+    # Do the wait on hold, if any
+    def wait(self):
+        wait,self.held = self.held,None
+        if wait is not None:
+            wait()
+
+    # Cached answer to *IDN?
+    def identity(self,alias):
+        self.open_resource(alias)
+        return self.identities[alias]
+
+    # State shared by everything using the alias
+    def shared_state(self,alias):
+        return self.states.setdefault(alias,{})
+
+    # Drop the session and open it again, anything known about its state
+    # is thrown away
+    def reconnect(self,alias):
+        logging.warning(f'Reconnecting to {alias}')
+        inst = self.sessions.pop(alias,None)
+        self.identities.pop(alias,None)
+        self.states.get(alias,{}).clear()
+        if inst is not None:
+            try:
+                inst.close()
+            except pyvisa.errors.VisaIOError as err:
+                logging.debug(err)
+        return self.open_resource(alias)
+
+    def close(self):
+        for alias,inst in self.sessions.items():
+            try:
+                inst.close()
+            except pyvisa.errors.VisaIOError as err:
+                logging.debug(f'{alias}: {err}')
+        self.sessions.clear()
+        self.identities.clear()
+        self.states.clear()
+        if self.rm is not None and self.owns_rm:
+            self.rm.close()
+        self.rm = None
+        if SessionPool._default is self:
+            SessionPool._default = None
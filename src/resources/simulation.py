@@ -0,0 +1,637 @@
+#!/usr/bin/env python
+'''
+Description:
+    Simulated bench for working without the instruments: a Keithley 2400
+    SMU, a Fluke 8840A DMM and the relay board, wired to a behavioural model
+    of a quad 2-input OR gate (74LS32 pinout). The tests run against it
+    unchanged, through the same SessionPool, SMUSetup, DMMSetup and
+    RelayBoard as on the bench.
+
+        bench = SimBench(latency=0.002,noise=0.002)
+        rm = SessionPool(bench.resource_manager())
+        board = RelayBoard(port=bench.relay_port())
+
+    The SMU parses the ';'-joined SCPI that BatchedInstrument sends, so
+    batching can stay on. Commands it doesn't know go in the error queue as
+    -113 "Undefined header", the way the 2400 does.
+
+DUT model:
+    The pin the SMU is on comes from the relays when a simulated relay board
+    is used. Without one the fixture is taken to be set up the way the
+    operator prompts of the test ask for, and what the SMU does tells which
+    test is running:
+      forcing current                 contact test, a diode drop on the pin
+      forcing VCC, sensing current    ICC
+      forcing 0 V, sensing current    short current of a HIGH output
+      forcing other V, sensing curr.  drive current, LOW under 1.4 V, else HIGH
+      forcing V, sensing voltage      input of a gate, the DMM reads its output
+    Once a relay board test case has set the inputs (t0 all LOW, t1 all
+    HIGH) the outputs follow the OR of their inputs instead, and so they do
+    for each vector of a V frame.
+
+    Currents are positive out of the pin. next_chip() draws new parameters
+    for the next chip with the spread given, and faults ({'pin 3':'open'} or
+    'short') break the contact of a pin.
+
+Timing:
+    Every message takes latency seconds on the bus, plus 10 bit times per
+    byte on the serial link of the relay board, and every reading takes its
+    integration time (NPLC cycles of the line on the SMU, three times over
+    with autozero on and 2 ms more to autorange; the reading rate on the
+    DMM). A reading started with init or *trg holds up the next command to the SMU,
+    not the bus, so the DMM can be read while it is taken. Shorter
+    integration is noisier, the noise given is for 1 PLC, and
+    a reading over a fixed range comes back as the 2400's 9.9E37. time_scale=0 runs as fast as possible; bench.clock adds up
+    the simulated time either way, so throughput can be compared without
+    waiting for it.
+'''
+__author__ = "Victoria (Rice) Rodriguez"
+__email__ = "rice.rodriguez@ttu.edu"
+__status__ = "Prototype"
+
+import random
+import struct
+import threading
+from time import sleep
+from .lazy import LazyModule
+from .pin_router import gate_map
+
+pyvisa = LazyModule('pyvisa')
+numpy = LazyModule('numpy')
+
+# 74LS32: four gates, pins 3, 6, 8 and 11 out, 7 GND and 14 VCC
+OR_GATE_PINS = ['IN','IN','OUT','IN','IN','OUT','GND','OUT','IN','IN','OUT','IN','IN','VCC']
+
+def visa_error(code):
+    return pyvisa.errors.VisaIOError(getattr(pyvisa.constants.StatusCode,code))
+
+class OrGateDUT:
+    # Nominal parameters, next_chip() varies them by the bench spread
+    NOMINAL = {'contact_v':0.95,    # V across the input diode at 250 uA
+               'icc':0.006,         # A at VCC = 5 V
+               'ios':0.06,          # A, short current of a HIGH output
+               'voh_open':3.5,      # V, unloaded HIGH output
+               'r_high':50.0,       # ohm, HIGH output resistance
+               'vol_sat':0.38,      # V, LOW output saturation
+               'r_low':40.0,        # ohm, LOW output resistance
+               'vt':1.35,           # V, input threshold
+               'vt_width':0.1}      # V, width of the transfer edge
+
+    def __init__(self,pins=None,spread=0.0,faults=None,rng=None):
+        self.pins = pins or list(OR_GATE_PINS)
+        self.gates = gate_map(self.pins)
+        self.spread = spread
+        self.faults = faults or {}
+        self.rng = rng or random.Random()
+        # Pin numbers the relays have the SMU and the DMM on, None if unknown
+        self.smu_pin = None
+        self.dmm_pin = None
+        # Input levels set by a relay board test case, None until one is run
+        self.pattern = None
+        self.next_chip()
+
+    # Draw the parameters of a new chip
+    def next_chip(self,faults=None):
+        self.params = {k:v*(1+self.rng.gauss(0,self.spread)) for k,v in OrGateDUT.NOMINAL.items()}
+        if faults is not None:
+            self.faults = faults
+        # Each input has a threshold of its own
+        self.vt = {p:self.params['vt']*(1+self.rng.gauss(0,self.spread/2)) for p in self.input_pins()}
+
+    def input_pins(self):
+        return [f'pin {i+1}' for i,p in enumerate(self.pins) if p == 'IN']
+
+    def role(self,num):
+        return self.pins[num-1] if num is not None and 0 < num <= len(self.pins) else None
+
+    # Output pin of the gate an input belongs to
+    def gate_of(self,pin):
+        for out,ins in self.gates.items():
+            if pin in ins:
+                return out
+        return next(iter(self.gates),None)
+
+    # Level of an output from the test case inputs, None if none was run
+    def logic(self,out):
+        if self.pattern is None:
+            return None
+        return any(self.pattern.get(p,False) for p in self.gates.get(out,[]))
+
+    # Output voltage of the gate of input pin while it is forced to vin,
+    # the other input held LOW
+    def transfer(self,pin,vin,vcc):
+        p = self.params
+        vt = self.vt.get(pin,p['vt'])
+        x = (vin-(vt-p['vt_width']/2))/p['vt_width']
+        return vcc*min(1.0,max(0.0,x))
+
+    # Current out of an output pin forced to v
+    def output_current(self,v,high):
+        p = self.params
+        if high:
+            return min((p['voh_open']-v)/p['r_high'],p['ios'])
+        return -max(v-p['vol_sat'],0.0)/p['r_low']
+
+    # Voltage on the SMU pin while forcing current i
+    def contact(self,pin,i):
+        fault = self.faults.get(pin)
+        if fault == 'open':
+            return 21.0
+        if fault == 'short':
+            return 0.0
+        if i <= 0:
+            return 0.0
+        return self.params['contact_v']*(1+0.05*(i/250e-6-1))
+
+    # What the SMU senses, given how it is set up
+    def smu_reading(self,src,level,sens,vcc=5.0):
+        num = self.smu_pin
+        role = self.role(num)
+        pin = f'pin {num}' if num is not None else None
+        if src == 'curr':
+            return self.contact(pin,level) if sens == 'volt' else level
+        if sens == 'volt':
+            return level
+        if role == 'VCC' or (role is None and level >= 4.0):
+            return self.params['icc']*level/5.0
+        if role in ('IN','GND'):
+            return 0.0
+        high = self.logic(pin) if role == 'OUT' else None
+        if high is None:
+            high = level == 0 or level >= 1.4
+        return self.output_current(level,high)
+
+    # What the DMM reads with the SMU forcing level on an input
+    def dmm_reading(self,smu_level,smu_on,vcc=5.0):
+        pin = f'pin {self.smu_pin}' if self.smu_pin is not None else self.input_pins()[0]
+        out = f'pin {self.dmm_pin}' if self.dmm_pin is not None else self.gate_of(pin)
+        if self.pattern is not None and out in self.gates:
+            if pin not in self.gates[out] or not smu_on:
+                return vcc if self.logic(out) else 0.0
+        if not smu_on:
+            return 0.0
+        return self.transfer(pin,smu_level,vcc)
+
+class SimBench:
+    def __init__(self,pins=None,latency=0.002,noise=0.002,spread=0.0,faults=None,
+                 line_freq=60,time_scale=1.0,seed=None):
+        self.pins = pins
+        self.latency = latency
+        self.noise = noise
+        self.spread = spread
+        self.faults = faults
+        self.line_freq = line_freq
+        self.time_scale = time_scale
+        self.rng = random.Random(seed)
+        # Site -> OrGateDUT, site None on a single-site station
+        self.duts = {}
+        # Site -> SMUs open on it, the DMM reads what they force
+        self.smus = {}
+        self.clock = 0.0
+        self.lock = threading.Lock()
+
+    def dut(self,site=None):
+        if site not in self.duts:
+            self.duts[site] = OrGateDUT(self.pins,self.spread,self.faults,self.rng)
+        return self.duts[site]
+
+    def next_chip(self,faults=None):
+        for dut in self.duts.values():
+            dut.next_chip(faults)
+
+    # Spend t seconds of simulated time
+    def wait(self,t):
+        with self.lock:
+            self.clock += t
+        if self.time_scale:
+            sleep(t*self.time_scale)
+
+    def jitter(self,val,floor=1e-6,scale=1.0):
+        return val+self.rng.gauss(0,(abs(val)*self.noise+floor*bool(self.noise))*scale)
+
+    def resource_manager(self):
+        return SimResourceManager(self)
+
+    def relay_port(self,site=None,baud=9600,dmm_relays=None):
+        return SimRelayPort(self,site,baud,dmm_relays)
+
+class SimResourceManager:
+    # Name the tests use, VISA address
+    SMU = ('SMU2400','GPIB0::24::INSTR')
+    DMM = ('Fluke_8840A_MM','GPIB0::1::INSTR')
+
+    def __init__(self,bench=None):
+        self.bench = bench or SimBench()
+        self.sessions = []
+
+    def list_resources(self):
+        return SimResourceManager.SMU[1:]+SimResourceManager.DMM[1:]
+
+    # 'SMU2400_B' is the SMU of site B
+    def site(self,name,bases):
+        for base in bases:
+            if name == base:
+                return None
+            if name.startswith(f'{base}_'):
+                return name[len(base)+1:]
+        return False
+
+    def open_resource(self,name,**kwargs):
+        site = self.site(name,SimResourceManager.SMU)
+        if site is not False:
+            inst = SimSMU2400(self.bench,site)
+        else:
+            site = self.site(name,SimResourceManager.DMM)
+            if site is False:
+                raise visa_error('error_resource_not_found')
+            inst = SimFluke8840A(self.bench,site)
+        for k,v in kwargs.items():
+            setattr(inst,k,v)
+        self.sessions.append(inst)
+        return inst
+
+    def close(self):
+        for inst in self.sessions:
+            inst.close()
+        self.sessions = []
+
+class SimInstrument:
+    def __init__(self,bench,site=None):
+        self.bench = bench
+        self.site = site
+        self.dut = bench.dut(site)
+        self.read_termination = '\n'
+        self.write_termination = '\n'
+        self.timeout = 2000
+        self.out = []
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def write(self,msg):
+        if self.closed:
+            raise visa_error('error_connection_lost')
+        self.bench.wait(self.bench.latency)
+        with self.lock:
+            before = len(self.out)
+            for cmd in msg.strip().split(';'):
+                cmd = cmd.strip().lstrip(':')
+                if cmd:
+                    self.command(cmd)
+            # Answers to the queries of one message come back as one,
+            # separated by ';'
+            answers = self.out[before:]
+            if len(answers) > 1 and all(isinstance(a,str) for a in answers):
+                self.out[before:] = [';'.join(answers)]
+        return len(msg)
+
+    def read(self):
+        self.bench.wait(self.bench.latency)
+        with self.lock:
+            if not self.out:
+                raise visa_error('error_timeout')
+            ans = self.out.pop(0)
+        # A binary block read as text, header and all
+        if not isinstance(ans,str):
+            data = struct.pack(f'<{len(ans)}f',*ans)
+            ans = f'#{len(str(len(data)))}{len(data)}'+data.decode('latin-1')
+        return ans
+
+    def query(self,msg):
+        self.write(msg)
+        return self.read()
+
+    def query_ascii_values(self,msg,converter='f',separator=',',container=list,**kwargs):
+        vals = [float(v) for v in self.query(msg).split(separator) if v.strip()]
+        return container(vals)
+
+    def query_binary_values(self,msg,datatype='f',is_big_endian=False,container=list,**kwargs):
+        self.write(msg)
+        with self.lock:
+            if not self.out:
+                raise visa_error('error_timeout')
+            block = self.out.pop(0)
+        if isinstance(block,str):
+            block = [float(v) for v in block.split(',')]
+        # Through the same packing the SMU uses, for single precision
+        fmt = f'{">" if is_big_endian else "<"}{len(block)}{datatype}'
+        vals = struct.unpack(fmt,struct.pack(fmt,*block))
+        # pyvisa reads straight into an array when asked for an ndarray
+        if getattr(container,'__name__','') == 'ndarray':
+            return numpy.array(vals,dtype=numpy.float32 if datatype == 'f' else float)
+        return container(vals)
+
+    def clear(self):
+        self.out = []
+
+    def close(self):
+        self.closed = True
+
+class SimSMU2400(SimInstrument):
+    # Measurement ranges, a fixed range is the lowest that covers the value
+    RANGES = {'volt':(0.2,2,20,200),'curr':(1e-6,1e-5,1e-4,1e-3,1e-2,0.1,1)}
+
+    def __init__(self,bench,site=None):
+        super().__init__(bench,site)
+        self.errors = []
+        # Bench clock time the readings started by init are done at, and
+        # whether init is running
+        self.busy = 0.0
+        self.deferring = False
+        self.reset()
+        bench.smus.setdefault(site,[]).append(self)
+
+    def reset(self):
+        self.src = 'volt'
+        self.levels = {'volt':0.0,'curr':0.0}
+        self.sens = 'curr'
+        self.elems = ['volt','curr']
+        self.on = False
+        self.data_fmt = 'asc'
+        self.nplc = 1.0
+        self.azer = True
+        # Sense function -> fixed range, None for autorange
+        self.ranges = {'volt':None,'curr':None}
+        self.list_mode = False
+        self.source_list = []
+        self.list_index = None
+        self.arm_bus = False
+        self.trace = []
+        self.trace_feed = False
+        self.trig_count = 1
+        self.trace_points = 100
+        self.stat = 'mean'
+        # Source delay before each reading, 0 for auto
+        self.source_delay = 0.0
+
+    def error(self,code,msg):
+        self.errors.append(f'{code},"{msg}"')
+
+    def level(self):
+        if self.list_mode and self.list_index is not None and self.source_list:
+            return self.source_list[min(self.list_index,len(self.source_list)-1)]
+        return self.levels[self.src]
+
+    # One reading of every element asked for
+    def reading(self):
+        rang = self.ranges.get(self.sens)
+        self.spend(self.nplc/self.bench.line_freq*(3 if self.azer else 1)+(0.002 if rang is None else 0))
+        lev = self.level() if self.on else 0.0
+        sensed = self.dut.smu_reading(self.src,lev,self.sens) if self.on else 0.0
+        sensed = self.bench.jitter(sensed,scale=max(self.nplc,0.01)**-0.5)
+        if rang is not None and abs(sensed) > 1.05*rang:
+            sensed = 9.9e37
+        vals = {self.sens:sensed}
+        vals.setdefault(self.src,lev)
+        return [vals.get(e,0.0) for e in self.elems]
+
+    # Spend t seconds of simulated time. The readings of init are taken
+    # while the bus is free for other instruments, so their time is only
+    # waited for by the next command.
+    def spend(self,t):
+        if self.deferring:
+            self.busy = max(self.busy,self.bench.clock)+t
+        else:
+            self.bench.wait(t)
+
+    def respond(self,vals):
+        if self.data_fmt == 'asc':
+            self.out.append(','.join(f'{v:+.6E}' for v in vals))
+        else:
+            self.out.append(vals)
+
+    def command(self,cmd):
+        low = cmd.lower()
+        head,_,arg = low.partition(' ')
+        arg = arg.strip().strip('"')
+        left = self.busy-self.bench.clock
+        if left > 0:
+            self.bench.wait(left)
+        if head == '*idn?':
+            self.out.append('KEITHLEY INSTRUMENTS INC.,MODEL 2400,0000000,C30 (sim)')
+        elif head == '*rst':
+            self.reset()
+        elif head == '*cls':
+            self.errors = []
+        elif head == 'syst:err?':
+            self.out.append(self.errors.pop(0) if self.errors else '0,"No error"')
+        elif head == 'outp':
+            self.on = arg in ('on','1')
+        elif head == 'sour:func:mode':
+            self.src = arg[:4]
+        elif head in ('sour:volt:lev','sour:curr:lev'):
+            self.levels[head.split(':')[1]] = float(arg)
+        elif head == 'sens:func':
+            self.sens = arg[:4]
+        elif head == 'form:elem':
+            self.elems = [e.strip()[:4] for e in arg.split(',')]
+        elif head == 'form:data':
+            self.data_fmt = 'asc' if arg.startswith('asc') else 'sre'
+        elif head == 'read?':
+            self.respond([v for _ in range(self.trig_count) for v in self.reading()])
+        elif head.endswith(':nplc'):
+            self.nplc = float(arg)
+        elif head in ('sens:volt:rang:auto','sens:curr:rang:auto'):
+            if arg in ('on','1'):
+                self.ranges[head.split(':')[1]] = None
+        elif head in ('sens:volt:rang','sens:curr:rang'):
+            func = head.split(':')[1]
+            fits = [r for r in SimSMU2400.RANGES[func] if r >= float(arg)]
+            self.ranges[func] = fits[0] if fits else SimSMU2400.RANGES[func][-1]
+        elif head in ('syst:azer:stat','syst:azer'):
+            self.azer = arg in ('on','1')
+        elif head == 'sour:volt:mode':
+            self.list_mode = arg.startswith('list')
+            self.list_index = None
+        elif head == 'sour:list:volt':
+            self.source_list = [float(v) for v in arg.split(',')]
+        elif head == 'arm:sour':
+            self.arm_bus = arg.startswith('bus')
+        elif head == 'trac:cle':
+            self.trace = []
+        elif head == 'trac:feed:cont':
+            self.trace_feed = arg.startswith('next')
+        elif head == 'init':
+            self.on = True
+            self.list_index = None if self.arm_bus else 0
+            self.deferring = True
+            if not self.arm_bus and self.list_mode:
+                for i in range(len(self.source_list)):
+                    self.list_index = i
+                    self.store()
+            elif not self.arm_bus:
+                for _ in range(self.trig_count):
+                    self.store()
+            self.deferring = False
+        elif head == '*trg':
+            self.deferring = True
+            for _ in range(self.trig_count):
+                if self.list_mode:
+                    self.list_index = 0 if self.list_index is None else self.list_index+1
+                self.store()
+            self.deferring = False
+        elif head == 'abor':
+            pass
+        elif head == 'trac:data?':
+            self.respond(self.trace)
+        elif head == 'trig:coun':
+            self.trig_count = int(float(arg))
+        elif head == 'trac:poin':
+            self.trace_points = int(float(arg))
+        elif head == 'trac:poin:act?':
+            self.out.append(str(len(self.trace)))
+        elif head == 'sour:del':
+            self.source_delay = float(arg)
+        elif head == 'sour:del:auto':
+            self.source_delay = 0.0
+        elif head == 'calc3:form':
+            self.stat = arg[:4]
+        elif head == 'calc3:data?':
+            self.respond([self.statistic()])
+        elif head in ('form:bord','sens:curr:prot','sens:volt:prot',
+                      'arm:coun','trac:feed','*wai','*opc'):
+            pass
+        else:
+            self.error(-113,'Undefined header')
+
+    # Reading into the trace buffer
+    def store(self):
+        self.spend(self.source_delay)
+        vals = self.reading()
+        if self.trace_feed:
+            self.trace.append(vals[0])
+            if len(self.trace) >= self.trace_points:
+                self.trace_feed = False
+
+    # calc3 statistic of the trace buffer
+    def statistic(self):
+        if not self.trace:
+            self.error(-230,'Data corrupt or stale')
+            return 9.91e37
+        n = len(self.trace)
+        mean = sum(self.trace)/n
+        if self.stat == 'sdev':
+            return (sum((v-mean)**2 for v in self.trace)/max(n-1,1))**0.5
+        if self.stat in ('max','maxi'):
+            return max(self.trace)
+        if self.stat in ('min','mini'):
+            return min(self.trace)
+        if self.stat == 'pkpk':
+            return max(self.trace)-min(self.trace)
+        return mean
+
+class SimFluke8840A(SimInstrument):
+    # Readings per second for S0, S1 and S2
+    RATES = (2.5,20.0,100.0)
+
+    def __init__(self,bench,site=None):
+        super().__init__(bench,site)
+        self.rate = 1
+
+    def command(self,cmd):
+        if cmd.upper() == '*IDN?':
+            self.out.append('FLUKE,8840A,0,0 (sim)')
+            return
+        if cmd.strip() == '?':
+            self.out.append(f'{self.measure():+.4E}')
+            return
+        # Old style commands, '* f1 r0 s1' is reset, VDC, autorange, rate
+        for tok in cmd.upper().split():
+            if tok.startswith('S') and tok[1:].isdigit():
+                self.rate = min(int(tok[1:]),2)
+
+    def measure(self):
+        self.bench.wait(1.0/SimFluke8840A.RATES[self.rate])
+        smu = self.smu()
+        if smu is None:
+            return 0.0
+        lev = smu.level() if smu.on and smu.src == 'volt' else 0.0
+        # Noise in proportion only, an output on the rail reads the rail
+        return max(0.0,self.bench.jitter(self.dut.dmm_reading(lev,smu.on),floor=0))
+
+    # The SMU on the same DUT
+    def smu(self):
+        for inst in self.bench.smus.get(self.site,[]):
+            if not inst.closed:
+                return inst
+        return None
+
+class SimRelayPort:
+    # Stands in for the serial port of the relay board. Relay n puts the SMU
+    # on pin n; dmm_relays maps relays to the pins they put the DMM on.
+    def __init__(self,bench,site=None,baud=9600,dmm_relays=None):
+        self.bench = bench
+        self.dut = bench.dut(site)
+        self.baudrate = baud
+        self.dmm_relays = dmm_relays or {}
+        self.buf = b''
+        self.answers = []
+        self.is_open = True
+
+    def byte_time(self,n):
+        return 10*n/self.baudrate
+
+    def reset_input_buffer(self):
+        self.answers = []
+
+    def write(self,data):
+        self.bench.wait(self.byte_time(len(data)))
+        self.buf += data
+        while b'\n' in self.buf:
+            line,self.buf = self.buf.split(b'\n',1)
+            self.answers.append(self.frame(line.decode('utf-8').strip()))
+        return len(data)
+
+    def readline(self):
+        if not self.answers:
+            return b''
+        ans = self.answers.pop(0)
+        self.bench.wait(self.bench.latency+self.byte_time(len(ans)+1))
+        return f'{ans}\n'.encode('utf-8')
+
+    def frame(self,frame):
+        cmd,payload = frame[:1],frame[1:]
+        try:
+            if cmd == 's':
+                i = int(payload)
+                self.route(0 if i == 0 else 1 << (16-i))
+            elif cmd == '*':
+                self.route(int(payload))
+            elif cmd == 't':
+                level = int(payload) != 0
+                self.dut.pattern = {p:level for p in self.dut.input_pins()}
+            elif cmd == 'o':
+                return f'o{self.outputs():x}'
+            elif cmd == 'V':
+                # Each vector in turn, then back to the test case inputs
+                pattern = self.dut.pattern
+                states = []
+                for num in payload.split(','):
+                    mask = int(num)
+                    self.dut.pattern = {p:bool(mask & (1 << (16-int(p.split()[-1])))) for p in self.dut.input_pins()}
+                    states.append(f'{self.outputs():x}')
+                self.dut.pattern = pattern
+                return f'V{",".join(states)}'
+            elif cmd != 'b':
+                return f'!unknown command {cmd}'
+        except ValueError:
+            return f'!bad payload {payload}'
+        return frame
+
+    # Mask of the outputs at logic HIGH
+    def outputs(self):
+        mask = 0
+        for out in self.dut.gates:
+            if self.dut.logic(out):
+                mask |= 1 << (16-int(out.split()[-1]))
+        return mask
+
+    # Put the SMU and the DMM on the pins of the relays in mask
+    def route(self,mask):
+        relays = [n for n in range(1,17) if mask & (1 << (16-n))]
+        smu = [n for n in relays if n not in self.dmm_relays]
+        dmm = [self.dmm_relays[n] for n in relays if n in self.dmm_relays]
+        self.dut.smu_pin = smu[0] if smu else None
+        self.dut.dmm_pin = dmm[0] if dmm else None
+
+    def close(self):
+        self.is_open = False
@@ -10,29 +10,128 @@ Procedure:
     3. Set the source mode.
     4. Set the level of the source.
     5. Set the sense mode.
+
+    A shadow copy of the SMU state is kept in self.state. Reconfiguring only
+    sends the settings that differ from it. The full reset in step 2 only
+    happens when asked for, or when the shadow has been invalidated because
+    a command failed and the real state is no longer known. The commands
+    of each (src, lev, sens) are rendered once, see commands(), so setting
+    up a pin that needs the same settings as an earlier one is only a few
+    lookups and comparisons.
+
+    The handle comes from a SessionPool, so every test on the station shares
+    one open session, one identity check and one shadow state. When a
+    message fails (on flush() or a read, where the batched I/O happens) the
+    session is opened again through the pool, the SMU is reset and brought
+    back to every setting the shadow had, and the call is made once more
+    (see reconnect.py).
+
+    Settings are queued on a BatchedInstrument rather than written, so they
+    go out in the same message as the next read. check_errors() is the only
+    place syst:err? is asked.
+
+    measure() returns the readings as floats at full precision. When the pool
+    is set up for binary transfer the SMU is switched to single precision
+    floats (form:data sre, swapped byte order) and the block is read straight
+    into a NumPy array, or a list if NumPy isn't installed.
+
+Measurement profiles:
+    fast     0.01 PLC, fixed range, autozero off
+    normal   1 PLC, autorange, autozero on (what the 2400 resets to)
+    precise  10 PLC, autorange, autozero on
+    measure_for() picks one from how far the expected reading is from the
+    pass limits, and measures again with precise if the reading itself
+    comes out close to a limit or over the fixed range. Profile settings go
+    through the shadow state like everything else, so a run of pins with the
+    same profile sets it up once.
+
+Source lists:
+    load_list() puts levels in the voltage source list, stepped by bus
+    triggers after start_list(), with a reading of each into the trace
+    buffer, taken the source delay after the trigger. With count above 1
+    every level is in the list count times and a trigger takes count
+    readings, one per copy. abort() stops the
+    list early. wait_points() waits for a reading to be stored before
+    anything is changed for the next one. Everything else on the SMU works
+    on a fixed level, so setup(), measure() and acquire() go back to it
+    (through the shadow, so this costs nothing unless a list was loaded).
+
+Overlapped readings:
+    start_reading() starts a reading into the trace buffer (start_trace)
+    and returns as soon as the message is sent. The SMU takes the reading
+    the source delay later, so another instrument (the DMM) can be read in
+    the meantime, and the readings are fetched together afterwards.
+
+Buffered acquisition:
+    acquire(n) takes n readings in one trigger sequence (trig:coun n) into
+    the trace buffer, and returns the mean, standard deviation, maximum and
+    minimum worked out by the SMU (calc3), always as text, or with raw=True
+    the whole buffer, as a binary block when the pool uses binary transfer.
+    Either way it is one message and one answer on the bus. measure_for() takes
+    samples=n to do the same with the profile it picks.
 '''
 __author__ = "Victoria (Rice) Rodriguez"
 __email__ = "rice.rodriguez@ttu.edu"
 __status__ = "Prototype"
 
-import pyvisa
 import logging
+from time import monotonic, sleep
+from .lazy import LazyModule, available
+from .session_pool import SessionPool
+from .scpi_batch import BatchedInstrument
+from .reconnect import reconnecting
+
+pyvisa = LazyModule('pyvisa')
+numpy = LazyModule('numpy') if available('numpy') else None
 
 class SMUSetup:
-    def __init__(self,src,lev,sens,rm=pyvisa.ResourceManager()):
+    KIND = 'SMU'
+
+    def __init__(self,src,lev,sens,rm=None,alias='SMU2400'):
+        if rm is None:
+            rm = SessionPool.default()
+        elif not isinstance(rm,SessionPool):
+            rm = SessionPool(rm)
         self.rm = rm
+        self.alias = alias
+        # Set while a reconnecting method runs
+        self.retrying = False
+        # Shadow copy of the SMU settings and the batched handle, shared
+        # through the pool
+        self.shared = self.rm.shared_state(self.alias)
         self.__verify()
         self.setup(src,lev,sens)
 
+    # Shadow copy of the SMU settings, None means unknown
+    @property
+    def state(self):
+        return self.shared.get('state')
+
+    @state.setter
+    def state(self,val):
+        self.shared['state'] = val
+
+    # Shadow key -> (value, command) of every setting sent since the last
+    # reset, what restore() sends to a new session
+    @property
+    def settings(self):
+        return self.shared.setdefault('settings',{})
+
+    # Everyone using the same session also uses the same command queue
+    def __batched(self,inst):
+        smu = self.shared.get('batch')
+        if smu is None or smu.inst is not inst:
+            smu = BatchedInstrument(inst,self.rm.batch,self.rm)
+            self.shared['batch'] = smu
+        return smu
+
     # Verify that the instrument is connected and communication is able to take place
     def __verify(self):
         # First get the SMU from the list of resources
         try:
-            self.smu = self.rm.open_resource('SMU2400')
-            self.smu.read_termination = '\n'
-            self.smu.write_termination = '\n'
+            self.smu = self.__batched(self.rm.open_resource(self.alias))
             logging.debug('Set SMU as %(self.smu)s')
-            bytes_back=self.smu.query('*IDN?')
+            bytes_back=self.rm.identity(self.alias)
             logging.debug('Received identity of SMU as: %(bytes_back)s')
 
         except AttributeError as err:
@@ -45,22 +144,327 @@ class SMUSetup:
             logging.error('Please connect to the SMU.')
             exit(-1)
 
-    # mode = source mode, lev = how much to source, sens = sens mode
-    def setup(self,src,lev,sens):
-        try:
-            # First reset and clear status
-            self.smu.write('*rst;outp off;*cls')
-            # Set the source mode
-            self.smu.write(f'sour:func:mode {src}')
-            # Set the level of the source
-            self.smu.write(f'sour:{src}:lev {lev}')
-            # Set the sensing mode
-            self.smu.write(f'sens:func "{sens}"')
-            # Only get the value we want
-            self.smu.write(f'form:elem {sens}')
-            # Set compliance
-            self.smu.write(f'sens:curr:prot .5')
+    # Settings known right after '*rst;outp off;*cls'. Anything left out is
+    # sent again on the first setup after a reset.
+    RESET_STATE = {'outp':'off','coun':'1','vmode':'fix','arm':'imm','acoun':'1','del':'auto'}
+
+    PROFILES = {'fast':{'nplc':0.01,'range':'fixed','azer':'off'},
+                'normal':{'nplc':1,'range':'auto','azer':'on'},
+                'precise':{'nplc':10,'range':'auto','azer':'on'}}
+    # Least margin to the nearest limit, as a fraction of the limit, for
+    # the fast and normal profiles. Anything closer is measured precisely.
+    MARGINS = {'fast':0.2,'normal':0.05}
+    # What the 2400 returns for a reading over range
+    OVERFLOW = 9.9e37
+    # Buffer statistics returned by acquire(), in this order
+    STATS = ('mean','sdev','max','min')
+    # Size of the 2400 trace buffer
+    MAX_SAMPLES = 2500
+    # Points in the 2400 source list
+    MAX_LIST = 100
+
+    # Commands of every setup so far, by (src, lev, sens)
+    RENDERED = {}
+
+    # (shadow key, value, command) for each setting of a setup, rendered
+    # once and reused by every later setup with the same settings
+    def commands(src,lev,sens):
+        key = (src,str(lev),sens)
+        cmds = SMUSetup.RENDERED.get(key)
+        if cmds is None:
+            # Source mode, source level, sense mode, only the value we
+            # want, and the compliance
+            cmds = (('src',src,f'sour:func:mode {src}'),
+                    (f'{src}:lev',str(lev),f'sour:{src}:lev {lev}'),
+                    ('sens',sens,f'sens:func "{sens}"'),
+                    ('elem',sens,f'form:elem {sens}'),
+                    ('prot','.5','sens:curr:prot .5'))
+            SMUSetup.RENDERED[key] = cmds
+        return cmds
+
+    # mode = source mode, lev = how much to source, sens = sens mode. A source
+    # list left by an earlier test would ignore the level, so the source is
+    # put back to fixed first.
+    @reconnecting
+    def setup(self,src,lev,sens,reset=False):
+        if reset or self.state is None:
+            self.reset(send=False)
+        self.fixed_source()
+        for key,val,cmd in SMUSetup.commands(src,lev,sens):
+            self.__send(key,val,cmd)
 
+    # Settings to restore on a new session
+    def snapshot(self):
+        return dict(self.settings)
+
+    # Open the session again through the pool, True if it came back. The
+    # batched handle stays the same object, so every test holding it uses
+    # the new session.
+    def reconnect(self):
+        try:
+            inst = self.rm.reconnect(self.alias)
         except pyvisa.errors.VisaIOError as err:
             logging.error('Please connect to the SMU.')
             logging.error(err)
+            return False
+        self.smu.inst = inst
+        self.smu.pending.clear()
+        self.shared['batch'] = self.smu
+        return True
+
+    # Reset a new session and send settings (from self.settings) again, the
+    # output last so nothing is sourced before the rest is in place
+    def restore(self,settings):
+        self.reset(send=False)
+        outp = settings.pop('outp',None)
+        for key,(val,cmd) in list(settings.items())+([('outp',outp)] if outp else []):
+            self.__send(key,val,cmd)
+        self.flush()
+
+    # Reset and clear status, leaving the output off. With send=False the
+    # reset waits in the queue for the next message.
+    @reconnecting
+    def reset(self,send=True):
+        self.smu.pending.clear()
+        self.smu.queue('*rst;outp off;*cls')
+        self.state = dict(SMUSetup.RESET_STATE)
+        self.shared['settings'] = {}
+        if send:
+            self.flush()
+
+    # Send anything queued
+    @reconnecting
+    def flush(self):
+        self.smu.flush()
+
+    # Send anything queued and read the error queue. Any error means the
+    # shadow can't be trusted anymore.
+    @reconnecting
+    def check_errors(self):
+        errors = self.smu.flush(check_errors=True)
+        if errors:
+            self.invalidate()
+        return errors
+
+    # Take a reading and return every value in it as a float, rounding is
+    # left to whoever displays them
+    def measure(self,elem=None):
+        if elem is not None:
+            self.set_elements(elem)
+        self.fixed_source()
+        self.__send('coun','1','trig:coun 1')
+        return self.fetch('read?')
+
+    # Send the queue with query cmd and read back the values it answers
+    # with, in binary when the pool is set up for it
+    @reconnecting
+    def fetch(self,cmd):
+        container = list if numpy is None else numpy.ndarray
+        if self.rm.binary:
+            self.__send('data','sre','form:data sre')
+            self.__send('bord','swap','form:bord swap')
+            return self.smu.query_binary_values(cmd,datatype='f',is_big_endian=False,container=container)
+        self.__send('data','asc','form:data asc')
+        return self.smu.query_ascii_values(cmd,container=list if numpy is None else numpy.array)
+
+    # Take n readings into the trace buffer. Returns the values of STATS as
+    # calculated by the SMU, or every reading in the buffer with raw=True.
+    @reconnecting
+    def acquire(self,n,elem=None,raw=False):
+        if not 1 <= n <= SMUSetup.MAX_SAMPLES:
+            raise ValueError(f'The SMU buffer holds 1 to {SMUSetup.MAX_SAMPLES} readings, not {n}.')
+        if elem is not None:
+            self.set_elements(elem)
+        self.fixed_source()
+        # The source list (start_list) uses the buffer too, without the
+        # shadow, so the buffer is set up every time. It also stops feeding
+        # once full.
+        self.smu.queue(f'trig:coun {n}')
+        if self.state is not None:
+            self.state['coun'] = str(n)
+        self.start_trace(n)
+        self.smu.queue('init')
+        self.smu.queue('*wai')
+        if raw:
+            return self.fetch('trac:data?')
+        # The statistics are read as text, whatever the pool's transfer
+        self.__send('data','asc','form:data asc')
+        query = ';'.join(f':calc3:form {stat};:calc3:data?' for stat in SMUSetup.STATS)
+        ans = self.smu.query(query)
+        return [float(v) for v in ans.strip().split(';')]
+
+    # Statistics from acquire() by name
+    def statistics(res):
+        return dict(zip(SMUSetup.STATS,(float(v) for v in res)))
+
+    # STATS of readings, the way the SMU works them out for acquire()
+    def summarize(vals):
+        vals = [float(v) for v in vals]
+        n = len(vals)
+        mean = sum(vals)/n
+        sdev = (sum((v-mean)**2 for v in vals)/max(n-1,1))**0.5
+        return [mean,sdev,max(vals),min(vals)]
+
+    # Set up a measurement profile. A fixed range has to cover rang, the
+    # 2400 picks the lowest range that does.
+    def set_profile(self,name,rang=None):
+        prof = SMUSetup.PROFILES[name]
+        sens = self.state.get('sens','curr') if self.state else 'curr'
+        self.__send('nplc',str(prof['nplc']),f'sens:{sens}:nplc {prof["nplc"]}')
+        if prof['range'] == 'fixed' and rang is not None:
+            self.__send(f'{sens}:rang',f'{rang:.3g}',f'sens:{sens}:rang {rang:.3g}')
+        else:
+            self.__send(f'{sens}:rang','auto',f'sens:{sens}:rang:auto on')
+        self.__send('azer',prof['azer'],f'syst:azer:stat {prof["azer"]}')
+
+    # Smallest relative distance from val to a limit, None when there are
+    # no limits to be close to
+    def margin(val,limits):
+        dists = [abs(val-lim)/max(abs(lim),1e-12) for lim in limits if lim is not None]
+        return min(dists) if dists else None
+
+    # Profile good enough to tell val from the limits
+    def choose_profile(val,limits):
+        if val is None:
+            return 'normal'
+        m = SMUSetup.margin(val,limits)
+        if m is None or m >= SMUSetup.MARGINS['fast']:
+            return 'fast'
+        if m >= SMUSetup.MARGINS['normal']:
+            return 'normal'
+        return 'precise'
+
+    # True if val, read with the profile name, is over range or too close to
+    # the limits to call with it
+    def needs_precise(name,val,limits):
+        order = list(SMUSetup.PROFILES)
+        if name == 'precise':
+            return False
+        return abs(val) >= SMUSetup.OVERFLOW or order.index(SMUSetup.choose_profile(val,limits)) > order.index(name)
+
+    # Set up the profile that the readings expected against their limits
+    # call for (or the profile given), the most precise any of them needs,
+    # on a fixed range that covers them all. points is a list of (limits,
+    # expected). Returns the name of the profile.
+    def profile_for(self,points,profile=None):
+        order = list(SMUSetup.PROFILES)
+        name = profile or max((SMUSetup.choose_profile(expected,limits) for limits,expected in points),key=order.index)
+        bounds = [abs(v) for limits,expected in points for v in list(limits)+[expected] if v is not None]
+        self.set_profile(name,1.2*max(bounds) if bounds else None)
+        return name
+
+    # Measure with the profile that expected calls for against limits (or
+    # the profile given), and again with precise if the reading is too close
+    # to call or over range. With more than one sample the result is that
+    # of acquire(), the mean first.
+    def measure_for(self,limits,expected=None,elem=None,profile=None,samples=1):
+        name = self.profile_for([(limits,expected)],profile)
+        take = self.measure if samples == 1 else lambda elem: self.acquire(samples,elem)
+        res = take(elem)
+        val = float(res[0])
+        over = max(abs(float(v)) for v in res) >= SMUSetup.OVERFLOW
+        if over or SMUSetup.needs_precise(name,val,limits):
+            logging.debug(f'{val} is close to {limits} with the {name} profile, measuring again')
+            self.set_profile('precise')
+            res = take(elem)
+        return res
+
+    # Load levels into the voltage source list. After start_list() every
+    # trigger() steps to the next level and takes count readings of it into
+    # the trace buffer, delay is the source delay before each reading.
+    def load_list(self,levels,delay=None,count=1):
+        n = len(levels)
+        if not 1 <= n*count <= SMUSetup.MAX_LIST:
+            raise ValueError(f'The SMU source list holds 1 to {SMUSetup.MAX_LIST} points, not {n} levels of {count}.')
+        vals = ','.join(f'{float(v):g}' for v in levels for _ in range(count))
+        self.__send('vmode','list','sour:volt:mode list')
+        self.__send('list',vals,f'sour:list:volt {vals}')
+        if delay is not None:
+            self.set_delay(delay)
+        self.__send('coun',str(count),f'trig:coun {count}')
+        self.__send('arm','bus','arm:sour bus')
+        self.__send('acoun',str(n),f'arm:coun {n}')
+
+    # Clear the trace buffer for the next n readings
+    def start_trace(self,n):
+        self.smu.queue(f'trac:poin {n}')
+        self.smu.queue('trac:feed sens')
+        self.smu.queue('trac:cle')
+        self.smu.queue('trac:feed:cont next')
+
+    # Clear the trace buffer for n readings and start the list, which then
+    # waits for the triggers
+    @reconnecting
+    def start_list(self,n):
+        self.start_trace(n)
+        self.smu.write('init')
+
+    # Send the queue and start one reading into the trace buffer, taken the
+    # source delay later, without waiting for it
+    @reconnecting
+    def start_reading(self):
+        self.__send('coun','1','trig:coun 1')
+        self.smu.write('init')
+
+    # Bus trigger, the next point of the list
+    @reconnecting
+    def trigger(self):
+        self.smu.write('*trg')
+
+    # Stop a list before its last trigger, the readings taken so far stay
+    # in the trace buffer
+    @reconnecting
+    def abort(self):
+        self.smu.write('abor')
+
+    # Wait until the trace buffer holds n readings. *opc? can't be used for
+    # this, the list isn't done until its last trigger.
+    @reconnecting
+    def wait_points(self,n,timeout=5.0):
+        end = monotonic()+timeout
+        while int(float(self.smu.query('trac:poin:act?'))) < n:
+            if monotonic() > end:
+                raise IOError(f'The SMU did not store reading {n} within {timeout} s.')
+            sleep(0.001)
+
+    # Source delay before each reading in seconds, None for auto
+    def set_delay(self,delay):
+        if delay is None:
+            self.__send('del','auto','sour:del:auto on')
+        else:
+            self.__send('del',f'{delay:g}',f'sour:del {delay:g}')
+
+    # Back to a fixed level with immediate arming and auto delay after a list
+    def fixed_source(self):
+        self.__send('vmode','fix','sour:volt:mode fix')
+        self.__send('arm','imm','arm:sour imm')
+        self.__send('acoun','1','arm:coun 1')
+        self.set_delay(None)
+
+    # Forget the shadow state so the next setup does a full reset
+    def invalidate(self):
+        self.state = None
+
+    # Change the level of the current source mode
+    def set_level(self,lev):
+        src = self.state.get('src','volt') if self.state else 'volt'
+        self.__send(f'{src}:lev',str(lev),f'sour:{src}:lev {lev}')
+
+    # Turn the output on or off
+    def output(self,on=True):
+        self.__send('outp','on' if on else 'off',f'outp {"on" if on else "off"}')
+
+    # Set the elements returned by a reading
+    def set_elements(self,elem):
+        self.__send('elem',elem,f'form:elem {elem}')
+
+    # Queue cmd only if the shadow value for key is different. With batching
+    # off this is where the command is written.
+    @reconnecting
+    def __send(self,key,val,cmd):
+        if self.state is not None and self.state.get(key) == val:
+            return
+        self.smu.queue(cmd)
+        if self.state is not None:
+            self.state[key] = val
+        self.settings[key] = (val,cmd)
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+'''
+Description:
+    Columnar store for the results of a lot. Measurements are kept in a
+    float64 array indexed by (chip, test, pin, mode), with NaN where nothing
+    was measured, and next to it bool arrays of which points were tested and
+    which passed. The arrays are NumPy memmaps on disk that grow in chunks
+    of chips. They are flushed (with the JSON sidecar) every flush_every
+    chips and at the end of the lot, not for every chip.
+
+    add_chip() also keeps running totals for every (test, pin, mode): the
+    count, mean and sum of squared deviations (Welford), min, max and the
+    passed and skipped counts. aggregate() is worked out from those, so it
+    costs the same after ten chips as after 100k. A store opened from disk
+    adds its totals up once, when it is opened.
+
+    The store is what the end-of-lot report and its statistics are made
+    from. The statistics shown while the lot runs come from LotStatistics
+    (lot_statistics.py) instead, which costs the same for every chip.
+    Tests with a LOW/HIGH half ('output drive current test low') are stored
+    under the test name with the mode on its own axis. Points the test flow
+    skipped are neither tested nor passed, and are marked in an array of
+    their own; each chip's hard and soft bin are kept with it.
+
+Files, for path 'lot':
+    lot.json       tests, pins, limits, site names and chip count
+    lot.chips.i8   chip numbers
+    lot.sites.i2   site of each chip, as an index into the site names
+    lot.meas.f64   measurements
+    lot.tested.b   True where the point was measured
+    lot.passed.b   True where the point passed
+    lot.skipped.b  True where the point was skipped
+    lot.hbin.i2    hard bin of each chip, 0 when it wasn't binned
+    lot.sbin.i2    soft bin of each chip
+'''
+__author__ = "Victoria (Rice) Rodriguez"
+__email__ = "rice.rodriguez@ttu.edu"
+__status__ = "Prototype"
+
+import json
+import warnings
+import numpy as np
+from test_flow import SKIPPED
+
+MODES = ('','low','high')
+
+# 'output drive current test low' -> ('output drive current test', 'low')
+def split_test(test):
+    base,_,mode = test.rpartition(' ')
+    if mode in MODES[1:]:
+        return base,mode
+    return test,''
+
+class ResultStore:
+    def __init__(self,path,tests,num_pins,chunk=1024,limits=None,count=0,sites=None,mode='w+',bin_names=None,flush_every=256):
+        self.path = path
+        self.tests = []
+        for t in tests:
+            base,_ = split_test(t)
+            if base not in self.tests:
+                self.tests.append(base)
+        self.pins = [f'pin {i+1}' for i in range(num_pins)]
+        self.chunk = chunk
+        # Test key -> (lower, upper)
+        self.limits = limits or {}
+        # Site names, None for a single-site station
+        self.sites = sites or [None]
+        # Soft bin -> name
+        self.bin_names = bin_names or {}
+        self.count = count
+        # Chips added since the last flush, flushed after flush_every
+        self.flush_every = flush_every
+        self.unflushed = 0
+        self.capacity = max(chunk,-(-count//chunk)*chunk)
+        self.map(mode)
+        self.totals()
+
+    def shape(self,capacity):
+        return (capacity,len(self.tests),len(self.pins),len(MODES))
+
+    def map(self,mode):
+        shape = self.shape(self.capacity)
+        self.chip_nums = np.memmap(f'{self.path}.chips.i8',dtype=np.int64,mode=mode,shape=(self.capacity,))
+        self.chip_sites = np.memmap(f'{self.path}.sites.i2',dtype=np.int16,mode=mode,shape=(self.capacity,))
+        self.meas = np.memmap(f'{self.path}.meas.f64',dtype=np.float64,mode=mode,shape=shape)
+        self.tested = np.memmap(f'{self.path}.tested.b',dtype=np.bool_,mode=mode,shape=shape)
+        self.passed = np.memmap(f'{self.path}.passed.b',dtype=np.bool_,mode=mode,shape=shape)
+        self.skipped = np.memmap(f'{self.path}.skipped.b',dtype=np.bool_,mode=mode,shape=shape)
+        self.hbins = np.memmap(f'{self.path}.hbin.i2',dtype=np.int16,mode=mode,shape=(self.capacity,))
+        self.sbins = np.memmap(f'{self.path}.sbin.i2',dtype=np.int16,mode=mode,shape=(self.capacity,))
+        if mode == 'w+':
+            self.meas[:] = np.nan
+
+    # Running totals of every (test, pin, mode), added up from the chips
+    # already in the store
+    def totals(self):
+        m = self.meas[:self.count]
+        t = self.tested[:self.count]
+        self.n = t.sum(axis=0)
+        self.npassed = (self.passed[:self.count] & t).sum(axis=0)
+        self.nskipped = self.skipped[:self.count].sum(axis=0)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore',RuntimeWarning)
+            self.mean = np.nan_to_num(np.nanmean(m,axis=0)) if self.count else np.zeros(self.shape(1)[1:])
+            self.m2 = np.nansum((m-self.mean)**2,axis=0)
+            self.lo = np.where(self.n > 0,np.nanmin(m,axis=0),np.inf) if self.count else np.full(self.shape(1)[1:],np.inf)
+            self.hi = np.where(self.n > 0,np.nanmax(m,axis=0),-np.inf) if self.count else np.full(self.shape(1)[1:],-np.inf)
+
+    # Open a store written earlier
+    def open(path,mode='r'):
+        with open(f'{path}.json') as f:
+            meta = json.load(f)
+        return ResultStore(path,meta['tests'],meta['num_pins'],meta['chunk'],
+                           {k:tuple(v) for k,v in meta['limits'].items()},
+                           meta['count'],meta['sites'],mode,
+                           {int(k):v for k,v in meta.get('bin_names',{}).items()})
+
+    # Make room for chunk more chips. The memmap files are extended in place.
+    def grow(self):
+        self.flush()
+        old = self.capacity
+        self.capacity += self.chunk
+        del self.meas,self.tested,self.passed,self.skipped,self.hbins,self.sbins,self.chip_nums,self.chip_sites
+        self.map('r+')
+        self.meas[old:] = np.nan
+
+    def index(self,test,pin):
+        base,mode = split_test(test)
+        return self.tests.index(base),int(pin.split()[-1])-1,MODES.index(mode)
+
+    def add_chip(self,chip,tests):
+        if self.count == self.capacity:
+            self.grow()
+        row = self.count
+        for t in tests:
+            ref = chip.refs.get(t)
+            if ref is None:
+                continue
+            # Limits come from the test object, not a skipped test
+            if t not in self.limits and hasattr(ref,'limits'):
+                self.limits[t] = tuple(ref.limits)
+            for p,m in ref.meas.items():
+                if ref.outcomes.get(p) == SKIPPED:
+                    idx = self.index(t,p)
+                    self.skipped[(row,)+idx] = True
+                    self.nskipped[idx] += 1
+                    continue
+                if m is None:
+                    continue
+                i,j,k = self.index(t,p)
+                passed = bool(ref.outcomes.get(p))
+                self.meas[row,i,j,k] = m
+                self.tested[row,i,j,k] = True
+                self.passed[row,i,j,k] = passed
+                self.add_point(i,j,k,float(m),passed)
+        if chip.site not in self.sites:
+            self.sites.append(chip.site)
+        self.chip_nums[row] = chip.num
+        self.chip_sites[row] = self.sites.index(chip.site)
+        chip_bin = getattr(chip,'bin',None)
+        if chip_bin is not None:
+            self.hbins[row] = chip_bin['hbin']
+            self.sbins[row] = chip_bin['sbin']
+            self.bin_names[int(chip_bin['sbin'])] = chip_bin['name']
+        self.count += 1
+        self.unflushed += 1
+        if self.unflushed >= self.flush_every:
+            self.flush()
+
+    # Welford's update of the totals of one point
+    def add_point(self,i,j,k,m,passed):
+        n = self.n[i,j,k]+1
+        delta = m-self.mean[i,j,k]
+        self.n[i,j,k] = n
+        self.mean[i,j,k] += delta/n
+        self.m2[i,j,k] += delta*(m-self.mean[i,j,k])
+        self.lo[i,j,k] = min(self.lo[i,j,k],m)
+        self.hi[i,j,k] = max(self.hi[i,j,k],m)
+        if passed:
+            self.npassed[i,j,k] += 1
+
+    def flush(self):
+        self.unflushed = 0
+        self.meas.flush()
+        self.tested.flush()
+        self.passed.flush()
+        self.skipped.flush()
+        self.hbins.flush()
+        self.sbins.flush()
+        self.chip_nums.flush()
+        self.chip_sites.flush()
+        with open(f'{self.path}.json','w') as f:
+            json.dump({'tests':self.tests,'num_pins':len(self.pins),'chunk':self.chunk,
+                       'limits':self.limits,'sites':self.sites,'count':self.count,
+                       'bin_names':self.bin_names},f)
+
+    # Statistics over every chip for every (test, pin, mode) at once, from
+    # the running totals. Each value is an array shaped (tests, pins,
+    # modes), NaN for points that were never measured.
+    def aggregate(self):
+        n = self.n
+        with np.errstate(invalid='ignore',divide='ignore'):
+            return {'count':n.copy(),
+                    'skipped':self.nskipped.copy(),
+                    'mean':np.where(n > 0,self.mean,np.nan),
+                    'stdev':np.where(n > 1,np.sqrt(self.m2/(n-1)),np.nan),
+                    'min':np.where(n > 0,self.lo,np.nan),
+                    'max':np.where(n > 0,self.hi,np.nan),
+                    'yield':self.npassed/np.maximum(n,1)}
+
+    # True for every chip where nothing that was measured failed
+    def chip_passed(self):
+        t = self.tested[:self.count]
+        return ~(t & ~self.passed[:self.count]).any(axis=(1,2,3))
+
+    # Chips per (hard bin, soft bin), the bins in order
+    def bin_counts(self):
+        pairs = np.stack([self.hbins[:self.count],self.sbins[:self.count]],axis=1)
+        if not len(pairs):
+            return {}
+        keys,counts = np.unique(pairs,axis=0,return_counts=True)
+        return {(int(h),int(s)):int(n) for (h,s),n in zip(keys,counts)}
+
+    # Cpk of one point from its aggregate mean and stdev
+    def cpk(self,test,mean,stdev):
+        lower,upper = self.limits.get(test,(None,None))
+        if not stdev or np.isnan(stdev):
+            return None
+        sides = []
+        if upper is not None:
+            sides.append((upper-mean)/(3*stdev))
+        if lower is not None:
+            sides.append((mean-lower)/(3*stdev))
+        return float(min(sides)) if sides else None
+
+# Write the end-of-lot text report from the store
+def write_summary(store,fname,tests):
+    agg = store.aggregate()
+    with open(fname,'w+') as f:
+        for t in tests:
+            f.write(f'{t.title()}\n')
+            if split_test(t)[0] not in store.tests:
+                continue
+            i,_,k = store.index(t,'pin 1')
+            for j,p in enumerate(store.pins):
+                n = int(agg['count'][i,j,k])
+                skipped = int(agg['skipped'][i,j,k])
+                if n == 0:
+                    if skipped:
+                        f.write(f'    {p.title()}:\n')
+                        f.write(f'        Skipped: {skipped} chips\n')
+                    continue
+                mean,sd = agg['mean'][i,j,k],agg['stdev'][i,j,k]
+                f.write(f'    {p.title()}:\n')
+                f.write(f'        Average: {mean:.4g}\n')
+                if n > 1:
+                    f.write(f'        Standard Deviation: {sd:.4g}\n')
+                f.write(f'        Min/Max: {agg["min"][i,j,k]:.4g} / {agg["max"][i,j,k]:.4g}\n')
+                f.write(f'        Yield: {100*agg["yield"][i,j,k]:.1f}%\n')
+                if skipped:
+                    f.write(f'        Skipped: {skipped} chips\n')
+                cpk = store.cpk(t,mean,sd)
+                if cpk is not None:
+                    f.write(f'        Cpk: {cpk:.3f}\n')
+                # Measurements are kept at full precision, only rounded
+                # here for the report
+                for c in np.flatnonzero(store.tested[:store.count,i,j,k]):
+                    f.write(f'        Chip #{store.chip_nums[c]}: {store.meas[c,i,j,k]:.4g} ({bool(store.passed[c,i,j,k])})\n')
+        bins = store.bin_counts()
+        if any(h for h,_ in bins):
+            f.write('Bins\n')
+            for (h,sb),n in bins.items():
+                name = store.bin_names.get(sb,'not binned' if h == 0 else '')
+                f.write(f'    Hard {h} / Soft {sb} ({name}): {n} chips ({100*n/max(store.count,1):.1f}%)\n')
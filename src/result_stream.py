@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+'''
+Description:
+    Append-only record of a lot, written one chip at a time as soon as the
+    chip is done, so a crash part way through a lot only loses the chip on
+    the socket. Every record is one (chip, test, pin) measurement and its
+    outcome, written as CSV or as JSON Lines.
+
+    Writes are buffered. The file is flushed after every chip and synced to
+    disk every fsync_every chips, and again when the stream is closed.
+
+    A new stream starts the file over; with resume=True it is appended to,
+    to carry on a lot that was cut short.
+
+    Points the test flow skipped are written with no measurement and
+    'skipped' as the outcome.
+
+    The stream is the crash-safe log of the lot. Reports and statistics are
+    made from the ResultStore (result_store.py) instead.
+'''
+__author__ = "Victoria (Rice) Rodriguez"
+__email__ = "rice.rodriguez@ttu.edu"
+__status__ = "Prototype"
+
+import os
+import csv
+import json
+import logging
+from test_flow import SKIPPED
+
+class ResultStream:
+    FIELDS = ('chip','site','test','pin','meas','outcome')
+
+    def __init__(self,fname,fmt=None,fsync_every=10,resume=False):
+        if fmt is None:
+            fmt = 'jsonl' if fname.endswith(('.jsonl','.json')) else 'csv'
+        if fmt not in ('csv','jsonl'):
+            raise ValueError(f'Unknown stream format {fmt}, use csv or jsonl.')
+        self.fname = fname
+        self.fmt = fmt
+        self.fsync_every = fsync_every
+        self.count = 0
+        new = not resume or not os.path.exists(fname) or os.path.getsize(fname) == 0
+        self.f = open(fname,'a' if resume else 'w',newline='')
+        if fmt == 'csv':
+            self.writer = csv.writer(self.f)
+            if new:
+                self.writer.writerow(ResultStream.FIELDS)
+        logging.debug(f'Streaming results to {fname} ({fmt})')
+
+    def records(chip,tests):
+        for t in tests:
+            ref = chip.refs.get(t)
+            if ref is None:
+                continue
+            for p,m in ref.meas.items():
+                o = ref.outcomes.get(p)
+                yield (chip.num,chip.site,t,p,
+                       None if m is None else float(m),
+                       o if o is None or o == SKIPPED else bool(o))
+
+    def write_chip(self,chip,tests):
+        for rec in ResultStream.records(chip,tests):
+            if self.fmt == 'csv':
+                self.writer.writerow(['' if v is None else v for v in rec])
+            else:
+                self.f.write(json.dumps(dict(zip(ResultStream.FIELDS,rec)))+'\n')
+        self.f.flush()
+        self.count += 1
+        if self.count % self.fsync_every == 0:
+            os.fsync(self.f.fileno())
+
+    def close(self):
+        if self.f.closed:
+            return
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.f.close()
+
+    # Records of a stream file as dicts, with the numbers and outcomes
+    # turned back into floats and bools
+    def read(fname):
+        with open(fname,newline='') as f:
+            if fname.endswith(('.jsonl','.json')):
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+                return
+            for row in csv.DictReader(f):
+                row['chip'] = int(row['chip'])
+                row['site'] = row['site'] or None
+                row['meas'] = float(row['meas']) if row['meas'] else None
+                row['outcome'] = {'True':True,'False':False,SKIPPED:SKIPPED}.get(row['outcome'])
+                yield row
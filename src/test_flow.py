@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+'''
+Description:
+    Decides, step by step, whether the rest of a chip is worth testing, and
+    puts the chip in a bin once it is done. A chip that fails the contact
+    test is going to be scrapped, so the tests that need it to make contact
+    are skipped instead of taking their minutes on it.
+
+Procedure:
+    1. Before each step, skip it if the chip was stopped or a test the step
+       depends on has failed.
+    2. After each step, note the tests that failed, and stop the chip if one
+       of them stops on failure.
+    3. Once the chip is done, give it the hard and soft bin of the first
+       row of the bin table that matches it.
+
+    Skipped points are recorded with no measurement and SKIPPED as their
+    outcome, so every chip has the same points in the reports and the
+    statistics, and a skip can be told from a pin the test doesn't use.
+
+Configuration:
+    depends       test -> tests that must pass before it, by default every
+                  test depends on the contact test (see test_sequencer). The
+                  sequencer orders the steps to match.
+    stop_on_fail  test -> True to stop the chip at the first failing point
+                  of that test. Otherwise the rest of that test still runs
+                  and only the tests that depend on it are skipped.
+    bins          rows of {'hbin','sbin','name','fails'}, checked in order.
+                  A row matches a chip that failed any of the tests in
+                  fails, or any test at all when fails is None. A chip
+                  with no failures goes in PASS_BIN, one that fails but
+                  matches no row in FAIL_BIN.
+'''
+__author__ = "Victoria (Rice) Rodriguez"
+__email__ = "rice.rodriguez@ttu.edu"
+__status__ = "Prototype"
+
+import logging
+import test_sequencer
+
+# Outcome of a point that was skipped
+SKIPPED = 'skipped'
+
+PASS_BIN = {'hbin':1,'sbin':1,'name':'pass'}
+FAIL_BIN = {'hbin':9,'sbin':99,'name':'fail'}
+BINS = [{'hbin':5,'sbin':50,'name':'contact fail','fails':('contact test',)},
+        {'hbin':4,'sbin':40,'name':'power consumption fail','fails':('power consumption test',)},
+        {'hbin':3,'sbin':30,'name':'short current fail','fails':('output short current test',)},
+        {'hbin':3,'sbin':31,'name':'drive current low fail','fails':('output drive current test low',)},
+        {'hbin':3,'sbin':32,'name':'drive current high fail','fails':('output drive current test high',)},
+        {'hbin':2,'sbin':20,'name':'threshold fail','fails':('voltage threshold test low','voltage threshold test high')}]
+
+# Results of a test none of whose steps ran on a chip, with the same meas
+# and outcomes as the test object would have
+class SkippedTest:
+    def __init__(self,pins):
+        self.meas = dict.fromkeys(pins)
+        self.outcomes = dict.fromkeys(pins)
+
+class TestFlow:
+    def __init__(self,depends=None,stop_on_fail=None,bins=None):
+        self.depends_on = dict(test_sequencer.DEPENDS,**(depends or {}))
+        self.stop_on_fail = stop_on_fail or {}
+        self.bins = BINS if bins is None else bins
+
+    # Tests that have to pass before test
+    def depends(self,test):
+        return self.depends_on.get(test,test_sequencer.DEFAULT_DEPENDS)
+
+    # Tests whose results a step records, both halves for a drive current
+    # list sweep step
+    def step_tests(step):
+        if step.test == 'output drive current test':
+            return ['output drive current test low','output drive current test high']
+        return [step.test]
+
+    # Failed tests of chip that are test, or one of its LOW/HIGH halves
+    def failed(chip,test):
+        return [t for t in chip.failed if t == test or t.startswith(f'{test} ')]
+
+    # Why the step has to be skipped on chip, None if it is to run
+    def skip_reason(self,chip,step):
+        if chip.stopped:
+            return f'chip stopped after the {chip.stopped} failed'
+        for dep in self.depends(step.test):
+            failed = TestFlow.failed(chip,dep)
+            if dep != step.test and failed:
+                return f'the {failed[0]} failed'
+        return None
+
+    # Note what failed in the step just run
+    def done(self,chip,step):
+        for test in TestFlow.step_tests(step):
+            ref = chip.refs.get(test)
+            if ref is None or ref.outcomes.get(step.pin) in (None,True,SKIPPED):
+                continue
+            chip.failed.add(test)
+            name = test if test in self.stop_on_fail else step.test
+            if self.stop_on_fail.get(name) and not chip.stopped:
+                logging.info(f'Chip #{chip.num} failed the {test} on {step.pin}, stopping')
+                chip.stopped = test
+
+    # Bin of a finished chip, the first row of the table that matches it
+    def bin(self,chip):
+        if not chip.failed:
+            return PASS_BIN
+        for row in self.bins:
+            fails = row.get('fails')
+            if fails is None or any(TestFlow.failed(chip,t) for t in fails):
+                return row
+        return FAIL_BIN
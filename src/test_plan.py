@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+'''
+Description:
+    Everything about testing a lot that only depends on its pins, its
+    voltages and the station, worked out once and shared by every chip of
+    the lot: the pins of each role, the pins each test runs on, the steps in
+    the order the sequencer picked and what the operator is asked to set
+    up.
+
+Procedure:
+    1. Find the pins of each role (IN, OUT, VCC, GND) and the pins each
+       test runs on, from the test classes in test_sequencer.CLASSES.
+    2. Order the steps with the sequencer.
+    3. Compile each step: the test object it runs on and LOW or HIGH for
+       the halves, and the message of its fixture, so no chip works them
+       out again. The SMU commands of each setup are rendered once by
+       SMUSetup.commands, not here.
+
+    A plan isn't changed once it is compiled. Its tables are tuples and
+    read-only mappings, so the chips of every site can share one.
+'''
+__author__ = "Victoria (Rice) Rodriguez"
+__email__ = "rice.rodriguez@ttu.edu"
+__status__ = "Prototype"
+
+import types
+import test_sequencer
+
+ROLES = ('IN','OUT','VCC','GND')
+
+# What the operator is asked to set up for each fixture of the sequencer
+FIXTURE_MSGS = {'contact test':'Please set {inputs} to GND.',
+                'power consumption test':'Please float output {outputs}.',
+                'output short current test':'Set the input pins such that the DUT should output a logic HIGH.',
+                'output drive current test low':'Set the inputs of the DUT so that the outputs under test should be in logic-level LOW.',
+                'output drive current test high':'Set the inputs of the DUT so that the outputs under test should be in logic-level HIGH.',
+                'voltage threshold test low':'Set up the inputs so that the output pin should result in a logic level LOW while {pin} is also set to logic level LOW.',
+                'voltage threshold test high':'Set up the inputs so that the output pin should result in a logic level HIGH while {pin} is also set to logic level HIGH.'}
+
+# A step of the sequencer, compiled
+class PlanStep:
+    def __init__(self,step,msg):
+        self.test = step.test
+        self.pin = step.pin
+        self.config = step.config
+        self.fixture = step.fixture
+        self.dmm = step.dmm
+        self.order = step.order
+        # Test object the step runs on, and LOW or HIGH for the halves of
+        # a test ('' otherwise)
+        if step.test.endswith((' low',' high')):
+            self.name,_,mode = step.test.rpartition(' ')
+            self.mode = mode.upper()
+        else:
+            self.name,self.mode = step.test,''
+        # What the operator is asked to set up, None for the relay board
+        self.msg = msg
+
+    def __repr__(self):
+        return f'PlanStep({self.test!r}, {self.pin!r})'
+
+class TestPlan:
+    # Same arguments as the Sequencer, voltages as ICDataset takes them.
+    # options maps a test to the keyword arguments its test object is made
+    # with, e.g. {'contact test':{'profile':'fast','samples':4}}.
+    def __init__(self,tests,pins,voltages,routed=False,routes_dmm=False,drive_sweep=False,depends=None,options=None):
+        self.tests = tuple(tests)
+        self.pins = tuple(pins)
+        self.voltages = tuple(float(v) for v in voltages)
+        self.vcc = self.voltages[0]
+        self.options = types.MappingProxyType({t:types.MappingProxyType(dict(o)) for t,o in (options or {}).items()})
+        # Pin indices of each role
+        self.roles = types.MappingProxyType({r:tuple(i for i,p in enumerate(pins) if p == r) for r in ROLES})
+        # Pins each test runs on, the list sweep included when it is used
+        names = [t for t in self.tests if t in test_sequencer.CLASSES]
+        if drive_sweep and any(t.startswith('output drive current test') for t in names):
+            names.append('output drive current test')
+        self.valid = types.MappingProxyType({t:tuple(test_sequencer.valid_pins(t,self.pins)) for t in names})
+        seq = test_sequencer.Sequencer(self.tests,self.pins,routed,routes_dmm,drive_sweep=drive_sweep,
+                                       depends=depends,valid=self.valid)
+        self.cost = seq.cost
+        self.steps = tuple(self.compile(step) for step in seq.plan)
+
+    # 'pins 1, 2 and 4' for the pins of a role
+    def pin_list(self,role):
+        nums = [str(i+1) for i in self.roles[role]]
+        if not nums:
+            return 'no pins'
+        if len(nums) == 1:
+            return f'pin {nums[0]}'
+        return f'pins {", ".join(nums[:-1])} and {nums[-1]}'
+
+    def compile(self,step):
+        msg = None
+        if step.fixture is not None:
+            msg = FIXTURE_MSGS[step.test].format(inputs=self.pin_list('IN'),outputs=self.pin_list('OUT'),pin=step.pin)
+        return PlanStep(step,msg)
@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+'''
+Description:
+    Orders the measurements of a chip so that the SMU is reconfigured, the
+    probes or relays are moved and the fixture is set up as few times as
+    possible. Every (test, pin) measurement is a step. Each step has the
+    SMU source/sense configuration it needs, where the SMU (and DMM) have
+    to be, and the state the operator has to put the fixture in.
+
+Procedure:
+    1. Make the steps of every test in the order the tests were picked.
+    2. Build an order a fixture at a time: out of the fixtures whose tests
+       have their dependencies done, take the one cheapest to start, and
+       within it always the step cheapest to go to from the last.
+    3. Keep whichever of that order and the order the tests were picked in
+       costs less.
+
+Cost model:
+    Seconds per change, see COSTS. The fixture and a manual probe move are
+    the operator's time and dominate, so steps are grouped by fixture
+    first. Within a fixture the router switching relays (or the operator
+    moving the probe) costs more than reconfiguring the SMU, so every step
+    on a pin is done back to back, e.g. the short current and the HIGH drive
+    current of an output one after the other.
+
+    A plan only depends on the pins and the tests, so it is made once and
+    used for every chip of the lot.
+'''
+__author__ = "Victoria (Rice) Rodriguez"
+__email__ = "rice.rodriguez@ttu.edu"
+__status__ = "Prototype"
+
+import logging
+from resources import gate_map, LazyModule
+
+contact_test = LazyModule('contact_test')
+power_consumption_test = LazyModule('power_consumption_test')
+output_short_current_test = LazyModule('output_short_current_test')
+output_drive_current_test = LazyModule('output_drive_current_test')
+voltage_threshold_test = LazyModule('voltage_threshold_test')
+functional_test = LazyModule('functional_test')
+
+# Seconds for each kind of change between two steps
+COSTS = {'fixture':10.0,   # operator sets up the inputs or outputs again
+         'probe':5.0,      # operator moves the SMU or DMM probe
+         'relay':0.03,     # relay frame and settling time
+         'src':0.005,      # source function, output transient
+         'sens':0.003,     # sense function
+         'lev':0.001}      # source level
+
+# SMU (source, level, sense) as the tests set it up, 'vcc' is the VCC of
+# the lot. The threshold search sets its own levels, and the functional
+# test only turns the SMU output off.
+CONFIGS = {'contact test':('curr','250e-6','volt'),
+           'power consumption test':('volt','vcc','curr'),
+           'output short current test':('volt','0','curr'),
+           'output drive current test low':('volt','0.4','curr'),
+           'output drive current test high':('volt','2.4','curr'),
+           'output drive current test':('volt','list','curr'),
+           'voltage threshold test low':('volt','0','volt'),
+           'voltage threshold test high':('volt','vcc','volt'),
+           'functional test':None}
+
+# Fixture each test needs. Tests that need the same inputs share a fixture;
+# the threshold tests need one per input pin, the other inputs of the gate
+# holding the output where the pin under test can switch it.
+FIXTURES = {'contact test':'inputs grounded',
+            'power consumption test':'outputs floating',
+            'output short current test':'outputs high',
+            'output drive current test low':'outputs low',
+            'output drive current test high':'outputs high',
+            # Inputs set by the relay board test cases, nothing to set up
+            'output drive current test':None,
+            'voltage threshold test low':'threshold low',
+            'voltage threshold test high':'threshold high',
+            'functional test':None}
+
+# Tests that have to be done on the chip before a test can start. Nothing
+# is worth measuring on a chip that isn't making contact.
+DEPENDS = {'contact test':()}
+DEFAULT_DEPENDS = ('contact test',)
+
+# Class of each test, looked up by name. The LOW and HIGH halves have
+# their own classes holding their results.
+CLASSES = {'contact test':lambda: contact_test.ContactTest,
+           'power consumption test':lambda: power_consumption_test.PowerConsumptionTest,
+           'output short current test':lambda: output_short_current_test.OutputShortCurrentTest,
+           'output drive current test':lambda: output_drive_current_test.OutputDriveCurrentTest,
+           'output drive current test low':lambda: output_drive_current_test.OutputDriveCurrentTestLow,
+           'output drive current test high':lambda: output_drive_current_test.OutputDriveCurrentTestHigh,
+           'voltage threshold test':lambda: voltage_threshold_test.VoltageThresholdTest,
+           'voltage threshold test low':lambda: voltage_threshold_test.VoltageThresholdTestLow,
+           'voltage threshold test high':lambda: voltage_threshold_test.VoltageThresholdTestHigh,
+           'functional test':lambda: functional_test.FunctionalTest}
+
+# Class of a test, raises ValueError for a test that doesn't exist
+def test_class(test):
+    if test not in CLASSES:
+        raise ValueError(f'Unknown test {test!r}, use one of {", ".join(CLASSES)}.')
+    return CLASSES[test]()
+
+# Pins a test runs on
+def valid_pins(test,pins):
+    return test_class(test).get_valid_pins(pins)
+
+class Step:
+    def __init__(self,test,pin,config,fixture,dmm=None,order=0):
+        self.test = test
+        self.pin = pin
+        # SMU (source, level, sense)
+        self.config = config
+        self.fixture = fixture
+        # Pin the DMM reads, None when the DMM isn't used
+        self.dmm = dmm
+        # Position in the order the tests were picked, breaks ties
+        self.order = order
+
+    def __repr__(self):
+        return f'Step({self.test!r}, {self.pin!r})'
+
+class Sequencer:
+    # routed: a router moves the SMU, routes_dmm: it moves the DMM too,
+    # drive_sweep: the LOW and HIGH drive currents of a pin are one step
+    # (OutputDriveCurrentTest.execute_sweep), depends: test -> tests that
+    # have to be done before it, on top of DEPENDS, valid: test -> pins it
+    # runs on, worked out from the pins when left out
+    def __init__(self,tests,pins,routed=False,routes_dmm=False,costs=None,drive_sweep=False,depends=None,valid=None):
+        self.tests = tests
+        self.pins = pins
+        self.routed = routed
+        self.routes_dmm = routes_dmm
+        self.drive_sweep = drive_sweep
+        self.depends_on = dict(DEPENDS,**(depends or {}))
+        self.costs = dict(COSTS,**(costs or {}))
+        self.steps = self.make_steps(valid)
+        self.plan,self.cost = self.order()
+        logging.debug(f'Test plan of {len(self.plan)} steps, {self.cost:.2f} s of changes '
+                      f'({self.total(self.steps):.2f} s in the order picked)')
+
+    # Steps in the order the tests were picked. The functional test is left
+    # out without a relay board to drive its vectors. valid maps a test to
+    # its pins when they are already known.
+    def make_steps(self,valid=None):
+        gates = gate_map(self.pins)
+        dmm_pins = {i:o for o,ins in gates.items() for i in ins}
+        steps = []
+        for test in self.tests:
+            if self.drive_sweep and test.startswith('output drive current test'):
+                if test.endswith('high'):
+                    continue
+                test = 'output drive current test'
+            if test not in CONFIGS:
+                continue
+            if test == 'functional test' and not self.routed:
+                logging.warning('The functional test needs a relay board, leaving it out.')
+                continue
+            pins = valid[test] if valid and test in valid else valid_pins(test,self.pins)
+            for pin in pins:
+                fixture = FIXTURES[test]
+                dmm = None
+                if test.startswith('voltage threshold test'):
+                    fixture = (fixture,pin)
+                    dmm = dmm_pins.get(pin)
+                steps.append(Step(test,pin,CONFIGS[test],fixture,dmm,len(steps)))
+        return steps
+
+    # Seconds to go from step a (None at the start) to step b
+    def transition(self,a,b):
+        costs = self.costs
+        if a is None:
+            return (costs['fixture'] if b.fixture is not None else 0.0)+(costs['relay'] if self.routed else costs['probe'])
+        cost = 0.0
+        # None is a fixture the relay board sets up by itself
+        if b.fixture is not None and a.fixture != b.fixture:
+            cost += costs['fixture']
+        move = costs['relay'] if self.routed else costs['probe']
+        if a.pin != b.pin:
+            cost += move
+        if b.dmm is not None and a.dmm != b.dmm:
+            cost += costs['relay'] if self.routes_dmm else costs['probe']
+        # None leaves the SMU as it is
+        if a.config is not None and b.config is not None:
+            for key,x,y in zip(('src','lev','sens'),a.config,b.config):
+                if x != y:
+                    cost += costs[key]
+        return cost
+
+    def total(self,steps):
+        prev,cost = None,0.0
+        for step in steps:
+            cost += self.transition(prev,step)
+            prev = step
+        return cost
+
+    def depends(self,test):
+        return self.depends_on.get(test,DEFAULT_DEPENDS)
+
+    # Every fixture is set up once: the steps are taken a fixture at a time,
+    # and within it cheapest-next from the step before. The next fixture is
+    # the one, out of those whose dependencies are done, that is cheapest to
+    # start. Falls back to the order the tests were picked in if that turns
+    # out cheaper. Returns the steps and their cost.
+    def order(self):
+        groups = {}
+        for step in self.steps:
+            groups.setdefault(step.fixture,[]).append(step)
+        picked = set(self.tests)
+        done = {}
+        total = {}
+        for step in self.steps:
+            total[step.test] = total.get(step.test,0)+1
+
+        def ready(group):
+            tests = {s.test for s in group}
+            return all(done.get(d,0) == total.get(d,0)
+                       for t in tests for d in self.depends(t) if d in picked and d not in tests)
+
+        plan,prev = [],None
+        while groups:
+            options = [g for g in groups.values() if ready(g)] or list(groups.values())
+            group = min(options,key=lambda g: min((self.transition(prev,s),s.order) for s in g))
+            del groups[group[0].fixture]
+            left = list(group)
+            while left:
+                step = min(left,key=lambda s: (self.transition(prev,s),s.order))
+                left.remove(step)
+                done[step.test] = done.get(step.test,0)+1
+                plan.append(step)
+                prev = step
+        cost = self.total(plan)
+        default = self.total(self.steps)
+        if default <= cost and self.keeps_depends(self.steps):
+            return list(self.steps),default
+        return plan,cost
+
+    # True if no step in steps comes before a step of a test it depends on
+    def keeps_depends(self,steps):
+        last = {}
+        for i,step in enumerate(steps):
+            last[step.test] = i
+        first = {}
+        for i,step in enumerate(steps):
+            first.setdefault(step.test,i)
+        return all(last[d] < first[t] for t in first for d in self.depends(t) if d in last and d != t)
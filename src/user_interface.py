@@ -12,68 +12,173 @@ __author__ = "Victoria (Rice) Rodriguez"
 __email__ = "rice.rodriguez@ttu.edu"
 __status__ = "Prototype"
 
+import os
 import logging
 import argparse
 import pprint
 import re
-import pyvisa
-import PySimpleGUI as gui
+from concurrent.futures import ThreadPoolExecutor
 # from . import *
-from statistics import mean, stdev, StatisticsError
-from contact_test import ContactTest
-from power_consumption_test import PowerConsumptionTest
-from output_short_current_test import OutputShortCurrentTest
-from output_drive_current_test import OutputDriveCurrentTest, OutputDriveCurrentTestLow, OutputDriveCurrentTestHigh
-from voltage_threshold_test import VoltageThresholdTest, VoltageThresholdTestLow, VoltageThresholdTestHigh
+from resources import SessionPool, RelayBoard, PinRouter, LazyModule
+from result_stream import ResultStream
+from lot_statistics import LotStatistics
+from histograms import HistogramSet, HistogramRenderer
+import test_sequencer
+import test_flow
+import test_plan
+
+# Loaded the first time they are used, so scripts that only need
+# TotalDataset don't wait for the GUI toolkit, pyvisa or NumPy
+gui = LazyModule('PySimpleGUI')
+pyvisa = LazyModule('pyvisa')
+result_store = LazyModule('result_store')
 # from resources import RelayBoard
 LIST_TESTS = ['Contact Test','Power Consumption Test','Voltage Threshold Test','Output Short Current Test','Output Drive Current Test','Functional Test']
 
 win = None
 class TotalDataset:
-    def __init__(self,tests):
-        self.rm=pyvisa.ResourceManager()
+    # sites maps a site name to the instruments of that socket, e.g.
+    # {'A':{'smu':'SMU2400','dmm':'Fluke_8840A_MM','relay':'COM1'},
+    #  'B':{'smu':'SMU2400_B','dmm':'Fluke_8840A_MM_B','relay':'COM2'}}
+    # options are the keyword arguments of the test objects, by test (see
+    # test_plan.TestPlan), drive_sweep measures IOL and IOH in one list sweep
+    # when there is a relay board to switch the inputs
+    def __init__(self,tests,router=None,sites=None,stream=None,store=None,hists=None,rm=None,flow=None,options=None,drive_sweep=False):
+        self.router=router
+        self.options=options or {}
+        self.drive_sweep=drive_sweep
+        # TestFlow deciding what to skip on a failing chip and binning it
+        self.flow=flow or test_flow.TestFlow()
+        # ResultStream every finished chip is written to
+        self.stream=stream
+        # ResultStore the lot is kept in for the end-of-lot report
+        self.store=store
+        # Running statistics of the lot, up to date after every chip
+        self.stats = LotStatistics()
+        # HistogramSet of the per-test tabs
+        self.hists=hists
+        # One pool for the whole run, every chip and test shares its sessions
+        self.rm=rm or SessionPool(pyvisa.ResourceManager())
         logging.debug('Created a new total dataset reference.')
         self.tests = tests
         self.chips = []
         self.sum_ct = []
-        self.Cpk = None
+        # Per-site pools, routers and chips, each site only ever touches
+        # its own instruments and results
+        self.sites = sites or {}
+        self.site_pools = {}
+        self.site_routers = {}
+        self.site_chips = {}
+        # Last readings of each test, carried over from chip to chip to
+        # pick the measurement profile (see ICDataset.expected), one set for
+        # a single-site station and one per site
+        self.expected = {}
+        self.site_expected = {}
+        for name,site in self.sites.items():
+            aliases = {'SMU2400':site.get('smu','SMU2400'),'Fluke_8840A_MM':site.get('dmm','Fluke_8840A_MM')}
+            self.site_pools[name] = SessionPool(self.rm.manager(),aliases=aliases,owns_rm=False,profiler=self.rm.profiler,
+                                                batch=self.rm.batch,binary=self.rm.binary)
+            self.site_routers[name] = PinRouter(RelayBoard(port=site['relay'],profiler=self.rm.profiler)) if site.get('relay') else None
+            self.site_chips[name] = []
+            self.site_expected[name] = {}
+        # Compiled test plans, see compile()
+        self.plans = {}
 
     def add_chip(self,chip):
         self.chips.append(chip)
 
+    # Cpk per (test, pin) so far in the lot
+    @property
+    def Cpk(self):
+        return self.stats.cpk()
+
+    # Count a finished chip in the running statistics, write it out and let
+    # go of its test objects, the store and the stream are the record of
+    # the lot from here on
+    def finish_chip(self,chip):
+        self.stats.update(chip,self.tests)
+        if self.hists is not None:
+            self.hists.update(chip,self.tests)
+        if self.store is not None:
+            self.store.add_chip(chip,self.tests)
+        if self.stream is not None:
+            self.stream.write_chip(chip,self.tests)
+        if self.store is not None or self.stream is not None:
+            chip.refs = {}
+
+    # Test one chip on every site at once, numbered from first_num in site
+    # order. Operators can't answer popups for several sockets at the same
+    # time, so site chips log their prompts and rely on the relay boards.
+    def run_sites(self,pin_vals,voltages,first_num):
+        names = list(self.sites)
+        chips = []
+        for i,name in enumerate(names):
+            chip = ICDataset(self.site_pools[name],first_num+i,pin_vals,voltages,self.site_routers[name],self.site_expected[name])
+            chip.site = name
+            chip.prompt = lambda msg,title,name=name: logging.info(f'[site {name}] {title}: {msg}')
+            chips.append(chip)
+        with ThreadPoolExecutor(max_workers=len(names)) as pool:
+            list(pool.map(self.run_tests,chips))
+        for name,chip in zip(names,chips):
+            self.site_chips[name].append(chip)
+            self.finish_chip(chip)
+        # Merged lot, in chip order
+        self.chips.extend(chips)
+        return chips
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+        if self.store is not None:
+            self.store.flush()
+        for pool in self.site_pools.values():
+            pool.close()
+        self.rm.close()
+
+    # TestPlan of the chip, compiled once per pin list, voltages and
+    # routing and shared by every chip (and site) that has the same
+    def compile(self,chip):
+        routed = chip.router is not None
+        # The drive current list sweep needs the relay board to set the inputs
+        sweep = routed and self.drive_sweep
+        key = (tuple(chip.pins),tuple(chip.voltages),routed,routed and chip.router.routes_dmm(),sweep)
+        if key not in self.plans:
+            self.plans[key] = test_plan.TestPlan(self.tests,chip.pins,chip.voltages,routed,key[3],
+                                                 drive_sweep=sweep,depends=self.flow.depends_on,options=self.options)
+        return self.plans[key]
+
     def run_tests(self,chip):
-        # Go through all the tests
-        v_once,o_once = False,False
-        for test in self.tests:
-            if test == 'contact test':
-                chip.contact_test()
-            elif test == 'power consumption test':
-                chip.power_consumption_test()
-            elif test == 'output short current test':
-                chip.output_short_current_test()
-            elif test.startswith('output drive current test') and not o_once:
-                chip.output_drive_current_test()
-                o_once=True
-            elif test == 'functional test':
-                # chip.functional_test()
-                pass
-            elif test.startswith('voltage threshold test') and not v_once:
-                chip.voltage_threshold_test()
-                v_once=True
-            else:
-                continue
+        chip.run_plan(self.compile(chip),self.flow)
 
 # Contains the dataset for the individual chip
 class ICDataset:
-    def __init__(self,rm,num,pins,voltages):
+    def __init__(self,rm,num,pins,voltages,router=None,expected=None):
         logging.debug('Created a new IC dataset object reference, number %(num)s')
         self.rm=rm
+        # Relay board router, None means the operator moves the probes
+        self.router=router
         # List of what the pins are
         self.pins = pins
         # Which chip in the set
         self.num = num
+        # Test site the chip was tested on, None on a single-site station
+        self.site = None
         # References to the subclasses
         self.refs = {}
+        # TestPlan the chip is being tested with
+        self.plan = None
+        # Test objects, made the first time one of their steps runs
+        self.tests = {}
+        # Last readings by test, shared with the chips tested before and
+        # after this one on the same site
+        self.expected = {} if expected is None else expected
+        # Tests that failed on the chip, the one that stopped it (if any)
+        # and the bin it went in, see test_flow
+        self.failed = set()
+        self.stopped = None
+        self.bin = None
+        # Errors the SMU reported while testing the chip
+        self.errors = []
         # VCC level
         self.vcc = float(voltages[0])
         self.vih = float(voltages[1])
@@ -82,100 +187,160 @@ class ICDataset:
         self.vol = float(voltages[4])
         self.voltages=voltages
 
-    def contact_test(self):
-        logging.debug('Beginning the Contact Test')
-        valid_pins = ContactTest.get_valid_pins(self.pins)
-        con = ContactTest(self.rm,self.pins)
-        # Add the object reference to the dict so we have access to it
-        self.refs['contact test'] = con
-
-        # Get list of input pins
-        input_pins = [str(i+1) for i,pin in enumerate(self.pins) if pin == 'IN']
-        # Tell user which pins to set to GND
-        try:
-            input_pins[-1] = f'and {input_pins[-1]}'
-            msg = f'Please set pins {", ".join(input_pins)} to GND.'
-            # win['msg'].update(value=msg)
-            gui.Popup(msg,title='Contact Test')
-        except TypeError:
-            msg = f'Please set pin {input_pins} to GND.'
-            gui.Popup(msg,title='Contact Test')
-            # win['msg'].update(value=msg)
-
-        # Go through list of pins
-        for i,pin in enumerate(valid_pins):
-            # self.relay_board.set_relay(pin)
-            msg = f'Please move the SMU probe to {pin}.'
-            gui.Popup(msg,title='Contact Test')
-            # win['msg'].update(value=msg)
-            # while True:
-            #     event,val = win.Read(timeout=10)
-            #     if event == 'Back':
-            #         msg = f'Please move the SMU probe to {valid_pins[i-1]}.'
-            #         win['msg'].update(value=msg)
-            #         con.execute_test(valid_pins[i-1],i-1==len(valid_pins)-1)
-            #         break
-            #     elif event == 'Next':
-            #         con.execute_test(pin,i==len(valid_pins)-1)
-            #         break
-
-    def power_consumption_test(self):
-        logging.debug('Beginning the Power Consumption Test')
-
-        # Get list of output pins
-        output_pins = [str(i+1) for i,pin in enumerate(self.pins) if pin == 'OUT']
-        try:
-            output_pins[-1] = f'and {output_pins[-1]}'
-            msg = f'Please float output pins {", ".join(output_pins)}.'
-            gui.Popup(msg,title='Power Consumption Test')
-        except TypeError:
-            msg = f'Please float output pin {output_pins}.'
-            gui.Popup(msg,title='Power Consumption Test')
-            # output_pins = [output_pins]
-
-        pctest = PowerConsumptionTest(self.rm,self.vcc,self.pins)
-        self.refs['power consumption test'] = pctest
-
-        msg = 'Please move the SMU probe to the VCC pin {self.pins.index("VCC")+1}.'
-        gui.Popup(msg,title='Power Consumption Test')
-        # There's only one VCC pin
-        pctest.execute_test(f'pin {self.pins.index("VCC")+1}',last=True)
-
-    def output_short_current_test(self):
-        logging.debug('Beginning the Output Short Current Test')
-        gui.Popup('Set the input pins such that the DUT should output a logic HIGH.',title='Output Short Current Test')
-        osct = OutputShortCurrentTest(self.rm,self.pins)
-        self.refs['output short current test']=osct
-        valid_pins = OutputShortCurrentTest.get_valid_pins(self.pins)
-        for i,pin in enumerate(valid_pins):
-            gui.Popup(f'Please move the probe from the SMU to {pin}.',title='Output Short Current Test')
-            osct.execute_test(pin,i==len(valid_pins)-1)
-
-    def output_drive_current_test(self):
-        logging.debug('Beginning the Output Drive Current Test')
-        valid_pins = OutputDriveCurrentTest.get_valid_pins(self.pins)
-        odctest = OutputDriveCurrentTest(self.rm,self.vcc,self.pins)
-        for i,pin in enumerate(valid_pins):
-            gui.Popup(f'Set the inputs of the DUT so that the output {pin} under test should be in logic-level LOW.',title='Output Drive Current Test (Low)')
-            self.refs['output drive current test low']=odctest.execute_test(pin,'LOW',False)
-            gui.Popup(f'Set the inputs of the DUT so that the output {pin} under test should be in logic-level HIGH.',title='Output Drive Current Test (High)')
-            self.refs['output drive current test high']=odctest.execute_test(pin,'HIGH',i==len(valid_pins)-1)
-
-    def voltage_threshold_test(self):
-        logging.debug('Beginning the Voltage Threshold Test')
-        print(self.pins)
-        # Get list of input pins
-        input_pins = [f'pin {i+1}' for i,pin in enumerate(self.pins) if pin == 'IN']
-        vt = VoltageThresholdTest(self.rm,self.vcc,self.vih,self.vil,self.voh,self.vol,self.pins)
-
-        for i,pin in enumerate(input_pins):
-            gui.Popup(f'Move the probe of the SMU to input {pin} and set up the inputs so that the output pin should result in a logic level LOW while {pin} is also set to logic level LOW. Move the probe of the DMM to the output pin.',title='Voltage Threshold Test (Low)')
-            self.refs['voltage threshold test low'] = vt.execute_test(pin,'LOW',i==len(input_pins)-1)
-            gui.Popup(f'Move the probe of the SMU to input {pin} and set up the inputs so that the output pin should result in a logic level HIGH while {pin} is also set to logic level HIGH. Move the probe of the DMM to the output pin.',title='Voltage Threshold Test (High)')
-            self.refs['voltage threshold test high'] = vt.execute_test(pin,'HIGH',i==len(input_pins)-1)
-        
-
-def start_tests(fname,pin_vals,tests,voltages):
+    def prompt(self,msg,title):
+        gui.Popup(msg,title=title)
+
+    # Tell the pool's profiler, if there is one, what the commands are for
+    def profile(self,**kwargs):
+        if getattr(self.rm,'profiler',None) is not None:
+            self.rm.profiler.set_context(**kwargs)
+
+    # Run the steps of a compiled plan in order. The operator is
+    # asked to change the fixture (and move the probes, without a router)
+    # only when the next step needs it. With a router the SMU output is
+    # turned off before the relays are switched to another pin, so no relay
+    # opens or closes with the SMU sourcing through it. A flow
+    # (test_flow.TestFlow) skips the steps not worth running and bins the
+    # chip at the end. The SMU error queue is read once, after the last
+    # step, and the SMU is reset.
+    def run_plan(self,plan,flow=None):
+        self.plan = plan
+        steps = plan.steps
+        fixture,pin,dmm = None,None,None
+        smu = None
+        self.profile(chip=self.num)
+        for step in steps:
+            reason = flow.skip_reason(self,step) if flow is not None else None
+            if reason is not None:
+                self.skip(step,reason)
+                continue
+            self.profile(test=step.test,pin=step.pin)
+            title = step.test.title()
+            if step.fixture != fixture:
+                # None is set up by the relay board, which leaves the inputs
+                # as the operator needs to set them up again
+                if step.msg is not None:
+                    self.prompt(step.msg,title)
+                fixture = step.fixture
+            if self.router is None:
+                if step.pin != pin:
+                    self.prompt(f'Please move the SMU probe to {step.pin}.',title)
+                if step.dmm is not None and step.dmm != dmm:
+                    self.prompt(f'Please move the probe of the DMM to {step.dmm}.',title)
+            else:
+                # A step without an SMU setup (the functional test) has
+                # every SMU and DMM relay open
+                to = (step.pin,step.dmm) if step.config is not None else (None,None)
+                if smu is not None and self.router.switches(*to):
+                    smu.output(False)
+                    smu.flush()
+                if step.config is None:
+                    if self.router.switches(*to):
+                        self.router.release()
+                else:
+                    self.router.connect(step.pin,step.dmm)
+                if step.dmm is not None and step.dmm != dmm and not self.router.routes_dmm():
+                    self.prompt(f'Please move the probe of the DMM to {step.dmm}.',title)
+                if step.config is None:
+                    self.router.settle()
+                else:
+                    # The SMU setup of the step goes out while the relays
+                    # settle, the SMU waits before it sources or reads
+                    self.rm.hold(self.router.settle)
+            pin,dmm = step.pin,step.dmm if step.dmm is not None else dmm
+            smu = self.run_step(step) or smu
+            if flow is not None:
+                flow.done(self,step)
+        # Anything the SMU refused while testing the chip, read before the
+        # reset clears the error queue
+        self.profile(test=None,pin=None)
+        if self.router is not None:
+            self.rm.hold(None)
+        if smu is not None:
+            errors = smu.check_errors()
+            if errors:
+                logging.warning(f'Chip #{self.num}: the SMU reported {len(errors)} errors')
+            self.errors = errors
+            smu.reset()
+        if self.router is not None and steps:
+            # Off by the reset above
+            self.router.release()
+        self.profile(chip=None)
+        if flow is not None:
+            self.bin = flow.bin(self)
+            logging.info(f'Chip #{self.num}: bin {self.bin["hbin"]}/{self.bin["sbin"]} ({self.bin["name"]})')
+
+    # Record the points of a step as skipped
+    def skip(self,step,reason):
+        logging.debug(f'Skipping the {step.test} on {step.pin}: {reason}')
+        for test in test_flow.TestFlow.step_tests(step):
+            if test not in self.refs:
+                self.refs[test] = test_flow.SkippedTest(self.plan.valid[test])
+            self.refs[test].meas[step.pin] = None
+            self.refs[test].outcomes[step.pin] = test_flow.SKIPPED
+
+    # Every input of the DUT HIGH or LOW, through the relay board test cases
+    def set_inputs(self,high):
+        self.router.board.test_cases(1 if high else 0)
+
+    # How the test object of each test is made, given its class, the last
+    # readings of the test and its options from the plan
+    MAKERS = {'contact test':lambda chip,cls,expected,**opts: cls(chip.rm,chip.pins,expected,**opts),
+              'power consumption test':lambda chip,cls,expected,**opts: cls(chip.rm,chip.vcc,chip.pins,expected,**opts),
+              'output short current test':lambda chip,cls,expected,**opts: cls(chip.rm,chip.pins,expected,**opts),
+              'output drive current test':lambda chip,cls,expected,**opts: cls(chip.rm,chip.vcc,chip.pins,
+                                                                                chip.set_inputs if chip.router is not None else None,expected,**opts),
+              'voltage threshold test':lambda chip,cls,expected,**opts: cls(chip.rm,chip.vcc,chip.vih,chip.vil,chip.voh,chip.vol,chip.pins,**opts),
+              'functional test':lambda chip,cls,expected,**opts: cls(chip.rm,chip.router.board,chip.pins,**opts)}
+
+    # Test object of a test, one per chip
+    def test_object(self,name):
+        if name not in self.tests:
+            logging.debug(f'Beginning the {name.title()}')
+            self.tests[name] = ICDataset.MAKERS[name](self,test_sequencer.test_class(name),self.expected.setdefault(name,{}),
+                                                      **self.plan.options.get(name,{}))
+        return self.tests[name]
+
+    # The ways a step is run, see RUNNERS
+    def run_pin(self,test,step,last):
+        test.execute_test(step.pin,last)
+        self.refs[step.test] = test
+
+    def run_power(self,test,step,last):
+        test.execute_test(step.pin,self.vcc,last)
+        self.refs[step.test] = test
+
+    # The LOW and HIGH halves are recorded separately
+    def run_half(self,test,step,last):
+        self.refs[step.test] = test.execute_test(step.pin,step.mode,last)
+
+    # LOW and HIGH in one list sweep
+    def run_sweep(self,test,step,last):
+        lo,hi = test.execute_sweep(step.pin,last)
+        self.refs['output drive current test low'] = lo
+        self.refs['output drive current test high'] = hi
+
+    RUNNERS = {'contact test':run_pin,
+               'power consumption test':run_power,
+               'output short current test':run_pin,
+               'output drive current test':run_sweep,
+               'output drive current test low':run_half,
+               'output drive current test high':run_half,
+               'voltage threshold test low':run_half,
+               'voltage threshold test high':run_half,
+               'functional test':run_pin}
+
+    # Measure the pin of one step of the plan. The tests set the SMU up
+    # for themselves on every pin, which only sends what changed since the
+    # step before. Returns the SMUSetup of the test.
+    def run_step(self,step,last=False):
+        test = self.test_object(step.name)
+        ICDataset.RUNNERS[step.test](self,test,step,last)
+        # SMU the test used
+        return getattr(test,'instr',None) or getattr(test,'smu_setup',None)
+
+# Split the tests that have a LOW and a HIGH half into the two
+def expand_tests(tests):
     if 'voltage threshold test' in tests:
        tests[tests.index('voltage threshold test')] = 'voltage threshold test low'
        tests.append('voltage threshold test high')
@@ -183,10 +348,14 @@ def start_tests(fname,pin_vals,tests,voltages):
     if 'output drive current test' in tests:
        tests[tests.index('output drive current test')] = 'output drive current test low'
        tests.append('output drive current test high')
+    return tests
+
+def start_tests(fname,pin_vals,tests,voltages,router=None,sites=None,stream_fmt='csv',hist_dir=None):
+    expand_tests(tests)
 
     tab_layout = [[gui.Image('resources/placeholder.png')]]
     hist_layout = [gui.TabGroup([[gui.Tab(title=test.title(),
-                                          layout=[[gui.Image('resources/placeholder.png')]],
+                                          layout=[[gui.Image('resources/placeholder.png',key=f'hist {test}')]],
                                           key=f'tab {test}')] for test in tests])]
 
     layout = [[gui.T(text=f'{tests[0].title()}',
@@ -206,44 +375,39 @@ def start_tests(fname,pin_vals,tests,voltages):
     # Start by making the overarching dataset class
 
     print(tests)
-    chip_set = TotalDataset(tests)
+    # Every chip is streamed and stored next to the report as soon as it
+    # is done
+    base = os.path.splitext(fname)[0]
+    stream_fname = f'{base}_results.{stream_fmt}'
+    store = result_store.ResultStore(f'{base}_store',tests,len(pin_vals))
+    # Histograms are counted per chip and drawn in the background
+    hists = HistogramSet(tests)
+    renderer = HistogramRenderer(hists)
+    chip_set = TotalDataset(tests,router,sites,ResultStream(stream_fname,stream_fmt),store,hists)
     chip_count = 1
-    only_one = False
     while True:
         print(pin_vals)
-        chip = ICDataset(chip_set.rm,chip_count,pin_vals,voltages)
-        chip_set.add_chip(chip)
-        chip_set.run_tests(chip)
+        if chip_set.sites:
+            chip_count = chip_set.run_sites(pin_vals,voltages,chip_count)[-1].num
+        else:
+            chip = ICDataset(chip_set.rm,chip_count,pin_vals,voltages,chip_set.router,chip_set.expected)
+            chip_set.add_chip(chip)
+            chip_set.run_tests(chip)
+            chip_set.finish_chip(chip)
+        renderer.request()
+        for test,img in renderer.ready().items():
+            win[f'hist {test}'].update(filename=img)
         answer=gui.PopupYesNo(f'Tests finished for chip #{chip_count}. Do you want to test another chip?')
         if answer=='Yes':
             chip_count+=1
             continue
         else:
-            # Done collecting data
-            # Get all the averages
-            chip_set.rm.close()
-            averages = {t:{p:mean((c.refs[t].meas[p] for c in chip_set.chips)) for p in eval(t.title().replace(' ','')).get_valid_pins(pin_vals)} for t in tests}
-            try:
-                stdevs = {t:{p:stdev((c.refs[t].meas[p] for c in chip_set.chips)) for p in eval(t.title().replace(' ','')).get_valid_pins(pin_vals)} for t in tests}
-            except StatisticsError:
-                only_one = True
-                pass
-            all_outcomes = {t:{c.num:c.refs[t].outcomes for c in chip_set.chips} for t in tests}
-            all_meas = {t:{c.num:c.refs[t].meas for c in chip_set.chips} for t in tests}
-            with open(fname,'w+') as f:
-                for t in tests:
-                    # f.write(f'{t.upper():~^50}\n')
-                    f.write(f'{t.title()}\n')
-                    for p in eval(t.title().replace(' ','')).get_valid_pins(pin_vals):
-                        # f.write(f'{p.upper()} AVERAGE = {averages[t][p]}\n')
-                        f.write(f'    {p.title()}:\n')
-                        f.write(f'        Average: {averages[t][p]}\n')
-                        if not only_one:
-                            f.write(f'        Standard Deviation: {stdevs[t][p]}\n')
-                        
-                        for c in chip_set.chips:
-                            f.write(
-                                f'        Chip #{c.num}: {all_meas[t][c.num][p]} ({all_outcomes[t][c.num][p]})\n')
+            # Done collecting data, the report is made from the store
+            chip_set.close()
+            result_store.write_summary(store,fname,tests)
+            renderer.close()
+            if hist_dir:
+                renderer.save(hist_dir)
             break
     return
 
@@ -391,7 +555,7 @@ if __name__ == '__main__':
                 wcurr.close()
                 started=True
                 voltages = [val['vcc_lev'],val['vih_lev'],val['vil_lev'],val['voh_lev'],val['vol_lev']]
-                start_tests(val['fname_data_input'],pin_vals,tests,voltages)
+                start_tests(val['fname_data_input'],pin_vals,tests,voltages,hist_dir=val['fname_hist_input'] or None)
             break
 
         elif event == 'Open':
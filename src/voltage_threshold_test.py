@@ -15,6 +15,17 @@ Procedures:
     5. Decrease the voltage level on the input pin in steps of .1 VDC
     6. If the device produces and error, record the input voltage as Vih
 
+    The SMU reads the input voltage at every point while the DMM reads the
+    output (see probe), so the threshold is recorded as the input voltage
+    measured at the point the output switched, at no cost in time. The
+    readings go into the SMU trace buffer and are fetched once per pin.
+
+Sweep mode:
+    strategy='sweep' is the linear search with the staircase loaded into
+    the SMU source list in one message. Each point is then a bus trigger
+    and a DMM read, and the list is aborted once the output has switched.
+    The 8840A keeps no readings, so the DMM is still read at every point.
+
 Outcomes:
     Vil:
         Passing Condition: Vil >= .8 VDC
@@ -30,10 +41,9 @@ __email__ = "rice.rodriguez@ttu.edu"
 __status__ = "Prototype"
 
 
-import pyvisa
 import logging
 import argparse as arg
-from resources import SMUSetup, DMMSetup
+from resources import SMUSetup, DMMSetup, SessionPool
 from time import sleep
 
 '''
@@ -45,10 +55,14 @@ and low classes without needing to instantiate the VoltageThresholdTest class
 
         
 class VoltageThresholdTest:
+    STRATEGIES = ('linear','bisect','coarse-fine','sweep')
+    # Points the 2400 source list holds
+    MAX_POINTS = 100
+
     def get_valid_pins(pin_vals):
         return [f'pin {i+1}' for i,pin in enumerate(pin_vals) if pin == 'IN']
 
-    def __init__(self, rm, vcc, vih, vil, voh, vol, pin_vals):
+    def __init__(self, rm, vcc, vih, vil, voh, vol, pin_vals, strategy='bisect', resolution=0.1, coarse=None, dwell=0.05, smu_alias='SMU2400', dmm_alias='Fluke_8840A_MM'):
         self.rm = rm
         self.msg = 'Please make sure you connected one input pin and one output pin'
 
@@ -57,19 +71,34 @@ class VoltageThresholdTest:
         self.vil = vil
         self.voh = voh
         self.vol = vol
-        
-        self.smu_setup = SMUSetup(src='volt',lev='0',sens='volt',rm=rm)
+
+        if strategy not in VoltageThresholdTest.STRATEGIES:
+            raise ValueError(f'Unknown search strategy {strategy}, use one of {", ".join(VoltageThresholdTest.STRATEGIES)}.')
+        # Search options, resolution and coarse are in volts and dwell is the
+        # time given to each point before the DMM is read. Without a coarse
+        # step, coarse-fine picks the one that needs the fewest reads.
+        self.strategy = strategy
+        self.resolution = resolution
+        self.coarse = coarse
+        self.dwell = dwell
+
+        self.smu_setup = SMUSetup(src='volt',lev='0',sens='volt',rm=rm,alias=smu_alias)
         self.smu = self.smu_setup.smu
         
         # Write the DMM Setup class once we figure out what the alias is
-        self.dmm_setup = DMMSetup('volt')
-        self.dmm = self.dmm_setup.dmm
-
-        self.outcomes = dict.fromkeys(VoltageThresholdTest.get_valid_pins(pin_vals))
-        self.meas = dict.fromkeys(VoltageThresholdTest.get_valid_pins(pin_vals))
-        self.hi = VoltageThresholdTestHigh(self.meas,self.outcomes)
-        self.lo = VoltageThresholdTestLow(self.meas,self.outcomes)
+        self.dmm_setup = DMMSetup('volt',rm=rm,alias=dmm_alias)
 
+        pins = VoltageThresholdTest.get_valid_pins(pin_vals)
+        self.outcomes = dict.fromkeys(pins)
+        self.meas = dict.fromkeys(pins)
+        # Each half keeps its own results, self.meas has the latest of either
+        self.hi = VoltageThresholdTestHigh(dict.fromkeys(pins),dict.fromkeys(pins))
+        self.lo = VoltageThresholdTestLow(dict.fromkeys(pins),dict.fromkeys(pins))
+        # Pass limits (lower, upper) come from the lot's VIH and VIL
+        self.hi.limits = (None,self.vih)
+        self.lo.limits = (self.vil,None)
+        # Settle-and-read cycles used per pin and mode
+        self.steps = {p:{} for p in pins}
 
     def execute_test(self,pin,mode,last=False):
         if mode.upper() == 'HIGH':
@@ -78,40 +107,165 @@ class VoltageThresholdTest:
             self.smu_setup.setup(src='volt',lev='0',sens='volt')
         
         # Set voltage to VCC, then increase in steps until output reads 2
-        self.smu.write('outp on')
-        self.smu.write(f'form:elem volt')
+        self.smu_setup.output(True)
+        self.smu_setup.set_elements('volt')
+        # The input is read after the dwell, over whatever range it takes
+        self.smu_setup.set_profile('normal')
+        self.smu_setup.set_delay(self.dwell)
+        self.smu_setup.start_trace(SMUSetup.MAX_SAMPLES)
+        # The DMM reads below need the SMU set up before them
+        self.smu_setup.flush()
         
+        high = mode.upper() == 'HIGH'
+        self.probed = []
+        res,n = self.search(high)
+        res = self.sensed(res)
+        self.steps[pin][mode.upper()] = n
+        result = self.record(pin,mode,res)
+        if last:
+            self.smu_setup.reset()
+        return result
+
+    # Find the threshold with the configured strategy, returns the level and
+    # the number of settle-and-read cycles it took
+    def search(self,high):
+        if self.strategy == 'bisect':
+            return self.bisect(high)
+        elif self.strategy == 'coarse-fine':
+            return self.coarse_fine(high)
+        elif self.strategy == 'sweep':
+            return self.sweep(high)
+
         # DMM read
-        out_val = float(self.dmm.query('?'))
+        out_val = self.dmm_setup.read()
         sleep(0.5)
-        res = self.vcc
+        res = self.vcc if high else 0
+        n = 1
 
-        while out_val > self.vol if mode.upper() == 'HIGH' else out_val < self.voh:
-            res = res - 0.1 if mode.upper() == 'HIGH' else res + 0.1
+        while out_val > self.vol if high else out_val < self.voh:
+            res = res - self.resolution if high else res + self.resolution
             if res > self.vcc or res < 0:
-                out_val = float(self.dmm.query('?'))
+                out_val = self.dmm_setup.read()
+                n += 1
                 break
-            # Set the level of the source
-            self.smu.write(f'sour:volt:lev {res}')
-            out_val = float(self.dmm.query('?'))
+            out_val = self.probe(res)
+            n += 1
+        return res,n
 
-        fres = float(f'{float(res):.3f}')
+    def record(self,pin,mode,res):
+        logging.info(f'Voltage Threshold Test ({mode.upper()}) for {pin.capitalize()}: {res} V after {self.steps[pin].get(mode.upper())} steps ({self.strategy})')
+        fres = float(res)
         self.outcomes[pin] = (fres <= self.vih) if mode.upper() == 'HIGH' else (fres >= self.vil)
         self.meas[pin] = fres
+        half = self.hi if mode.upper() == 'HIGH' else self.lo if mode.upper() == 'LOW' else None
+        if half is not None:
+            half.meas[pin] = self.meas[pin]
+            half.outcomes[pin] = self.outcomes[pin]
+            return half
+        return self
 
-        if mode.upper() == 'HIGH':
-            self.hi.meas = self.meas
-            self.hi.outcomes = self.outcomes
-            return self.hi
-        elif mode.upper() == 'LOW':
-            self.lo.meas = self.meas
-            self.lo.outcomes = self.outcomes
-            return self.lo
-        else:
-            return self
+    # True once the output has switched away from the state set up for mode
+    def switched(self,out_val,high):
+        return out_val <= self.vol if high else out_val >= self.voh
 
-        self.smu.write('*rst;outp off;*cls')
-        return fres
+    # Set the input level, give it time to settle and read the output. The
+    # SMU reads the input after the same dwell (its source delay), while
+    # the DMM is read.
+    def probe(self,level):
+        self.smu_setup.set_level(f'{level:.4f}')
+        self.smu_setup.start_reading()
+        self.probed.append(round(level,4))
+        sleep(self.dwell)
+        return self.dmm_setup.read()
+
+    # Input voltage the SMU read at the level probed, the level itself if it
+    # wasn't probed
+    def sensed(self,level):
+        if not self.probed:
+            return level
+        readings = dict(zip(self.probed,self.smu_setup.fetch('trac:data?')))
+        return round(float(readings.get(round(level,4),level)),4)
+
+    # Step from start towards stop without probing start itself. Returns the
+    # first switched level (None if it never switched), the last level that
+    # had not switched and the number of reads.
+    def walk(self,start,stop,step,high):
+        direction = -1 if high else 1
+        n = int(round(abs(stop-start)/step))
+        last = start
+        for i in range(1,n+1):
+            level = round(start+direction*i*step,4)
+            if self.switched(self.probe(level),high):
+                return level,last,i
+            last = level
+        return None,last,n
+
+    # Coarse steps until the output switches, then resolution steps back
+    # through the interval it switched in. Over a span s that is at most
+    # s/c+c/r reads for a coarse step c, fewest at c = sqrt(s*r).
+    def coarse_step(self):
+        if self.coarse is not None:
+            return max(self.coarse,self.resolution)
+        return max((float(self.vcc)*self.resolution)**0.5,self.resolution)
+
+    def coarse_fine(self,high):
+        start,stop = (float(self.vcc),0.0) if high else (0.0,float(self.vcc))
+        hit,last,n = self.walk(start,stop,self.coarse_step(),high)
+        if hit is None:
+            return stop,n
+        fine,_,m = self.walk(last,hit,self.resolution,high)
+        return (hit if fine is None else fine),n+m
+
+    # Bisect the input level between 0 and VCC. The first probe is at the
+    # pass limit, so the pass/fail decision is settled by the first read.
+    def bisect(self,high):
+        lo,hi = 0.0,float(self.vcc)
+        limit = self.vih if high else self.vil
+        level = limit if lo < limit < hi else (lo+hi)/2
+        n = 0
+        while hi-lo > self.resolution:
+            n += 1
+            # A switched output means the level is on the far side of the
+            # threshold: below it for HIGH, above it for LOW
+            if self.switched(self.probe(level),high):
+                if high:
+                    lo = level
+                else:
+                    hi = level
+            else:
+                if high:
+                    hi = level
+                else:
+                    lo = level
+            level = (lo+hi)/2
+        return round(lo if high else hi,4),n
+
+    # Levels from start to stop in steps of the resolution, widened if it
+    # takes more points than the source list holds
+    def staircase(self,start,stop):
+        span = abs(stop-start)
+        step = max(self.resolution,span/(VoltageThresholdTest.MAX_POINTS-1))
+        if step > self.resolution:
+            logging.warning(f'Sweep step widened to {step:.3f} V to fit the SMU source list.')
+        sign = 1 if stop >= start else -1
+        return [round(start+sign*i*step,4) for i in range(int(round(span/step))+1)]
+
+    # Step the staircase from the source list, one bus trigger per point,
+    # until the output switches. The SMU reads each point into the trace
+    # buffer the dwell after its trigger, while the DMM is read.
+    def sweep(self,high):
+        levels = self.staircase(float(self.vcc),0.0) if high else self.staircase(0.0,float(self.vcc))
+        self.smu_setup.load_list(levels,delay=self.dwell)
+        self.smu_setup.start_list(len(levels))
+        for level in levels:
+            self.smu_setup.trigger()
+            self.probed.append(level)
+            sleep(self.dwell)
+            if self.switched(self.dmm_setup.read(),high):
+                break
+        if len(self.probed) < len(levels):
+            self.smu_setup.abort()
+        return level,len(self.probed)
 
 class VoltageThresholdTestHigh:
     get_valid_pins = VoltageThresholdTest.get_valid_pins
@@ -129,6 +283,9 @@ if __name__ == '__main__':
     parser = arg.ArgumentParser(description = 'Voltage Threshold Test finds the minimum input Voltage'
                                           'required to cause the device output to switch from high to low')
     parser.add_argument('--verbose','-v', action = 'store_true', help = 'output verbosely')
+    parser.add_argument('--strategy', choices = VoltageThresholdTest.STRATEGIES, default = 'bisect', help = 'how to search for the threshold')
+    parser.add_argument('--resolution', type = float, default = 0.1, help = 'target resolution of the threshold in volts')
+    parser.add_argument('--sim', action = 'store_true', help = 'run against the simulated bench in resources/simulation.py')
     args = parser.parse_args()
 
     #if verbose is set, set logging level to debug, instead of warning
@@ -137,4 +294,18 @@ if __name__ == '__main__':
     else:
         logging.basicConfig(level=logging.WARNING)
 
+    if args.sim:
+        from resources import SimBench
+        rm = SessionPool(SimBench(time_scale=0).resource_manager())
+    else:
+        rm = SessionPool()
+    pins = ['IN','IN','OUT','IN','IN','OUT','GND','OUT','IN','IN','OUT','IN','IN','VCC']
+    vt = VoltageThresholdTest(rm,5.0,2.0,0.8,4.5,0.0,pins,strategy=args.strategy,resolution=args.resolution)
+    for pin in VoltageThresholdTest.get_valid_pins(pins):
+        vt.execute_test(pin,'LOW')
+        vt.execute_test(pin,'HIGH')
+    print(vt.meas)
+    print(vt.steps)
+    rm.close()
+
 
@@ -0,0 +1,35 @@
+# The modules live in src and import each other by name, the way the
+# scripts run them
+import os
+import sys
+import pytest
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),'src'))
+
+from resources import SimBench, SessionPool, RelayBoard
+
+# 74LS32, the DUT of the simulated bench
+PINS = ['IN','IN','OUT','IN','IN','OUT','GND','OUT','IN','IN','OUT','IN','IN','VCC']
+VOLTAGES = [5.0,2.0,0.8,4.5,0.0]
+
+@pytest.fixture
+def pins():
+    return list(PINS)
+
+@pytest.fixture
+def voltages():
+    return list(VOLTAGES)
+
+@pytest.fixture
+def bench():
+    return SimBench(time_scale=0,seed=1)
+
+@pytest.fixture
+def rm(bench):
+    pool = SessionPool(bench.resource_manager())
+    yield pool
+    pool.close()
+
+@pytest.fixture
+def board(bench):
+    return RelayBoard(port=bench.relay_port())
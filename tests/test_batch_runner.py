@@ -0,0 +1,55 @@
+import json
+import os
+import pytest
+from batch_runner import load_plan, check_plan, run_plan, plan_voltages
+from result_stream import ResultStream
+
+def plan(tmp_path,**kwargs):
+    base = {'pins':['IN','IN','OUT','IN','IN','OUT','GND','OUT','IN','IN','OUT','IN','IN','VCC'],
+            'voltages':{'vcc':5,'vih':2,'vil':0.8,'voh':4.5,'vol':0},
+            'tests':['Contact Test','Power Consumption Test','Voltage Threshold Test'],
+            'output':str(tmp_path/'lot.txt'),'chips':2,'backend':'sim',
+            'sim':{'time_scale':0,'seed':3},
+            'options':{'voltage threshold test':{'dwell':0}}}
+    base.update(kwargs)
+    return base
+
+@pytest.mark.parametrize('key,val,msg',[
+    ('pins',['IN','VDD'],'pin types'),
+    ('voltages',[5,2,0.8],'voh, vol'),
+    ('tests',['Contact Test','Leakage Test'],'Unknown tests'),
+    ('logic','buffer','logic'),
+    ('options',{'contact test':{'profile':'slow'}},'profile'),
+    ('options',{'contact test':{'samples':0}},'samples')])
+def test_mistakes_in_the_plan_are_named(tmp_path,key,val,msg):
+    with pytest.raises(ValueError,match=msg):
+        check_plan(plan(tmp_path,**{key:val}))
+
+def test_missing_key(tmp_path):
+    p = plan(tmp_path)
+    del p['output']
+    with pytest.raises(ValueError,match='output'):
+        check_plan(p)
+
+def test_plan_from_json_or_yaml(tmp_path):
+    p = plan(tmp_path,voltages=[5,2,0.8,4.5,0])
+    with open(tmp_path/'plan.json','w') as f:
+        json.dump(p,f)
+    assert load_plan(str(tmp_path/'plan.json')) == p
+    yaml = pytest.importorskip('yaml')
+    with open(tmp_path/'plan.yaml','w') as f:
+        yaml.safe_dump(p,f)
+    assert load_plan(str(tmp_path/'plan.yaml')) == p
+    assert plan_voltages(p) == plan_voltages(plan(tmp_path)) == [5,2,0.8,4.5,0]
+
+# A lot on the simulated bench, nobody to answer prompts
+def test_runs_a_lot_without_the_gui(tmp_path):
+    text = run_plan(plan(tmp_path,stream_fmt='jsonl'))
+    assert 'Chips tested: 2' in text
+    assert 'Chips passed: 2 (100.0%)' in text
+    assert 'Contact Test: 24/24 measurements passed' in text
+    assert os.path.exists(tmp_path/'lot.txt')
+    recs = list(ResultStream.read(str(tmp_path/'lot_results.jsonl')))
+    assert {r['chip'] for r in recs} == {1,2}
+    assert {r['test'] for r in recs} == {'contact test','power consumption test',
+                                         'voltage threshold test low','voltage threshold test high'}
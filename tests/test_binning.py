@@ -0,0 +1,53 @@
+from resources import SimBench, SessionPool, RelayBoard, PinRouter
+from user_interface import TotalDataset, ICDataset, expand_tests
+import test_flow
+from test_flow import SKIPPED, PASS_BIN
+
+# The LOW and HIGH halves split, as TotalDataset takes them
+TESTS = expand_tests(['contact test','power consumption test','output short current test',
+                      'output drive current test','voltage threshold test'])
+
+# Test one chip of a simulated lot with the flow given, on a router
+def run_chip(pins,voltages,flow=None,faults=None):
+    bench = SimBench(time_scale=0,seed=3,faults=faults)
+    rm = SessionPool(bench.resource_manager())
+    router = PinRouter(RelayBoard(port=bench.relay_port()))
+    chip_set = TotalDataset(TESTS,router,rm=rm,flow=flow)
+    chip = ICDataset(rm,1,pins,voltages,router,chip_set.expected)
+    chip.prompt = lambda msg,title: None
+    chip_set.run_tests(chip)
+    chip_set.close()
+    return chip
+
+def test_passing_chip_goes_in_the_pass_bin(pins,voltages):
+    chip = run_chip(pins,voltages)
+    assert chip.failed == set()
+    assert chip.bin == PASS_BIN
+    assert chip.errors == []
+
+def test_open_pin_skips_the_dependent_tests(pins,voltages):
+    chip = run_chip(pins,voltages,faults={'pin 2':'open'})
+    assert chip.refs['contact test'].outcomes['pin 2'] is False
+    assert chip.failed == {'contact test'}
+    assert (chip.bin['hbin'],chip.bin['sbin']) == (5,50)
+    # Everything depends on the contact test by default
+    for test in TESTS:
+        if test == 'contact test':
+            continue
+        ref = chip.refs[test]
+        assert set(ref.outcomes.values()) == {SKIPPED}
+        assert set(ref.meas.values()) == {None}
+
+def test_stop_on_fail_stops_the_chip(pins,voltages):
+    flow = test_flow.TestFlow(depends={t:() for t in TESTS},stop_on_fail={'contact test':True})
+    chip = run_chip(pins,voltages,flow,faults={'pin 2':'open'})
+    assert chip.stopped == 'contact test'
+    # With no dependencies only the stop skips anything
+    skipped = [t for t in TESTS if SKIPPED in chip.refs[t].outcomes.values()]
+    assert skipped
+    assert (chip.bin['hbin'],chip.bin['sbin']) == (5,50)
+
+def test_bins_are_checked_in_order(pins,voltages):
+    bins = [{'hbin':7,'sbin':70,'name':'any fail','fails':None}]
+    chip = run_chip(pins,voltages,test_flow.TestFlow(bins=bins),faults={'pin 2':'open'})
+    assert chip.bin['name'] == 'any fail'
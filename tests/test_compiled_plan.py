@@ -0,0 +1,57 @@
+import pytest
+from resources import SMUSetup
+import test_plan
+import test_sequencer
+from user_interface import TotalDataset, ICDataset, expand_tests
+
+TESTS = expand_tests(['contact test','power consumption test','output drive current test','voltage threshold test'])
+
+def test_pins_of_each_role(pins,voltages):
+    plan = test_plan.TestPlan(TESTS,pins,voltages)
+    assert plan.roles['VCC'] == (13,)
+    assert plan.roles['GND'] == (6,)
+    assert plan.roles['OUT'] == (2,5,7,10)
+    assert plan.valid['contact test'] == tuple(f'pin {i}' for i in range(1,15) if i not in (7,14))
+    assert plan.pin_list('OUT') == 'pins 3, 6, 8 and 11'
+    assert plan.vcc == 5.0
+
+# Compiled once, nothing in it can be changed by a chip
+def test_plan_is_read_only(pins,voltages):
+    plan = test_plan.TestPlan(TESTS,pins,voltages,options={'contact test':{'samples':4}})
+    with pytest.raises(TypeError):
+        plan.roles['IN'] = ()
+    with pytest.raises(TypeError):
+        plan.options['contact test']['samples'] = 1
+    assert isinstance(plan.steps,tuple)
+
+def test_steps_know_their_test_object_and_message(pins,voltages):
+    plan = test_plan.TestPlan(TESTS,pins,voltages)
+    step = next(s for s in plan.steps if s.test == 'output drive current test high')
+    assert (step.name,step.mode) == ('output drive current test','HIGH')
+    step = next(s for s in plan.steps if s.test == 'contact test')
+    assert (step.name,step.mode) == ('contact test','')
+    assert step.msg == 'Please set pins 1, 2, 4, 5, 9, 10, 12 and 13 to GND.'
+    step = next(s for s in plan.steps if s.test == 'voltage threshold test low')
+    assert step.pin in step.msg
+    # The sweep sets its inputs through the relay board
+    swept = test_plan.TestPlan(TESTS,pins,voltages,routed=True,drive_sweep=True)
+    assert all(s.msg is None for s in swept.steps if s.test == 'output drive current test')
+
+# Test classes by name, no eval
+def test_classes_by_name():
+    assert test_sequencer.test_class('contact test').__name__ == 'ContactTest'
+    assert test_sequencer.test_class('voltage threshold test high').__name__ == 'VoltageThresholdTestHigh'
+    with pytest.raises(ValueError,match='Unknown test'):
+        test_sequencer.test_class('ContactTest')
+
+def test_setup_commands_are_rendered_once():
+    assert SMUSetup.commands('volt','2.4','curr') is SMUSetup.commands('volt',2.4,'curr')
+
+# Every chip with the same pins and voltages uses the same plan
+def test_chips_share_one_plan(rm,pins,voltages):
+    chip_set = TotalDataset(list(TESTS),rm=rm)
+    plans = [chip_set.compile(ICDataset(rm,n,pins,voltages,None,chip_set.expected)) for n in (1,2)]
+    assert plans[0] is plans[1]
+    other = chip_set.compile(ICDataset(rm,3,pins,[3.3]+voltages[1:],None,chip_set.expected))
+    assert other is not plans[0]
+    assert other.vcc == 3.3
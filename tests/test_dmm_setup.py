@@ -0,0 +1,36 @@
+import pytest
+from resources import SMUSetup, DMMSetup
+from voltage_threshold_test import VoltageThresholdTest
+
+# A lost session is opened again and the DMM set up before the read
+def test_read_reconnects_after_the_session_is_lost(rm):
+    smu = SMUSetup('volt',5,'volt',rm=rm)
+    smu.output(True)
+    smu.flush()
+    dmm = DMMSetup('volt',rm=rm)
+    before = dmm.read()
+    old = dmm.dmm
+    old.closed = True
+    assert dmm.read() == pytest.approx(before,rel=0.05)
+    assert dmm.dmm is not old
+    assert not dmm.dmm.closed
+
+# Every DMMSetup on the pool gets the new session, not just the one that
+# reconnected
+def test_setups_sharing_the_session_follow_the_reconnect(rm):
+    first = DMMSetup('volt',rm=rm)
+    second = DMMSetup('volt',rm=rm)
+    first.dmm.closed = True
+    first.read()
+    assert second.dmm is first.dmm
+    second.read()
+    assert len([inst for inst in rm.rm.sessions if type(inst).__name__ == 'SimFluke8840A']) == 2
+
+# A dropped DMM doesn't stop the threshold search
+def test_threshold_search_survives_a_lost_dmm(bench,rm,pins):
+    vt = VoltageThresholdTest(rm,5.0,2.0,0.8,4.5,0.0,pins,dwell=0)
+    vt.execute_test('pin 1','LOW')
+    vt.dmm_setup.dmm.closed = True
+    vt.execute_test('pin 1','HIGH')
+    assert abs(vt.hi.meas['pin 1']-bench.dut().vt['pin 1']) < 0.2
+    assert vt.smu_setup.check_errors() == []
@@ -0,0 +1,90 @@
+import pytest
+from resources import SimBench, SessionPool, RelayBoard, PinRouter, SMUSetup
+from user_interface import TotalDataset, ICDataset, expand_tests
+
+# Test one chip on a router, with the drive current read by a source list
+# or a level at a time
+def run_chip(pins,voltages,tests,drive_sweep,options=None):
+    bench = SimBench(time_scale=0,seed=3)
+    rm = SessionPool(bench.resource_manager())
+    router = PinRouter(RelayBoard(port=bench.relay_port()))
+    chip_set = TotalDataset(expand_tests(tests),router,rm=rm,drive_sweep=drive_sweep,options=options)
+    chip = ICDataset(rm,1,pins,voltages,router,chip_set.expected)
+    chip.prompt = lambda msg,title: None
+    chip_set.run_tests(chip)
+    chip_set.close()
+    return chip
+
+def test_sweep_reads_what_a_level_at_a_time_reads(pins,voltages):
+    tests = ['output drive current test']
+    swept = run_chip(pins,voltages,tests,True)
+    stepped = run_chip(pins,voltages,tests,False)
+    assert swept.failed == stepped.failed == set()
+    for name in expand_tests(tests):
+        for pin,val in stepped.refs[name].meas.items():
+            assert swept.refs[name].meas[pin] == pytest.approx(val,rel=0.05)
+
+# Each level of the list is read samples times, the statistics are those
+# of its own readings
+def test_sweep_takes_the_samples_of_each_level(pins,voltages):
+    tests = ['output drive current test']
+    options = {'output drive current test':{'samples':4}}
+    swept = run_chip(pins,voltages,tests,True,options)
+    stepped = run_chip(pins,voltages,tests,False,options)
+    assert swept.failed == set()
+    for name in expand_tests(tests):
+        for pin,stats in swept.refs[name].stats.items():
+            assert set(stats) == set(SMUSetup.STATS)
+            assert stats['min'] <= stats['mean'] <= stats['max']
+            assert stats['mean'] == pytest.approx(stepped.refs[name].stats[pin]['mean'],rel=0.05)
+
+def test_list_points_per_trigger(rm):
+    smu = SMUSetup('volt',0.4,'curr',rm=rm)
+    smu.load_list([0.4,4.6],delay=0.02,count=3)
+    smu.output(True)
+    smu.start_list(6)
+    smu.trigger()
+    smu.wait_points(3)
+    smu.trigger()
+    smu.wait_points(6)
+    buf = smu.fetch('trac:data?')
+    # The sim DUT sinks current at 0.4 V and sources it at 4.6 V
+    assert len(buf) == 6
+    assert len({v > 0 for v in buf[:3]}) == len({v > 0 for v in buf[3:]}) == 1
+    assert (buf[0] > 0) != (buf[3] > 0)
+    with pytest.raises(ValueError):
+        smu.load_list([0.4,4.6],count=51)
+
+# The list is left loaded after the sweep, the threshold levels that
+# follow must not be ignored
+def test_threshold_after_a_sweep_sources_its_levels(pins,voltages):
+    chip = run_chip(pins,voltages,['output drive current test','voltage threshold test'],True)
+    assert chip.failed == set()
+    assert chip.errors == []
+    low = chip.refs['voltage threshold test low'].meas
+    high = chip.refs['voltage threshold test high'].meas
+    assert all(0.8 < v < 2.0 for v in low.values())
+    assert all(0.8 < v < 2.0 for v in high.values())
+
+def test_setup_goes_back_to_a_fixed_source(bench,rm):
+    smu = SMUSetup('volt',0.4,'curr',rm=rm)
+    smu.load_list([0.4,4.6],delay=0.02)
+    smu.flush()
+    smu.setup('volt',2,'curr')
+    smu.flush()
+    sim = bench.smus[None][-1]
+    assert smu.state['vmode'] == 'fix'
+    assert smu.state['arm'] == 'imm'
+    assert sim.levels['volt'] == 2
+
+def test_wait_points_follows_the_triggers(rm):
+    smu = SMUSetup('volt',0.4,'curr',rm=rm)
+    smu.load_list([0.4,4.6],delay=0.02)
+    smu.output(True)
+    smu.start_list(2)
+    for i in range(2):
+        smu.trigger()
+        smu.wait_points(i+1)
+    assert len(smu.fetch('trac:data?')) == 2
+    with pytest.raises(IOError):
+        smu.wait_points(3,timeout=0.01)
@@ -0,0 +1,35 @@
+import pytest
+from functional_test import FunctionalTest
+
+def run(rm,board,pins,logic):
+    ft = FunctionalTest(rm,board,pins,logic)
+    for pin in FunctionalTest.get_valid_pins(pins):
+        ft.execute_test(pin)
+    return ft
+
+def test_truth_table_of_the_or_gates(pins):
+    vectors,expected,outputs = FunctionalTest.truth_table(pins,'or')
+    # Two inputs per gate, every gate driven with the same four rows
+    assert len(vectors) == 4
+    assert outputs == ['pin 3','pin 6','pin 11','pin 8']
+    assert expected.tolist() == [[False]*4,[True]*4,[True]*4,[True]*4]
+    assert vectors[0] == 0
+
+def test_or_gates_pass_every_vector(rm,board,pins):
+    ft = run(rm,board,pins,'or')
+    assert set(ft.meas.values()) == {0}
+    assert all(ft.outcomes.values())
+    assert all(f == [] for f in ft.failures.values())
+
+# An OR gate checked as AND is wrong for the two rows with one input high
+def test_and_table_finds_the_wrong_vectors(rm,board,pins):
+    ft = run(rm,board,pins,'and')
+    assert set(ft.meas.values()) == {2}
+    assert not any(ft.outcomes.values())
+    vectors,_,_ = FunctionalTest.truth_table(pins,'and')
+    for pin,wrong in ft.failures.items():
+        assert wrong == vectors[1:3].tolist()
+
+def test_unknown_logic_function(rm,board,pins):
+    with pytest.raises(ValueError):
+        FunctionalTest(rm,board,pins,'maj')
@@ -0,0 +1,68 @@
+import math
+import os
+import random
+import pytest
+from histograms import Histogram, HistogramSet, HistogramRenderer
+
+class Ref:
+    def __init__(self,meas,limits=(0.75,1.5)):
+        self.meas = meas
+        self.limits = limits
+
+class Chip:
+    def __init__(self,refs):
+        self.refs = refs
+
+def test_bins_come_from_the_limits():
+    h = Histogram(0.75,1.5,bins=30)
+    assert h.width == pytest.approx(0.025)
+    h.add(1.0)
+    assert h.counts == {math.floor(1.0/h.width):1}
+    # One-sided, scaled to the first value
+    h = Histogram(None,0.07,bins=40)
+    h.add(0.02)
+    assert h.width == pytest.approx(0.02/40)
+
+# Merged counts are exactly what binning at the wider width gives
+def test_merging_keeps_every_count():
+    rng = random.Random(1)
+    xs = [rng.gauss(1,0.3) for _ in range(2000)]
+    h = Histogram(0.9,1.1,bins=40,max_bins=50)
+    for x in xs:
+        h.add(x)
+    assert h.width > (1.1-0.9)/40
+    assert max(h.counts)-min(h.counts) < 50
+    assert sum(h.counts.values()) == h.n == len(xs)
+    direct = {}
+    for x in xs:
+        i = math.floor(x/((1.1-0.9)/40))//round(h.width/((1.1-0.9)/40))
+        direct[i] = direct.get(i,0)+1
+    assert h.counts == direct
+    edges,counts = h.series()
+    assert len(edges) == len(counts) == max(h.counts)-min(h.counts)+1
+
+def test_only_changed_tests_are_bumped():
+    hists = HistogramSet(['contact test','power consumption test'])
+    hists.update(Chip({'contact test':Ref({'pin 1':1.0,'pin 2':None})}))
+    assert hists.versions == {'contact test':1,'power consumption test':0}
+    assert list(hists.hists['contact test']) == ['pin 1']
+    version,pins = hists.snapshot('contact test')
+    assert version == 1 and pins['pin 1'][2:] == (0.75,1.5)
+
+def test_unchanged_tabs_are_not_drawn_again(tmp_path):
+    pytest.importorskip('matplotlib')
+    hists = HistogramSet(['contact test','power consumption test'])
+    renderer = HistogramRenderer(hists,interval=60)
+    try:
+        hists.update(Chip({'contact test':Ref({'pin 1':1.0})}))
+        fname = renderer.render('contact test')
+        drawn = os.stat(fname).st_mtime_ns
+        assert renderer.render('contact test') == fname
+        assert os.stat(fname).st_mtime_ns == drawn
+        assert renderer.ready() == {'contact test':fname}
+        # Nothing measured, nothing drawn
+        assert renderer.render('power consumption test') is None
+        renderer.save(str(tmp_path/'hists'))
+        assert os.listdir(tmp_path/'hists') == ['contact_test.png']
+    finally:
+        renderer.close()
@@ -0,0 +1,35 @@
+import pytest
+import resources
+from resources import LazyModule, SessionPool, available
+from import_benchmark import MODULES, time_import
+
+# What a cold import of each module may load straight away: the result
+# store works on NumPy arrays and the batch runner imports it
+NEEDS = {'result_store':['numpy'],'batch_runner':['numpy']}
+
+@pytest.mark.parametrize('module',MODULES)
+def test_importing_loads_nothing_heavy(module):
+    t,loaded = time_import(module)
+    assert t is not None, loaded
+    assert loaded == NEEDS.get(module,[])
+
+def test_package_exports_on_first_use():
+    assert 'SMUSetup' in resources.__all__
+    assert resources.SMUSetup is resources.smu_setup.SMUSetup
+    assert 'SMUSetup' in vars(resources)
+    with pytest.raises(AttributeError):
+        resources.gui_helper
+
+def test_lazy_module_loads_when_used():
+    mod = LazyModule('colorsys')
+    assert 'not loaded' in repr(mod)
+    assert mod.rgb_to_hsv(1,0,0) == (0,1,1)
+    assert '(loaded)' in repr(mod)
+    assert available('colorsys')
+    assert not available('no_such_module_here')
+
+# No VISA backend until something is opened
+def test_pool_builds_the_resource_manager_on_first_use():
+    pool = SessionPool()
+    assert pool.rm is None
+    pool.close()
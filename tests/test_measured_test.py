@@ -0,0 +1,53 @@
+import pytest
+from resources import SMUSetup, MeasuredTest
+from contact_test import ContactTest
+from power_consumption_test import PowerConsumptionTest
+from output_short_current_test import OutputShortCurrentTest
+from output_drive_current_test import OutputDriveCurrentTest
+from batch_runner import check_plan
+
+def plan(**options):
+    return {'pins':['IN','IN','OUT','GND','VCC'],'voltages':[5.0,2.0,0.8,4.5,0.0],
+            'tests':['contact test'],'output':'lot.txt','options':options}
+
+def make(cls,rm,pins,**opts):
+    if cls is ContactTest or cls is OutputShortCurrentTest:
+        return cls(rm,pins,**opts)
+    return cls(rm,5,pins,**opts)
+
+# Every SMU test keeps its readings the same way
+@pytest.mark.parametrize('cls',[ContactTest,PowerConsumptionTest,OutputShortCurrentTest,OutputDriveCurrentTest])
+def test_smu_tests_share_the_results(cls,rm,pins):
+    expected = {}
+    test = make(cls,rm,pins,expected=expected,samples=4)
+    assert isinstance(test,MeasuredTest)
+    pin = cls.get_valid_pins(pins)[0]
+    if cls is OutputDriveCurrentTest:
+        half = test.execute_test(pin,'LOW')
+        assert expected[(pin,'LOW')] == test.meas[pin] == half.meas[pin]
+    else:
+        test.execute_test(pin)
+        assert expected[pin] == test.meas[pin]
+    assert set(test.stats[pin]) == set(SMUSetup.STATS)
+    assert test.stats[pin]['mean'] == test.meas[pin]
+    assert test.outcomes[pin] is not None
+
+# One sample per pin has no spread to keep
+def test_one_sample_keeps_no_stats(rm,pins):
+    test = ContactTest(rm,pins)
+    test.execute_test('pin 1')
+    assert test.stats['pin 1'] is None
+    assert test.outcomes['pin 1']
+
+def test_options_are_checked_against_the_test_class():
+    check_plan(plan(**{'contact test':{'profile':'fast','samples':4},
+                       'voltage threshold test':{'strategy':'linear','dwell':0},
+                       'functional test':{'logic':'and'}}))
+    for t in ('voltage threshold test','functional test'):
+        with pytest.raises(ValueError,match='no options'):
+            check_plan(plan(**{t:{'samples':4}}))
+    with pytest.raises(ValueError,match='no options'):
+        check_plan(plan(**{'contact test':{'resolution':0.05}}))
+    # Filled in from the chip, not the plan
+    with pytest.raises(ValueError,match='no options'):
+        check_plan(plan(**{'output drive current test':{'expected':{}}}))
@@ -0,0 +1,56 @@
+import time
+from resources import SimBench, SessionPool
+from user_interface import TotalDataset, expand_tests
+
+PLAN_TESTS = ['contact test','power consumption test','voltage threshold test']
+
+# A station with one socket per name, every site on its own simulated SMU,
+# DMM, relay board and DUT
+def station(names,time_scale=0,tests=PLAN_TESTS):
+    bench = SimBench(time_scale=time_scale,seed=4,spread=0.05)
+    rm = SessionPool(bench.resource_manager())
+    sites = {n:{'smu':f'SMU2400_{n}','dmm':f'Fluke_8840A_MM_{n}','relay':bench.relay_port(n)} for n in names}
+    chip_set = TotalDataset(expand_tests(list(tests)),sites=sites,rm=rm,
+                            options={'voltage threshold test':{'dwell':0}})
+    return bench,chip_set
+
+def test_each_site_tests_its_own_chip(pins,voltages):
+    bench,chip_set = station('AB')
+    chips = chip_set.run_sites(pins,voltages,1)
+    assert [c.num for c in chips] == [1,2]
+    assert [c.site for c in chips] == ['A','B']
+    # Merged lot in chip order, and each site's own list
+    assert chip_set.chips == chips
+    assert chip_set.site_chips == {'A':[chips[0]],'B':[chips[1]]}
+    for chip in chips:
+        assert chip.failed == set()
+        # The threshold is that of the site's own DUT
+        vt = bench.dut(chip.site).vt
+        for pin,val in chip.refs['voltage threshold test low'].meas.items():
+            assert abs(val-vt[pin]) < 0.2
+        # Only the site's instruments were used
+        assert len(bench.smus[chip.site]) == 1
+    assert None not in bench.smus
+    assert chip_set.site_expected['A'] is not chip_set.site_expected['B']
+    assert chip_set.site_expected['A']['contact test'] != chip_set.site_expected['B']['contact test']
+    chip_set.close()
+
+def test_next_round_numbers_on(pins,voltages):
+    _,chip_set = station('ABC')
+    chip_set.run_sites(pins,voltages,1)
+    chips = chip_set.run_sites(pins,voltages,4)
+    assert [c.num for c in chips] == [4,5,6]
+    assert [c.num for c in chip_set.chips] == list(range(1,7))
+    chip_set.close()
+
+# The sites wait on their instruments at the same time, two sockets take
+# about as long as one
+def test_sites_run_at_the_same_time(pins,voltages):
+    took = {}
+    for names in ('A','AB'):
+        _,chip_set = station(names,time_scale=1,tests=['contact test'])
+        start = time.monotonic()
+        chip_set.run_sites(pins,voltages,1)
+        took[names] = time.monotonic()-start
+        chip_set.close()
+    assert took['AB'] < 1.5*took['A']
@@ -0,0 +1,66 @@
+import asyncio
+import pytest
+from resources import SimBench, SessionPool, SMUSetup, DMMSetup, AsyncSMU, AsyncDMM, execute_async
+from voltage_threshold_test import VoltageThresholdTest
+
+# The SMU reading started before the DMM is read costs no time of its own
+def test_the_dmm_is_read_while_the_smu_reads(bench,rm):
+    smu = SMUSetup('volt',1,'volt',rm=rm)
+    dmm = DMMSetup('volt',rm=rm)
+    smu.output(True)
+    smu.start_trace(10)
+    smu.flush()
+    start = bench.clock
+    smu.measure()
+    dmm.dmm.query('?')
+    one_after_the_other = bench.clock-start
+    smu.start_trace(10)
+    smu.flush()
+    start = bench.clock
+    smu.start_reading()
+    dmm.dmm.query('?')
+    sensed = smu.fetch('trac:data?')
+    assert bench.clock-start < 0.7*one_after_the_other
+    assert sensed[0] == pytest.approx(1,rel=0.05)
+
+# The threshold is the input voltage the SMU read, near the model's
+def test_threshold_is_the_input_the_smu_read(bench,rm,pins):
+    vt = VoltageThresholdTest(rm,5.0,2.0,0.8,4.5,0.0,pins,dwell=0)
+    vt.execute_test('pin 1','LOW')
+    vt.execute_test('pin 1','HIGH')
+    vt_pin = bench.dut().vt['pin 1']
+    assert abs(vt.lo.meas['pin 1']-vt_pin) < 0.2
+    assert abs(vt.hi.meas['pin 1']-vt_pin) < 0.2
+    # Measured, not one of the levels the search stepped through
+    assert vt.lo.meas['pin 1'] not in vt.probed
+    assert vt.smu_setup.check_errors() == []
+
+def test_async_front_end_sets_and_reads(bench,rm):
+    async def run():
+        smu = AsyncSMU(SMUSetup('volt',0,'volt',rm=rm))
+        dmm = AsyncDMM(DMMSetup('volt',rm=rm))
+        await smu.output(True)
+        await smu.set_level(0)
+        low = await dmm.read()
+        await smu.set_level(5)
+        high = await dmm.read()
+        await smu.reset()
+        return low,high
+    low,high = asyncio.run(run())
+    assert low < 0.5
+    assert high > 4.5
+
+# Each site on its own pool, both searched from one event loop
+def test_sites_run_together_on_one_loop(pins):
+    bench = SimBench(time_scale=0,seed=2)
+    pools = {site:SessionPool(bench.resource_manager(),aliases={'SMU2400':f'SMU2400_{site}','Fluke_8840A_MM':f'Fluke_8840A_MM_{site}'})
+             for site in 'AB'}
+    tests = {site:VoltageThresholdTest(pool,5.0,2.0,0.8,4.5,0.0,pins,dwell=0) for site,pool in pools.items()}
+    async def run():
+        return await asyncio.gather(*(execute_async(vt,'pin 1','LOW') for vt in tests.values()))
+    halves = asyncio.run(run())
+    for site,half in zip('AB',halves):
+        assert half is tests[site].lo
+        assert abs(half.meas['pin 1']-bench.dut(site).vt['pin 1']) < 0.2
+    for pool in pools.values():
+        pool.close()
@@ -0,0 +1,53 @@
+import pytest
+from resources import SessionPool, PinRouter, SMUSetup
+from user_interface import TotalDataset, ICDataset
+
+# What the simulated SMU had been sent each time the router settled
+def settled_states(bench,rm,board,pins,voltages):
+    router = PinRouter(board)
+    states = []
+    settle = router.settle
+    def record():
+        sim = bench.smus[None][-1]
+        states.append((sim.src,sim.levels[sim.src],sim.on))
+        settle()
+    router.settle = record
+    chip_set = TotalDataset(['contact test'],router,rm=rm)
+    chip = ICDataset(rm,1,pins,voltages,router,chip_set.expected)
+    chip.prompt = lambda msg,title: None
+    chip_set.run_tests(chip)
+    return chip,states
+
+# The contact setup is on the SMU before the relays have settled, the
+# output only goes on once they have
+@pytest.mark.parametrize('batch',[True,False])
+def test_smu_is_set_up_while_the_relays_settle(bench,board,pins,voltages,batch):
+    rm = SessionPool(bench.resource_manager(),batch=batch)
+    chip,states = settled_states(bench,rm,board,pins,voltages)
+    assert chip.failed == set()
+    assert len(states) == len(chip.refs['contact test'].meas)
+    for src,lev,on in states:
+        assert (src,lev,on) == ('curr',250e-6,False)
+    assert rm.held is None
+
+# Without a hold a measurement is still one message
+def test_no_hold_no_extra_writes(bench,rm):
+    smu = SMUSetup('volt',1,'curr',rm=rm)
+    smu.output(True)
+    smu.measure()
+    writes = []
+    inst = smu.smu.inst
+    write = inst.write
+    inst.write = lambda cmd: writes.append(cmd) or write(cmd)
+    smu.set_level(2)
+    smu.measure()
+    assert writes == [':sour:volt:lev 2;:read?']
+    # With one the setup is written ahead of the reading
+    writes.clear()
+    waited = []
+    rm.hold(lambda: waited.append(list(writes)))
+    smu.set_level(3)
+    smu.measure()
+    assert waited == [[':sour:volt:lev 3']]
+    assert writes == [':sour:volt:lev 3',':read?']
+    assert rm.held is None
@@ -0,0 +1,48 @@
+from resources import SimBench, SessionPool, RelayBoard, PinRouter, Profiler
+from user_interface import TotalDataset, ICDataset, expand_tests
+
+TESTS = expand_tests(['contact test','voltage threshold test'])
+
+# Test chips 1 and 2 with every command recorded
+def profiled_lot(pins,voltages):
+    prof = Profiler()
+    bench = SimBench(time_scale=0,seed=3)
+    rm = SessionPool(bench.resource_manager(),profiler=prof)
+    router = PinRouter(RelayBoard(port=bench.relay_port(),profiler=prof))
+    # No dwell, the simulated DUT settles at once
+    chip_set = TotalDataset(TESTS,router,rm=rm,options={'voltage threshold test':{'dwell':0}})
+    for num in (1,2):
+        chip = ICDataset(rm,num,pins,voltages,router,chip_set.expected)
+        chip.prompt = lambda msg,title: None
+        chip_set.run_tests(chip)
+    return prof
+
+def test_every_command_of_a_chip_has_its_number(pins,voltages):
+    prof = profiled_lot(pins,voltages)
+    chips = [rec[Profiler.FIELDS.index('chip')] for rec in prof.records]
+    # The instruments are opened before the first chip starts
+    first = chips.index(1)
+    assert set(chips[first:]) == {1,2}
+    assert chips[first:] == sorted(chips[first:])
+    # Cleared once the chip is done
+    assert prof.context()['chip'] is None
+
+def test_summary_by_chip_and_test(pins,voltages):
+    prof = profiled_lot(pins,voltages)
+    summary = prof.summary(by=('chip','test'))
+    for num in (1,2):
+        for test in TESTS:
+            assert summary[(num,test)]['count'] > 0
+    # The error queue, the reset and the relays at the end of each chip
+    assert summary[(1,None)]['count'] > 0
+
+def test_scope_puts_the_context_back():
+    prof = Profiler(size=3)
+    prof.set_context(chip=4)
+    with prof.scope(test='contact test',pin='pin 1'):
+        for i in range(5):
+            prof.record(prof.origin,'SMU2400','write',f'cmd {i}',6,0)
+    assert prof.context() == {'chip':4,'test':None,'pin':None}
+    # The ring buffer keeps the latest
+    assert [rec[4] for rec in prof.records] == ['cmd 2','cmd 3','cmd 4']
+    assert all(rec[7:] == (4,'contact test','pin 1') for rec in prof.records)
@@ -0,0 +1,92 @@
+import pytest
+import serial.tools.list_ports
+from serial.tools.list_ports_common import ListPortInfo
+from resources import RelayBoard
+
+def port(device,vid=None,description='n/a'):
+    info = ListPortInfo(device,skip_link_detection=True)
+    info.vid = vid
+    info.description = description
+    return info
+
+def test_no_board_found_is_an_error(monkeypatch):
+    monkeypatch.setattr(serial.tools.list_ports,'comports',lambda: [port('/dev/ttyS0')])
+    assert RelayBoard.find_port() is None
+    with pytest.raises(IOError,match='relay board'):
+        RelayBoard()
+
+def test_board_is_looked_up_among_the_ports(monkeypatch):
+    # loop:// stands in for the Arduino's port
+    ports = [port('/dev/ttyS0'),port('loop://',vid=0x2341)]
+    monkeypatch.setattr(serial.tools.list_ports,'comports',lambda: ports)
+    assert RelayBoard.find_port() == 'loop://'
+    board = RelayBoard()
+    assert board.device.port == 'loop://'
+    assert board.state == 0
+
+# Frames written to the port
+class Spy:
+    def __init__(self,device):
+        self.device = device
+        self.frames = []
+
+    def __getattr__(self,name):
+        return getattr(self.device,name)
+
+    def write(self,data):
+        self.frames.append(data.decode('utf-8').strip())
+        return self.device.write(data)
+
+class Silent:
+    baudrate = 9600
+    def reset_input_buffer(self):
+        pass
+    def write(self,data):
+        return len(data)
+    def readline(self):
+        return b''
+
+def test_relays_are_a_bitmask_with_pin_1_on_top(board):
+    assert board.mask([1]) == 0x8000
+    assert board.mask([1,16]) == 0x8001
+    with pytest.raises(ValueError):
+        board.mask([0])
+
+def test_relay_changes_are_one_frame_and_only_when_needed(bench):
+    spy = Spy(bench.relay_port())
+    board = RelayBoard(port=spy)
+    spy.frames.clear()
+    board.multirelay([1,3])
+    board.multirelay([1,3])
+    board.update(on=[5],off=[1])
+    assert spy.frames == [f'*{0x8000|0x2000}',f'*{0x2000|0x0800}']
+    assert board.state == 0x2800
+
+def test_answers_are_checked(bench):
+    with pytest.raises(IOError,match='No answer'):
+        RelayBoard(port=Silent())
+    board = RelayBoard(port=bench.relay_port())
+    with pytest.raises(IOError,match='error'):
+        board.command('x')
+
+def test_faster_link_after_negotiating(bench):
+    times = {}
+    for baud in (9600,115200):
+        board = RelayBoard(port=bench.relay_port(),fast_baud=baud)
+        assert board.device.baudrate == baud
+        start = bench.clock
+        board.read_inputs()
+        times[baud] = bench.clock-start
+    assert times[115200] < times[9600]
+
+# A truth table goes out in as few frames as fit the receive buffer
+def test_vectors_are_batched_into_frames(bench):
+    spy = Spy(bench.relay_port())
+    board = RelayBoard(port=spy)
+    spy.frames.clear()
+    masks = list(range(0,1 << 16,1 << 10))
+    states = board.run_vectors(masks)
+    assert len(states) == len(masks)
+    assert len(spy.frames) > 1
+    assert all(len(f)+1 <= RelayBoard.FRAME_SIZE for f in spy.frames)
+    assert len(spy.frames) < len(masks)
@@ -0,0 +1,87 @@
+import random
+import warnings
+import numpy as np
+from result_store import ResultStore
+from test_flow import SKIPPED
+
+TESTS = ['contact test','output drive current test low','output drive current test high']
+PINS = ['pin 1','pin 2','pin 3']
+
+class Ref:
+    def __init__(self,rng):
+        self.meas = {p:rng.gauss(1,0.1) for p in PINS}
+        self.outcomes = {p:rng.random() < 0.9 for p in PINS}
+        # Pin 3 is skipped now and then and never measured by some tests
+        if rng.random() < 0.2:
+            self.outcomes['pin 3'] = SKIPPED
+        self.limits = (0.8,1.2)
+
+class Chip:
+    def __init__(self,num,rng):
+        self.num = num
+        self.site = None
+        self.refs = {t:Ref(rng) for t in TESTS}
+        del self.refs['contact test'].meas['pin 2']
+
+def fill(store,n,seed=1):
+    rng = random.Random(seed)
+    for i in range(n):
+        store.add_chip(Chip(i,rng),TESTS)
+
+# What aggregate() used to work out from every chip in the store
+def full_scan(store):
+    m = store.meas[:store.count]
+    t = store.tested[:store.count]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore',RuntimeWarning)
+        return {'count':t.sum(axis=0),
+                'skipped':store.skipped[:store.count].sum(axis=0),
+                'mean':np.nanmean(m,axis=0),
+                'stdev':np.nanstd(m,axis=0,ddof=1),
+                'min':np.nanmin(m,axis=0),
+                'max':np.nanmax(m,axis=0),
+                'yield':(store.passed[:store.count] & t).sum(axis=0)/np.maximum(t.sum(axis=0),1)}
+
+def assert_same(a,b):
+    assert a.keys() == b.keys()
+    for k in a:
+        np.testing.assert_allclose(a[k],b[k],rtol=1e-9,equal_nan=True,err_msg=k)
+
+# The running totals give what a scan of every chip gives, across a grow
+def test_aggregate_matches_a_full_scan(tmp_path):
+    store = ResultStore(str(tmp_path/'lot'),TESTS,3,chunk=16)
+    fill(store,50)
+    assert store.capacity == 64
+    assert_same(store.aggregate(),full_scan(store))
+
+# Points nothing was measured on come out NaN, one chip has no stdev
+def test_aggregate_of_one_chip(tmp_path):
+    store = ResultStore(str(tmp_path/'lot'),TESTS,3)
+    fill(store,1)
+    agg = store.aggregate()
+    i,j,k = store.index('contact test','pin 2')
+    assert agg['count'][i,j,k] == 0
+    assert np.isnan(agg['mean'][i,j,k])
+    assert np.isnan(agg['stdev']).all()
+    assert_same(agg,full_scan(store))
+
+# The files are only written every flush_every chips and at the end
+def test_flushes_in_batches(tmp_path,monkeypatch):
+    store = ResultStore(str(tmp_path/'lot'),TESTS,3,flush_every=10)
+    flushes = []
+    flush = store.flush
+    monkeypatch.setattr(store,'flush',lambda: flushes.append(store.count) or flush())
+    fill(store,25)
+    assert flushes == [10,20]
+    store.flush()
+    assert store.unflushed == 0
+
+# A store opened from disk starts from the same totals
+def test_reopened_store_aggregates_the_same(tmp_path):
+    path = str(tmp_path/'lot')
+    store = ResultStore(path,TESTS,3,chunk=16,flush_every=7)
+    fill(store,40)
+    store.flush()
+    again = ResultStore.open(path)
+    assert again.count == 40
+    assert_same(again.aggregate(),store.aggregate())
@@ -0,0 +1,70 @@
+import os
+import pytest
+import result_stream
+from result_stream import ResultStream
+from test_flow import SKIPPED
+
+class Ref:
+    def __init__(self,meas,outcomes):
+        self.meas = meas
+        self.outcomes = outcomes
+
+class Chip:
+    def __init__(self,num,site=None):
+        self.num = num
+        self.site = site
+        self.refs = {'contact test':Ref({'pin 1':0.65+num/100,'pin 2':None},{'pin 1':True,'pin 2':SKIPPED}),
+                     'power consumption test':Ref({'pin 14':0.01},{'pin 14':False})}
+
+TESTS = ['contact test','power consumption test']
+
+@pytest.mark.parametrize('fmt',['csv','jsonl'])
+def test_records_read_back_as_written(tmp_path,fmt):
+    fname = str(tmp_path/f'lot.{fmt}')
+    stream = ResultStream(fname)
+    assert stream.fmt == fmt
+    stream.write_chip(Chip(1,'A'),TESTS)
+    stream.close()
+    recs = list(ResultStream.read(fname))
+    assert recs == [{'chip':1,'site':'A','test':'contact test','pin':'pin 1','meas':0.66,'outcome':True},
+                    {'chip':1,'site':'A','test':'contact test','pin':'pin 2','meas':None,'outcome':SKIPPED},
+                    {'chip':1,'site':'A','test':'power consumption test','pin':'pin 14','meas':0.01,'outcome':False}]
+
+# Each chip is on disk once it is done, before the stream is closed
+def test_chips_are_written_as_they_finish(tmp_path):
+    fname = str(tmp_path/'lot.csv')
+    stream = ResultStream(fname)
+    for num in (1,2):
+        stream.write_chip(Chip(num),TESTS)
+        assert {r['chip'] for r in ResultStream.read(fname)} == set(range(1,num+1))
+    stream.close()
+
+def test_synced_every_few_chips(tmp_path,monkeypatch):
+    synced = []
+    monkeypatch.setattr(result_stream.os,'fsync',lambda fd: synced.append(stream.count))
+    stream = ResultStream(str(tmp_path/'lot.jsonl'),fsync_every=3)
+    for num in range(1,8):
+        stream.write_chip(Chip(num),TESTS)
+    stream.close()
+    assert synced == [3,6,7]
+
+# A lot cut short carries on in the same file, with one header
+def test_resume_appends(tmp_path):
+    fname = str(tmp_path/'lot.csv')
+    stream = ResultStream(fname)
+    stream.write_chip(Chip(1),TESTS)
+    stream.close()
+    stream = ResultStream(fname,resume=True)
+    stream.write_chip(Chip(2),TESTS)
+    stream.close()
+    assert [r['chip'] for r in ResultStream.read(fname)] == [1,1,1,2,2,2]
+    with open(fname) as f:
+        assert f.read().count('chip,site') == 1
+    # Without resume the file starts over
+    ResultStream(fname).close()
+    assert list(ResultStream.read(fname)) == []
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        ResultStream(str(tmp_path/'lot.txt'),'xml')
+    assert not os.path.exists(tmp_path/'lot.txt')
@@ -0,0 +1,53 @@
+import pytest
+from resources import SimBench, SessionPool, SMUSetup
+
+def smu_on(rm,lev=2):
+    smu = SMUSetup('volt',lev,'curr',rm=rm)
+    smu.output(True)
+    return smu
+
+# A lost session is opened again and the SMU brought back to its settings
+@pytest.mark.parametrize('batch',[True,False])
+def test_measure_reconnects_after_the_session_is_lost(bench,batch):
+    rm = SessionPool(bench.resource_manager(),batch=batch)
+    smu = smu_on(rm)
+    before = smu.measure()[0]
+    old = smu.smu.inst
+    old.closed = True
+    after = smu.measure()[0]
+    assert smu.smu.inst is not old
+    assert not smu.smu.inst.closed
+    assert after == pytest.approx(before,rel=0.05)
+    assert smu.state['volt:lev'] == '2'
+    assert smu.state['outp'] == 'on'
+    assert smu.check_errors() == []
+
+# Settings queued before the failure go out with the new session
+def test_queued_settings_survive_a_reconnect(bench,rm):
+    smu = smu_on(rm)
+    smu.measure()
+    smu.smu.inst.closed = True
+    smu.set_level(3)
+    smu.measure()
+    # The simulated SMU of the new session
+    sim = bench.smus[None][-1]
+    assert not sim.closed
+    assert sim.levels['volt'] == 3
+    assert sim.on
+    assert smu.state['volt:lev'] == '3'
+
+# With binary transfer on, the statistics still come back as text
+def test_binary_acquire_reads_the_statistics_as_text():
+    stats = {}
+    for binary in (False,True):
+        bench = SimBench(time_scale=0,seed=1)
+        rm = SessionPool(bench.resource_manager(),binary=binary)
+        smu = smu_on(rm)
+        smu.measure()
+        stats[binary] = smu.acquire(5)
+        # The buffer itself still comes back as a binary block
+        assert len(smu.acquire(3,raw=True)) == 3
+        assert smu.check_errors() == []
+        rm.close()
+    assert len(stats[True]) == len(SMUSetup.STATS)
+    assert stats[True] == pytest.approx(stats[False])
@@ -0,0 +1,49 @@
+from test_sequencer import Sequencer, valid_pins
+from user_interface import expand_tests
+
+ALL = ['output drive current test','voltage threshold test','output short current test',
+       'power consumption test','functional test','contact test']
+
+def sequence(pins,tests=ALL,**kwargs):
+    return Sequencer(expand_tests(list(tests)),pins,**kwargs)
+
+def fixtures(plan):
+    return [s.fixture for s in plan]
+
+def test_every_step_once_and_never_dearer(pins):
+    seq = sequence(pins,routed=True)
+    assert sorted((s.test,s.pin) for s in seq.plan) == sorted((s.test,s.pin) for s in seq.steps)
+    assert seq.cost <= seq.total(seq.steps)
+    assert seq.cost == seq.total(seq.plan)
+
+# Each fixture is set up once, the contact test before anything else
+def test_grouped_by_fixture_after_the_contact_test(pins):
+    seq = sequence(pins,routed=True)
+    runs = [f for i,f in enumerate(fixtures(seq.plan)) if i == 0 or f != seq.plan[i-1].fixture]
+    assert len(runs) == len(set(runs))
+    n = len(valid_pins('contact test',pins))
+    assert {s.test for s in seq.plan[:n]} == {'contact test'}
+
+# Short current and HIGH drive current share a fixture, each output is
+# done for both before the relays move on
+def test_steps_on_a_pin_back_to_back(pins):
+    seq = sequence(pins,['output short current test','output drive current test','contact test'],routed=True)
+    high = [s for s in seq.plan if s.fixture == 'outputs high']
+    assert [s.pin for s in high][::2] == [s.pin for s in high][1::2]
+
+def test_dependencies_come_first(pins):
+    depends = {'power consumption test':('voltage threshold test high',)}
+    seq = sequence(pins,routed=True,depends=depends)
+    order = [s.test for s in seq.plan]
+    last = max(i for i,t in enumerate(order) if t == 'voltage threshold test high')
+    assert order.index('power consumption test') > last
+
+def test_drive_sweep_and_functional_steps(pins):
+    swept = sequence(pins,routed=True,drive_sweep=True)
+    outs = valid_pins('output drive current test',pins)
+    assert [s.pin for s in swept.plan if s.test == 'output drive current test'] == outs
+    assert not any(s.test.startswith('output drive current test ') for s in swept.plan)
+    # No relay board, no vectors to drive
+    manual = sequence(pins)
+    assert not any(s.test == 'functional test' for s in manual.plan)
+    assert any(s.test == 'functional test' for s in swept.plan)
@@ -0,0 +1,40 @@
+import math
+import pytest
+from voltage_threshold_test import VoltageThresholdTest
+
+def threshold(rm,pins,strategy,resolution,**kwargs):
+    vt = VoltageThresholdTest(rm,5.0,2.0,0.8,4.5,0.0,pins,strategy=strategy,resolution=resolution,dwell=0,**kwargs)
+    vt.execute_test('pin 1','LOW')
+    vt.execute_test('pin 1','HIGH')
+    return vt
+
+# 10 mV in about log2(5/0.01) reads, one more as the first read is at the
+# pass limit rather than half way. Near the threshold of the model.
+def test_bisect_reaches_the_resolution_in_a_few_reads(bench,rm,pins):
+    vt = threshold(rm,pins,'bisect',0.01)
+    for n in vt.steps['pin 1'].values():
+        assert math.ceil(math.log2(5/0.01)) <= n <= math.ceil(math.log2(5/0.01))+1
+    vt_pin = bench.dut().vt['pin 1']
+    assert vt.lo.meas['pin 1'] == pytest.approx(vt_pin,abs=0.05)
+    assert vt.hi.meas['pin 1'] == pytest.approx(vt_pin,abs=0.05)
+
+# At most s/c+c/r reads for a span s, coarse step c and resolution r
+def test_coarse_fine_stays_within_its_bound(bench,rm,pins):
+    vt = threshold(rm,pins,'coarse-fine',0.01)
+    c = vt.coarse_step()
+    assert c == pytest.approx((5*0.01)**0.5)
+    for n in vt.steps['pin 1'].values():
+        assert n <= 5/c+c/0.01+1
+    assert vt.lo.meas['pin 1'] == pytest.approx(bench.dut().vt['pin 1'],abs=0.05)
+
+def test_strategies_agree(rm,pins):
+    found = {s:threshold(rm,pins,s,0.1) for s in ('linear','bisect','coarse-fine')}
+    for half in ('lo','hi'):
+        vals = [getattr(vt,half).meas['pin 1'] for vt in found.values()]
+        assert max(vals)-min(vals) <= 0.2
+    # Linear takes a read per 0.1 V step, the others fewer
+    assert found['bisect'].steps['pin 1']['LOW'] < found['linear'].steps['pin 1']['LOW']
+
+def test_unknown_strategy(rm,pins):
+    with pytest.raises(ValueError,match='strategy'):
+        VoltageThresholdTest(rm,5.0,2.0,0.8,4.5,0.0,pins,strategy='golden')
@@ -0,0 +1,64 @@
+import os
+import pytest
+from resources import SessionPool
+from user_interface import TotalDataset, ICDataset, expand_tests
+from voltage_threshold_test import VoltageThresholdTest
+
+YAML = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),'src','resources','or_gate_sim.yaml')
+
+def threshold(rm,pins,strategy,resolution=0.1):
+    vt = VoltageThresholdTest(rm,5.0,2.0,0.8,4.5,0.0,pins,strategy=strategy,resolution=resolution,dwell=0)
+    vt.execute_test('pin 1','LOW')
+    vt.execute_test('pin 1','HIGH')
+    return vt
+
+def test_sweep_finds_the_linear_threshold(rm,pins):
+    linear = threshold(rm,pins,'linear')
+    sweep = threshold(rm,pins,'sweep')
+    assert sweep.steps['pin 1'] == linear.steps['pin 1']
+    for half in ('lo','hi'):
+        assert getattr(sweep,half).meas['pin 1'] == pytest.approx(getattr(linear,half).meas['pin 1'],abs=0.02)
+    assert sweep.smu_setup.check_errors() == []
+
+# The source list holds 100 points, a finer staircase is widened to fit
+def test_staircase_fits_the_source_list(rm,pins):
+    vt = VoltageThresholdTest(rm,5.0,2.0,0.8,4.5,0.0,pins,strategy='sweep',resolution=0.01)
+    levels = vt.staircase(5.0,0.0)
+    assert len(levels) <= VoltageThresholdTest.MAX_POINTS
+    assert levels[0] == 5.0 and levels[-1] == 0.0
+    assert vt.staircase(0.0,5.0) == levels[::-1]
+
+def test_sweep_stops_the_list_at_the_crossing(rm,pins):
+    vt = threshold(rm,pins,'sweep')
+    assert vt.steps['pin 1']['LOW'] < len(vt.staircase(0.0,5.0))
+    # The next test gets a fixed source back
+    vt.smu_setup.setup('volt',2,'volt')
+    assert vt.smu_setup.state['vmode'] == 'fix'
+
+# The pyvisa-sim stand-in knows every command the tests send, anything
+# else would be in the SMU error queue
+@pytest.fixture
+def sim_rm():
+    pyvisa = pytest.importorskip('pyvisa')
+    pytest.importorskip('pyvisa_sim')
+    rm = SessionPool(pyvisa.ResourceManager(f'{YAML}@sim'),batch=False,
+                     aliases={'SMU2400':'GPIB0::24::INSTR','Fluke_8840A_MM':'GPIB0::1::INSTR'})
+    yield rm
+    rm.close()
+
+@pytest.mark.parametrize('strategy',VoltageThresholdTest.STRATEGIES)
+def test_yaml_backend_runs_every_strategy(sim_rm,pins,strategy):
+    vt = threshold(sim_rm,pins,strategy)
+    assert vt.smu_setup.check_errors() == []
+    assert vt.lo.meas['pin 1'] is not None
+    assert vt.hi.meas['pin 1'] is not None
+
+def test_yaml_backend_runs_a_chip(sim_rm,pins,voltages):
+    tests = expand_tests(['contact test','power consumption test','output short current test',
+                          'output drive current test','voltage threshold test'])
+    chip_set = TotalDataset(tests,rm=sim_rm)
+    for num in (1,2):
+        chip = ICDataset(sim_rm,num,pins,voltages,None,chip_set.expected)
+        chip.prompt = lambda msg,title: None
+        chip_set.run_tests(chip)
+        assert chip.errors == []
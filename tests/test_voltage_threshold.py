@@ -0,0 +1,23 @@
+from voltage_threshold_test import VoltageThresholdTest
+
+def test_low_and_high_halves_keep_their_own_results(rm,pins,voltages):
+    vt = VoltageThresholdTest(rm,*voltages,pins)
+    lo = vt.execute_test('pin 1','LOW')
+    hi = vt.execute_test('pin 1','HIGH')
+    assert lo is vt.lo and hi is vt.hi
+    assert lo.meas is not hi.meas
+    assert lo.outcomes is not hi.outcomes
+    # The HIGH search doesn't overwrite what LOW found
+    assert lo.meas['pin 1'] != hi.meas['pin 1']
+    assert vt.meas['pin 1'] == hi.meas['pin 1']
+    assert lo.outcomes['pin 1'] == (lo.meas['pin 1'] >= vt.vil)
+    assert hi.outcomes['pin 1'] == (hi.meas['pin 1'] <= vt.vih)
+    # Pins not tested yet are still empty in both halves
+    assert lo.meas['pin 2'] is None and hi.meas['pin 2'] is None
+
+def test_each_half_is_recorded_once_per_pin(rm,pins,voltages):
+    vt = VoltageThresholdTest(rm,*voltages,pins)
+    for pin in VoltageThresholdTest.get_valid_pins(pins):
+        vt.execute_test(pin,'HIGH')
+    assert all(v is not None for v in vt.hi.meas.values())
+    assert all(v is None for v in vt.lo.meas.values())